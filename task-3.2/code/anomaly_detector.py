@@ -9,11 +9,21 @@ Detecção híbrida de anomalias:
 CloudWalk Task 3.2
 """
 
+import time
+import pickle
+import threading
 import numpy as np
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence
 from dataclasses import dataclass
 import logging
 
+from .ring_buffer import TransactionRing, STATUS_CODES, encode_status, encode_statuses
+from .score_table import ScoreTable
+from .quantile_sketch import QuantileBaselines
+from .snapshot import prefixed, section, pack_object, unpack_object
+from .detector_shards import DetectorShards
+
 logger = logging.getLogger(__name__)
 
 # ============== CONFIGURATION ==============
@@ -30,8 +40,83 @@ class DetectorConfig:
     drop_threshold: float = 0.5  # Queda de mais de 50%
     zscore_threshold: float = 2.5
     
+    # Baselines percentis (sketch por status e hora do dia)
+    quantile_min_samples: int = 200   # Observações na hora antes de usar o p99
+    quantile_refresh: float = 5.0     # Segundos entre recálculos dos thresholds
+    p99_margin: float = 1.2           # P99_SPIKE só acima de p99 * margem (~1% do tráfego normal passa do p99)
+    
     # Janela de análise
     window_size: int = 30
+    
+    # Treino do Isolation Forest
+    min_train_samples: int = 30
+    retrain_interval: float = 300.0  # Segundos entre re-treinos em background
+    
+    # Tabela de scores pré-computada (substitui decision_function por lookup)
+    use_score_table: bool = True
+    score_table_max_size: int = 50_000
+
+# Recomendações por causa raiz (compartilhadas entre analyze e analyze_batch)
+RECOMMENDATIONS = {
+    "outage": "🚨 CRÍTICO: Possível outage! Verificar conectividade do gateway IMEDIATAMENTE.",
+    "failures": "🚨 CRÍTICO: Alta taxa de falhas! Investigar processador de pagamentos.",
+    "auth": "🚨 CRÍTICO: Erros de autorização! Verificar conexão com adquirente.",
+    "critical": "🚨 CRÍTICO: Múltiplas anomalias! Investigação imediata necessária.",
+    "spike": "⚠️ ALERTA: Spike de volume. Monitorar para possível sobrecarga ou tráfego legítimo.",
+    "denied": "⚠️ ALERTA: Taxa de negação elevada. Verificar padrões de fraude.",
+    "warning": "⚠️ ALERTA: Anomalia detectada. Continuar monitorando.",
+    "normal": "✅ NORMAL: Métricas dentro dos parâmetros esperados.",
+}
+
+# Tamanho do bloco na recorrência EWMA vetorizada (evita underflow de (1-alpha)^n)
+EWMA_BLOCK = 256
+
+def _percentiles(p50: float, p95: float, p99: float) -> Optional[Dict[str, float]]:
+    """Baseline percentil para o resultado (None enquanto não há amostras suficientes)"""
+    if np.isnan(p99):
+        return None
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1)}
+
+def format_violations(
+    config: DetectorConfig, count: int, status: str, auth_code: str, mean: float,
+    zscore: float, p99: float, min_count: int
+) -> List[str]:
+    """Monta a lista de violações para uma linha dado o estado estatístico"""
+    violations = []
+    
+    # Regra 1: Volume muito baixo (possível outage)
+    if count < min_count:
+        violations.append(f"LOW_VOLUME: {count} < {min_count} (possível outage)")
+    
+    # Regra 2: Spike de volume
+    if mean > 0 and count > mean * config.max_spike:
+        violations.append(f"VOLUME_SPIKE: {count} > {config.max_spike}x média ({mean:.0f})")
+    
+    # Regra 3: Queda brusca
+    if mean > 0 and count < mean * config.drop_threshold:
+        violations.append(f"VOLUME_DROP: {count} < 50% da média ({mean:.0f})")
+    
+    # Regra 4: Status não-aprovado
+    if status == "denied":
+        violations.append("DENIED: Transação negada")
+    elif status == "failed":
+        violations.append("FAILED: Transação falhou")
+    elif status == "reversed":
+        violations.append("REVERSED: Transação revertida")
+    
+    # Regra 5: Código de erro
+    if auth_code != "00":
+        violations.append(f"AUTH_ERROR: Código {auth_code} indica erro")
+    
+    # Regra 6: Z-Score extremo
+    if abs(zscore) > config.zscore_threshold:
+        violations.append(f"ZSCORE: {zscore:.2f} excede threshold {config.zscore_threshold}")
+    
+    # Regra 7: Bem acima do p99 do status nesta hora do dia
+    if count > p99 * config.p99_margin:
+        violations.append(f"P99_SPIKE: {count} > {config.p99_margin}x p99 de {status} nesta hora ({p99:.0f})")
+    
+    return violations
 
 # ============== ANOMALY DETECTOR ==============
 
@@ -49,37 +134,203 @@ class AnomalyDetector:
         self.config = config or DetectorConfig()
         self.model = None
         self.is_trained = False
+        self.score_table: Optional[ScoreTable] = None
+        
+        # Metadados do modelo em uso (atualizados a cada troca)
+        self.trainer = None  # RetrainScheduler opcional (treino fora do request)
+        self.trained_at: Optional[float] = None
+        self.fit_duration = 0.0
+        self.training_samples = 0
+        self.fit_count = 0
+        self._model_lock = threading.Lock()
         
-        # Histórico interno
-        self.history: List[float] = []
-        self.status_history: List[str] = []
+        # Histórico interno (contagem + status em buffer circular)
+        self.history = TransactionRing(capacity=500, windows=(30,))
         
         # Estatísticas móveis
         self.running_mean = 100.0
         self.running_std = 20.0
         self.alpha = 0.1  # Fator de suavização exponencial
         
+        # Baselines por chave (merchant), para transações que informam a chave
+        self.shards = DetectorShards(self.alpha, self._ewma, self._ewma_std)
+        
+        # Quantis por status e hora (thresholds recalculados a cada quantile_refresh)
+        self.quantiles = QuantileBaselines()
+        self._thresholds: Optional[np.ndarray] = None
+        self._thresholds_key: Optional[tuple] = None
+        
         # Tentar carregar sklearn
         self._init_ml_model()
     
     def _init_ml_model(self):
         """Inicializa modelo ML se disponível"""
         try:
-            from sklearn.ensemble import IsolationForest
-            self.model = IsolationForest(
-                contamination=0.1,
-                random_state=42,
-                n_estimators=100
-            )
+            self.model = self.build_model()
             logger.info("✅ Isolation Forest inicializado")
         except ImportError:
             logger.warning("⚠️ sklearn não disponível, usando apenas regras")
             self.model = None
     
+    @staticmethod
+    def build_model():
+        """Cria um Isolation Forest novo (não treinado)"""
+        from sklearn.ensemble import IsolationForest
+        return IsolationForest(
+            contamination=0.1,
+            random_state=42,
+            n_estimators=100
+        )
+    
+    def fit_model(self, samples: np.ndarray) -> float:
+        """
+        Treina um modelo novo com as amostras e o instala atomicamente.
+        
+        O modelo em uso nunca é alterado in-place: o request path continua
+        pontuando com a versão anterior até a troca de referência.
+        
+        Returns:
+            Duração do fit em segundos
+        """
+        X_train = np.asarray(samples, dtype=float).reshape(-1, 1)
+        model = self.build_model()
+        start = time.perf_counter()
+        model.fit(X_train)
+        table = None
+        if self.config.use_score_table:
+            table = ScoreTable(model, X_train, max_size=self.config.score_table_max_size)
+        duration = time.perf_counter() - start
+        self.install_model(model, len(X_train), duration, table)
+        return duration
+    
+    def install_model(
+        self,
+        model,
+        training_samples: int,
+        fit_duration: float = 0.0,
+        score_table: Optional[ScoreTable] = None
+    ):
+        """Troca o modelo em uso (e sua tabela de scores) por um já treinado"""
+        with self._model_lock:
+            self.model = model
+            self.score_table = score_table
+            self.is_trained = True
+            self.trained_at = time.time()
+            self.fit_duration = fit_duration
+            self.training_samples = training_samples
+            self.fit_count += 1
+        logger.info(f"🎓 Modelo treinado com {training_samples} amostras em {fit_duration * 1000:.0f}ms")
+    
+    def _ensure_trained(self, historical: np.ndarray) -> bool:
+        """
+        Garante um modelo treinado antes de pontuar.
+        
+        Com RetrainScheduler acoplado apenas agenda o treino (não bloqueia);
+        sem ele, treina de forma síncrona com o histórico recebido.
+        """
+        if self.is_trained:
+            return True
+        if self.trainer is not None:
+            self.trainer.request_fit()
+            return False
+        if len(historical) >= self.config.min_train_samples:
+            self.fit_model(historical)
+            return True
+        return False
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        """Estado do modelo ML em uso"""
+        return {
+            "available": self.model is not None,
+            "trained": self.is_trained,
+            "age_seconds": round(time.time() - self.trained_at, 3) if self.trained_at else None,
+            "fit_duration_seconds": round(self.fit_duration, 6),
+            "training_samples": self.training_samples,
+            "fits_total": self.fit_count,
+            "score_table_size": len(self.score_table) if self.score_table is not None else 0,
+            "background_training": self.trainer is not None
+        }
+    
+    # ============== SNAPSHOT ==============
+    
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        """Estatísticas, histórico, quantis e o modelo treinado (pickle)"""
+        state = {"running": np.array([self.running_mean, self.running_std])}
+        state.update(prefixed(self.history.snapshot_state(), "history"))
+        state.update(prefixed(self.quantiles.snapshot_state(), "quantiles"))
+        state.update(prefixed(self.shards.snapshot_state(), "shards"))
+        with self._model_lock:
+            if self.is_trained and self.model is not None:
+                state["model"] = pack_object({
+                    "model": self.model,
+                    "score_table": self.score_table,
+                    "training_samples": self.training_samples,
+                    "fit_duration": self.fit_duration,
+                })
+        return state
+    
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.running_mean, self.running_std = (float(v) for v in state["running"])
+        self.history.restore_state(section(state, "history"))
+        self.quantiles.restore_state(section(state, "quantiles"))
+        shards = section(state, "shards")
+        if shards:
+            self.shards.restore_state(shards)
+        self._thresholds = None
+        if "model" in state:
+            saved = unpack_object(state["model"])
+            self.install_model(
+                saved["model"], saved["training_samples"], saved["fit_duration"], saved["score_table"]
+            )
+    
+    def warm_start(self, counts: np.ndarray, statuses: Sequence[str], timestamps: np.ndarray) -> None:
+        """
+        Reconstrói o estado a partir de observações históricas (em ordem).
+        
+        Mesmas recorrências do caminho de análise (EWMA vetorizada), sem
+        pontuar: o detector já começa com média/desvio, quantis por hora e
+        um modelo treinado sobre o histórico.
+        """
+        counts = np.asarray(counts, dtype=float)
+        if len(counts) == 0:
+            return
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        offset = time.localtime().tm_gmtoff
+        hours = ((timestamps + offset) // 3600 % 24).astype(np.int64)
+        
+        self.history.extend(counts.astype(np.int64), statuses, timestamps)
+        self.quantiles.add_many(counts, statuses, hours)
+        self._thresholds = None
+        
+        means = self._ewma(counts, self.running_mean)
+        stds = self._ewma_std((counts - means) ** 2, self.running_std)
+        self.running_mean = float(means[-1])
+        self.running_std = float(stds[-1])
+        
+        if self.model is not None and len(self.history) >= self.config.min_train_samples:
+            self.fit_model(np.array(self.history.counts(), dtype=float))
+    
+    def recompute_statistics(self) -> None:
+        """
+        Recalcula média/desvio móveis a partir do histórico atual.
+        
+        Com alpha=0.1 o peso do valor inicial some em poucas dezenas de
+        pontos: workers com o mesmo histórico chegam às mesmas estatísticas.
+        """
+        counts = np.array(self.history.counts(), dtype=float)
+        if len(counts) <= 10:
+            return
+        means = self._ewma(counts[1:], counts[0])
+        stds = self._ewma_std((counts[1:] - means) ** 2, max(float(np.std(counts[:10])), 1.0))
+        self.running_mean = float(means[-1])
+        self.running_std = float(stds[-1])
+    
     def reset(self):
         """Reseta o estado do detector"""
         self.history.clear()
-        self.status_history.clear()
+        self.quantiles.clear()
+        self.shards.clear()
+        self._thresholds = None
         self.running_mean = 100.0
         self.running_std = 20.0
         self.is_trained = False
@@ -93,6 +344,20 @@ class AnomalyDetector:
             new_var = (1 - self.alpha) * running_var + self.alpha * variance
             self.running_std = max(np.sqrt(new_var), 1.0)
     
+    def percentile_thresholds(self, hour: Optional[int] = None) -> np.ndarray:
+        """
+        p50/p95/p99 da hora por status (matriz status x 3, NaN sem amostras).
+        
+        O snapshot vale por `quantile_refresh` segundos: lote e caminho
+        sequencial enxergam os mesmos thresholds dentro dele.
+        """
+        hour = datetime.now().hour if hour is None else hour
+        key = (hour, int(time.monotonic() // self.config.quantile_refresh))
+        if self._thresholds is None or self._thresholds_key != key:
+            self._thresholds = self.quantiles.hour_thresholds(hour, self.config.quantile_min_samples)
+            self._thresholds_key = key
+        return self._thresholds
+    
     def _calc_zscore(self, count: float) -> float:
         """Calcula Z-Score"""
         if self.running_std == 0:
@@ -109,16 +374,14 @@ class AnomalyDetector:
         
         try:
             # Treinar se necessário
-            if not self.is_trained and len(historical) >= 30:
-                X_train = np.array(historical).reshape(-1, 1)
-                self.model.fit(X_train)
-                self.is_trained = True
-                logger.info(f"🎓 Modelo treinado com {len(historical)} amostras")
-            
-            if not self.is_trained:
+            if not self._ensure_trained(historical):
                 return 0.0
             
-            # Predição
+            # Predição via tabela pré-computada (mesmo resultado, sem percorrer as árvores)
+            table = self.score_table
+            if table is not None:
+                return table.lookup(count)
+            
             X_test = np.array([[count]])
             score = self.model.decision_function(X_test)[0]
             
@@ -130,43 +393,22 @@ class AnomalyDetector:
             logger.error(f"Erro ML: {e}")
             return 0.0
     
-    def _check_rules(self, count: int, status: str, auth_code: str) -> List[str]:
+    def _check_rules(self, count: int, status: str, auth_code: str, p99: float = np.nan) -> List[str]:
         """
         Verifica regras de threshold.
         Retorna lista de violações.
         """
-        violations = []
-        
-        # Regra 1: Volume muito baixo (possível outage)
-        if count < self.config.min_count:
-            violations.append(f"LOW_VOLUME: {count} < {self.config.min_count} (possível outage)")
-        
-        # Regra 2: Spike de volume
-        if self.running_mean > 0 and count > self.running_mean * self.config.max_spike:
-            violations.append(f"VOLUME_SPIKE: {count} > {self.config.max_spike}x média ({self.running_mean:.0f})")
-        
-        # Regra 3: Queda brusca
-        if self.running_mean > 0 and count < self.running_mean * self.config.drop_threshold:
-            violations.append(f"VOLUME_DROP: {count} < 50% da média ({self.running_mean:.0f})")
-        
-        # Regra 4: Status não-aprovado
-        if status == "denied":
-            violations.append("DENIED: Transação negada")
-        elif status == "failed":
-            violations.append("FAILED: Transação falhou")
-        elif status == "reversed":
-            violations.append("REVERSED: Transação revertida")
-        
-        # Regra 5: Código de erro
-        if auth_code != "00":
-            violations.append(f"AUTH_ERROR: Código {auth_code} indica erro")
-        
-        # Regra 6: Z-Score extremo
-        zscore = self._calc_zscore(count)
-        if abs(zscore) > self.config.zscore_threshold:
-            violations.append(f"ZSCORE: {zscore:.2f} excede threshold {self.config.zscore_threshold}")
-        
-        return violations
+        return self._format_violations(
+            count, status, auth_code, self.running_mean, self._calc_zscore(count), p99
+        )
+    
+    def _format_violations(
+        self, count: int, status: str, auth_code: str, mean: float, zscore: float,
+        p99: float = np.nan, min_count: Optional[int] = None
+    ) -> List[str]:
+        """Monta a lista de violações para uma linha dado o estado estatístico"""
+        min_count = self.config.min_count if min_count is None else min_count
+        return format_violations(self.config, count, status, auth_code, mean, zscore, p99, min_count)
     
     def _determine_level(self, score: float, violations: List[str]) -> str:
         """Determina nível do alerta"""
@@ -185,57 +427,74 @@ class AnomalyDetector:
         """Gera recomendação baseada na análise"""
         if level == "CRITICAL":
             if any("LOW_VOLUME" in v or "VOLUME_DROP" in v for v in violations):
-                return "🚨 CRÍTICO: Possível outage! Verificar conectividade do gateway IMEDIATAMENTE."
+                return RECOMMENDATIONS["outage"]
             if any("FAILED" in v for v in violations):
-                return "🚨 CRÍTICO: Alta taxa de falhas! Investigar processador de pagamentos."
+                return RECOMMENDATIONS["failures"]
             if any("AUTH_ERROR" in v for v in violations):
-                return "🚨 CRÍTICO: Erros de autorização! Verificar conexão com adquirente."
-            return "🚨 CRÍTICO: Múltiplas anomalias! Investigação imediata necessária."
+                return RECOMMENDATIONS["auth"]
+            return RECOMMENDATIONS["critical"]
         
         elif level == "WARNING":
             if any("SPIKE" in v for v in violations):
-                return "⚠️ ALERTA: Spike de volume. Monitorar para possível sobrecarga ou tráfego legítimo."
+                return RECOMMENDATIONS["spike"]
             if any("DENIED" in v for v in violations):
-                return "⚠️ ALERTA: Taxa de negação elevada. Verificar padrões de fraude."
-            return "⚠️ ALERTA: Anomalia detectada. Continuar monitorando."
+                return RECOMMENDATIONS["denied"]
+            return RECOMMENDATIONS["warning"]
         
-        return "✅ NORMAL: Métricas dentro dos parâmetros esperados."
+        return RECOMMENDATIONS["normal"]
     
     def analyze(
         self,
         current_count: int,
         status: str,
         auth_code: str,
-        historical_counts: List[float]
+        historical_counts: List[float],
+        shard_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         🔍 Análise principal de anomalias.
         
+        Com `shard_key` a transação é pontuada contra a baseline da chave
+        (merchant) e não altera o estado global. Isolation Forest, p99 e
+        LOW_VOLUME ficam de fora: são calibrados no fluxo agregado.
+        
         Args:
             current_count: Contagem atual de transações
             status: Status da transação
             auth_code: Código de autorização
             historical_counts: Histórico recente
+            shard_key: Chave do shard (None = detector global)
             
         Returns:
             Dict com resultado da análise
         """
-        # Atualizar histórico interno
-        self.history.append(current_count)
-        if len(self.history) > 500:
-            self.history = self.history[-300:]
-        
-        self.status_history.append(status)
-        if len(self.status_history) > 500:
-            self.status_history = self.status_history[-300:]
-        
-        # Atualizar estatísticas
-        self._update_statistics(current_count)
-        
-        # Calcular scores
-        ml_score = self._ml_score(current_count, historical_counts)
-        zscore = self._calc_zscore(current_count)
-        violations = self._check_rules(current_count, status, auth_code)
+        if shard_key is None:
+            # Atualizar histórico interno
+            self.history.append(current_count, status)
+            
+            # Atualizar estatísticas
+            self._update_statistics(current_count)
+            hour = datetime.now().hour
+            p50, p95, p99 = self.percentile_thresholds(hour)[encode_status(status)]
+            self.quantiles.add(current_count, status, hour)
+            
+            # Calcular scores
+            ml_score = self._ml_score(current_count, historical_counts)
+            zscore = self._calc_zscore(current_count)
+            violations = self._check_rules(current_count, status, auth_code, p99)
+            mean, std = self.running_mean, self.running_std
+            
+            # Taxa de aprovação recente
+            approval_rate = self.history.status_count("approved", 30) / max(self.history.window_size(30), 1)
+        else:
+            mean, std, approval_rate, warm = self.shards.observe(shard_key, current_count, status)
+            p50 = p95 = p99 = np.nan
+            ml_score = 0.0
+            # Durante o warm-up da chave não há baseline para z-score nem spike/queda
+            zscore = (current_count - mean) / std if warm else 0.0
+            violations = self._format_violations(
+                current_count, status, auth_code, mean if warm else 0.0, zscore, min_count=0
+            )
         
         # Score combinado
         if ml_score > 0:
@@ -250,10 +509,6 @@ class AnomalyDetector:
         # Recomendação
         recommendation = self._get_recommendation(level, violations)
         
-        # Taxa de aprovação recente
-        recent = self.status_history[-30:] if self.status_history else []
-        approval_rate = recent.count("approved") / max(len(recent), 1)
-        
         result = {
             "is_anomaly": is_anomaly,
             "alert_level": level,
@@ -262,20 +517,430 @@ class AnomalyDetector:
             "recommendation": recommendation,
             "metrics": {
                 "current_count": current_count,
-                "running_mean": round(self.running_mean, 2),
-                "running_std": round(self.running_std, 2),
+                "running_mean": round(mean, 2),
+                "running_std": round(std, 2),
                 "zscore": round(zscore, 2),
                 "ml_score": round(ml_score, 4),
                 "approval_rate": round(approval_rate, 4),
+                "percentiles": _percentiles(p50, p95, p99),
                 "status": status,
                 "auth_code": auth_code
             }
         }
         
+        if shard_key is not None:
+            result["metrics"]["shard_key"] = shard_key
+            result["metrics"]["baseline_ready"] = warm
+            if is_anomaly:
+                self.shards.record_anomalies([shard_key])
+        
         if is_anomaly:
             logger.warning(f"🚨 ANOMALIA: {level} | Score: {combined:.2f} | {violations}")
         
         return result
+    
+    # ============== ANÁLISE EM LOTE (VETORIZADA) ==============
+    
+    def _ewma(self, values: np.ndarray, initial: float) -> np.ndarray:
+        """
+        Recorrência y_i = (1 - alpha) * y_{i-1} + alpha * x_i vetorizada.
+        
+        Processa em blocos de EWMA_BLOCK para manter (1 - alpha)^n longe de underflow.
+        """
+        w = 1 - self.alpha
+        out = np.empty(len(values), dtype=float)
+        prev = initial
+        for start in range(0, len(values), EWMA_BLOCK):
+            block = values[start:start + EWMA_BLOCK]
+            powers = w ** np.arange(1, len(block) + 1)
+            decay = powers / w
+            out[start:start + len(block)] = powers * prev + self.alpha * decay * np.cumsum(block / decay)
+            prev = out[start + len(block) - 1]
+        return out
+    
+    def _ewma_std(self, sq_dev: np.ndarray, initial_std: float) -> np.ndarray:
+        """
+        Desvio padrão EWMA com o piso de 1.0 usado em _update_statistics.
+        
+        Enquanto a variância fica >= 1 a recorrência é linear; quando o piso
+        é atingido o estado volta a std=1 e permanece assim até um desvio >= 1.
+        """
+        n = len(sq_dev)
+        out = np.empty(n, dtype=float)
+        pos = 0
+        var0 = initial_std ** 2
+        while pos < n:
+            var = self._ewma(sq_dev[pos:pos + EWMA_BLOCK], var0)
+            below = np.flatnonzero(var < 1.0)
+            if below.size == 0:
+                out[pos:pos + len(var)] = np.sqrt(var)
+                var0 = var[-1]
+                pos += len(var)
+                continue
+            
+            k = below[0]
+            out[pos:pos + k] = np.sqrt(var[:k])
+            out[pos + k] = 1.0
+            pos += k + 1
+            
+            # A partir de std=1, só sai do piso com desvio quadrático >= 1
+            above = np.flatnonzero(sq_dev[pos:] >= 1.0)
+            stop = pos + above[0] if above.size else n
+            out[pos:stop] = 1.0
+            pos = stop
+            var0 = 1.0
+        return out
+    
+    def _ml_score_batch(
+        self,
+        counts: np.ndarray,
+        historical: np.ndarray,
+        history_window: int,
+        batch_counts: Optional[np.ndarray] = None,
+        positions: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Score ML para o lote inteiro com uma única chamada a decision_function.
+        
+        Reproduz o caminho sequencial: a linha i vê como histórico os últimos
+        `history_window` valores de historical + batch_counts[:positions[i]]
+        (por padrão o próprio lote: historical + counts[:i]).
+        """
+        n = len(counts)
+        scores = np.zeros(n, dtype=float)
+        if self.model is None or n == 0:
+            return scores
+        if batch_counts is None:
+            batch_counts, positions = counts, np.arange(n)
+        
+        # Tamanho do histórico visto por cada linha (crescente no lote)
+        seen = len(historical) + positions
+        try:
+            if not self.is_trained:
+                if self.trainer is not None:
+                    self.trainer.request_fit()
+                    return scores
+                # Primeira linha cujo histórico alcança min_train_samples
+                start = int(np.searchsorted(seen, self.config.min_train_samples))
+                if start >= n:
+                    return scores
+                window = np.concatenate([historical, batch_counts[:positions[start]]])[-history_window:]
+                self.fit_model(window)
+            else:
+                start = int(np.searchsorted(seen, 20))
+                if start >= n:
+                    return scores
+            
+            table = self.score_table
+            if table is not None:
+                scores[start:] = table.lookup_many(counts[start:])
+            else:
+                raw = self.model.decision_function(counts[start:].reshape(-1, 1).astype(float))
+                scores[start:] = 1 / (1 + np.exp(raw))
+        except Exception as e:
+            logger.error(f"Erro ML: {e}")
+            scores[:] = 0.0
+        return scores
+    
+    def analyze_batch(
+        self,
+        counts: Sequence[int],
+        statuses: Sequence[str],
+        auth_codes: Sequence[Optional[str]],
+        historical_counts: Sequence[float],
+        history_window: int = 50,
+        shard_keys: Optional[Sequence[Optional[str]]] = None,
+        batch_counts: Optional[Sequence[int]] = None,
+        batch_positions: Optional[Sequence[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        🔍 Análise vetorizada de um lote de transações.
+        
+        Produz os mesmos resultados, na mesma ordem, que chamar analyze()
+        linha a linha, mas calcula EWMA, z-scores, regras e o score do
+        Isolation Forest sobre arrays NumPy do lote inteiro.
+        
+        Args:
+            counts: Contagens das transações (array ou lista)
+            statuses: Status de cada transação
+            auth_codes: Código de autorização de cada transação
+            historical_counts: Histórico anterior ao lote (mais antigo primeiro)
+            history_window: Tamanho da janela de histórico vista por linha
+            shard_keys: Chave do shard por linha (None = detector global)
+            batch_counts: Lote completo na ordem em que entra no histórico
+                (com cache hits e linhas com chave); padrão: counts
+            batch_positions: Posição de cada linha analisada em batch_counts
+            
+        Returns:
+            Lista de dicts no mesmo formato de analyze()
+        """
+        if len(counts) == 0:
+            return []
+        batch = self.prepare_batch(
+            counts, statuses, auth_codes, historical_counts, history_window, shard_keys,
+            batch_counts, batch_positions
+        )
+        results = build_results(self.config, batch)
+        self.record_shard_anomalies(batch, results)
+        return results
+    
+    def prepare_batch(
+        self,
+        counts: Sequence[int],
+        statuses: Sequence[str],
+        auth_codes: Sequence[Optional[str]],
+        historical_counts: Sequence[float],
+        history_window: int = 50,
+        shard_keys: Optional[Sequence[Optional[str]]] = None,
+        batch_counts: Optional[Sequence[int]] = None,
+        batch_positions: Optional[Sequence[int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Parte com estado de analyze_batch(): atualiza EWMA, histórico,
+        quantis e shards e devolve só arrays por linha.
+        
+        O resultado é picklable; build_results() pode montar os dicts em
+        outro processo (JobExecutor) sem acesso ao detector.
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        n = len(counts)
+        batch = {
+            "counts": counts,
+            "statuses": np.asarray(statuses, dtype=object),
+            "auth_codes": np.asarray(auth_codes, dtype=object),
+            "means": np.zeros(n),
+            "stds": np.zeros(n),
+            "zscores": np.zeros(n),
+            "ml_scores": np.zeros(n),
+            "percentiles": np.full((n, 3), np.nan),
+            "approval_rates": np.zeros(n),
+            "min_counts": np.full(n, self.config.min_count, dtype=np.int64),
+            # Linhas com chave: média reportada (a de regras é 0 no warm-up)
+            "shard_rows": np.empty(0, dtype=np.int64),
+            "shard_keys": [],
+            "shard_means": np.empty(0),
+            "baseline_ready": np.empty(0, dtype=bool),
+        }
+        
+        # Linhas com chave vão para os shards; o restante segue no caminho global
+        keyed = np.zeros(n, dtype=bool)
+        if shard_keys is not None:
+            keyed = np.fromiter((key is not None for key in shard_keys), dtype=bool, count=n)
+        plain = np.flatnonzero(~keyed)
+        if plain.size:
+            # Histórico do ML: todas as linhas do lote que entram na janela recente
+            if batch_counts is None:
+                batch_counts, positions = counts, plain
+            else:
+                batch_counts = np.asarray(batch_counts, dtype=np.int64)
+                positions = np.asarray(batch_positions, dtype=np.int64)[plain]
+            self._prepare_global(batch, plain, historical_counts, history_window, batch_counts, positions)
+        if keyed.any():
+            rows = np.flatnonzero(keyed)
+            self._prepare_shards(batch, rows, [shard_keys[i] for i in rows.tolist()])
+        return batch
+    
+    def _prepare_global(
+        self,
+        batch: Dict[str, Any],
+        rows: np.ndarray,
+        historical_counts: Sequence[float],
+        history_window: int,
+        batch_counts: np.ndarray,
+        positions: np.ndarray
+    ) -> None:
+        """Linhas sem chave: estatísticas, ML e percentis do detector global"""
+        counts = batch["counts"][rows]
+        statuses = batch["statuses"][rows]
+        n = len(counts)
+        historical = np.asarray(historical_counts, dtype=float)[-history_window:] if len(historical_counts) else np.empty(0)
+        values = counts.astype(float)
+        
+        # Estatísticas: só atualizam quando o histórico interno passa de 10 itens
+        skip = min(n, max(0, 10 - len(self.history)))
+        means = np.full(n, self.running_mean, dtype=float)
+        stds = np.full(n, self.running_std, dtype=float)
+        if skip < n:
+            means[skip:] = self._ewma(values[skip:], self.running_mean)
+            sq_dev = (values[skip:] - means[skip:]) ** 2
+            stds[skip:] = self._ewma_std(sq_dev, self.running_std)
+        
+        # Scores
+        ml_scores = self._ml_score_batch(counts, historical, history_window, batch_counts, positions)
+        zscores = np.where(stds == 0, 0.0, (values - means) / np.where(stds == 0, 1.0, stds))
+        
+        # Percentis da hora por linha (snapshot único para o lote)
+        hour = datetime.now().hour
+        percentiles = self.percentile_thresholds(hour)[encode_statuses(statuses)]
+        self.quantiles.add_many(counts, statuses, hour)
+        
+        # Taxa de aprovação nas últimas 30 transações (incluindo a atual)
+        prior_statuses = self.history.statuses(29)
+        approved = np.concatenate([
+            prior_statuses == STATUS_CODES["approved"],
+            statuses == "approved"
+        ]).astype(int)
+        cumulative = np.concatenate([[0], np.cumsum(approved)])
+        end = np.arange(n) + len(prior_statuses) + 1
+        begin = np.maximum(end - 30, 0)
+        approval_rates = (cumulative[end] - cumulative[begin]) / (end - begin)
+        
+        # Atualizar estado interno como no caminho sequencial
+        self.history.extend(counts, statuses.tolist())
+        self.running_mean = float(means[-1])
+        self.running_std = float(stds[-1])
+        
+        batch["means"][rows] = means
+        batch["stds"][rows] = stds
+        batch["zscores"][rows] = zscores
+        batch["ml_scores"][rows] = ml_scores
+        batch["percentiles"][rows] = percentiles
+        batch["approval_rates"][rows] = approval_rates
+    
+    def _prepare_shards(self, batch: Dict[str, Any], rows: np.ndarray, keys: List[str]) -> None:
+        """Linhas com chave, contra as baselines dos shards"""
+        counts = batch["counts"][rows]
+        means, stds, approval_rates, warm = self.shards.observe_many(keys, counts, batch["statuses"][rows])
+        batch["means"][rows] = np.where(warm, means, 0.0)
+        batch["stds"][rows] = stds
+        batch["zscores"][rows] = np.where(warm, (counts - means) / stds, 0.0)
+        batch["approval_rates"][rows] = approval_rates
+        batch["min_counts"][rows] = 0
+        batch["shard_rows"] = rows
+        batch["shard_keys"] = keys
+        batch["shard_means"] = means
+        batch["baseline_ready"] = warm
+    
+    def record_shard_anomalies(self, batch: Dict[str, Any], results: List[Dict[str, Any]]) -> None:
+        """Conta as anomalias do lote nos shards (após build_results)"""
+        self.shards.record_anomalies([
+            key for i, key in zip(batch["shard_rows"].tolist(), batch["shard_keys"])
+            if results[i]["is_anomaly"]
+        ])
+
+
+# ============== RESULTADOS DO LOTE ==============
+
+def build_results(config: DetectorConfig, batch: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Regras, nível, recomendação e dicts de resultado para um lote
+    preparado por AnomalyDetector.prepare_batch().
+    
+    Sem estado: pode rodar em outro processo (JobExecutor).
+    """
+    counts = batch["counts"]
+    statuses = batch["statuses"]
+    auth_codes = batch["auth_codes"]
+    means = batch["means"]
+    zscores = batch["zscores"]
+    ml_scores = batch["ml_scores"]
+    percentiles = batch["percentiles"]
+    min_counts = batch["min_counts"]
+    n = len(counts)
+    values = counts.astype(float)
+    
+    # Máscaras de regras
+    low = counts < min_counts
+    p99_spike = values > percentiles[:, 2] * config.p99_margin
+    spike = (means > 0) & (values > means * config.max_spike)
+    drop = (means > 0) & (values < means * config.drop_threshold)
+    denied = statuses == "denied"
+    failed = statuses == "failed"
+    reversed_ = statuses == "reversed"
+    auth_error = auth_codes != "00"
+    extreme = np.abs(zscores) > config.zscore_threshold
+    
+    n_violations = (low.astype(int) + spike + drop + denied + failed + reversed_ + auth_error + extreme + p99_spike)
+    severe = low.astype(int) + drop + failed + auth_error
+    
+    # Score combinado e nível
+    z_part = np.minimum(np.abs(zscores) / 3, 1)
+    combined = np.where(ml_scores > 0, 0.6 * ml_scores + 0.4 * z_part, z_part)
+    critical = (combined > 0.85) | (severe >= 2)
+    warning = ~critical & ((combined > config.ml_threshold) | (n_violations >= 1))
+    levels = np.select([critical, warning], ["CRITICAL", "WARNING"], "NORMAL")
+    
+    recommendations = np.select(
+        [
+            critical & (low | drop),
+            critical & failed,
+            critical & auth_error,
+            critical,
+            warning & (spike | p99_spike),
+            warning & denied,
+            warning,
+        ],
+        [
+            RECOMMENDATIONS["outage"],
+            RECOMMENDATIONS["failures"],
+            RECOMMENDATIONS["auth"],
+            RECOMMENDATIONS["critical"],
+            RECOMMENDATIONS["spike"],
+            RECOMMENDATIONS["denied"],
+            RECOMMENDATIONS["warning"],
+        ],
+        RECOMMENDATIONS["normal"]
+    )
+    
+    # Montar resultados
+    results = []
+    rows = zip(
+        counts.tolist(), statuses.tolist(), auth_codes.tolist(),
+        means.tolist(), batch["stds"].tolist(), zscores.tolist(), ml_scores.tolist(),
+        combined.tolist(), levels.tolist(), recommendations.tolist(),
+        n_violations.tolist(), batch["approval_rates"].tolist(), percentiles.tolist(),
+        min_counts.tolist()
+    )
+    for count, status, auth_code, mean, std, z, ml, score, level, rec, nv, rate, pct, min_count in rows:
+        violations = format_violations(config, count, status, auth_code, mean, z, pct[2], min_count) if nv else []
+        results.append({
+            "is_anomaly": level != "NORMAL",
+            "alert_level": level,
+            "anomaly_score": round(score, 4),
+            "rule_violations": violations,
+            "recommendation": rec,
+            "metrics": {
+                "current_count": count,
+                "running_mean": round(mean, 2),
+                "running_std": round(std, 2),
+                "zscore": round(z, 2),
+                "ml_score": round(ml, 4),
+                "approval_rate": round(rate, 4),
+                "percentiles": _percentiles(*pct),
+                "status": status,
+                "auth_code": auth_code
+            }
+        })
+    
+    # Linhas com chave reportam a média do shard mesmo durante o warm-up
+    for i, key, mean, ready in zip(
+        batch["shard_rows"].tolist(), batch["shard_keys"],
+        batch["shard_means"].tolist(), batch["baseline_ready"].tolist()
+    ):
+        metrics = results[i]["metrics"]
+        metrics["running_mean"] = round(mean, 2)
+        metrics["shard_key"] = key
+        metrics["baseline_ready"] = ready
+    
+    anomalies = int(np.count_nonzero(levels != "NORMAL"))
+    if anomalies:
+        logger.warning(f"🚨 LOTE: {anomalies}/{n} anomalias detectadas")
+    
+    return results
+
+
+def build_results_chunks(config: DetectorConfig, batch: Dict[str, Any], chunk_size: int) -> List[bytes]:
+    """
+    build_results() devolvido em blocos já serializados (JobExecutor).
+    
+    O processo pai desserializa um bloco por vez entre outras tarefas do
+    event loop, em vez de segurar o GIL pelo lote inteiro de uma vez.
+    """
+    results = build_results(config, batch)
+    return [
+        pickle.dumps(results[start:start + chunk_size], protocol=pickle.HIGHEST_PROTOCOL)
+        for start in range(0, len(results), chunk_size)
+    ]
 
 
 # ============== TESTE ==============
@@ -291,7 +956,7 @@ if __name__ == "__main__":
     print("📈 Transações normais:")
     for i in range(30):
         count = int(np.random.normal(115, 15))
-        result = detector.analyze(count, "approved", "00", detector.history)
+        result = detector.analyze(count, "approved", "00", detector.history.counts())
     print(f"   Processadas 30 transações normais")
     print(f"   Média: {detector.running_mean:.1f}, Std: {detector.running_std:.1f}\n")
     
@@ -299,24 +964,73 @@ if __name__ == "__main__":
     print("🚨 Testando cenários de anomalia:\n")
     
     # Teste 1: Volume baixo (outage)
-    result = detector.analyze(10, "approved", "00", detector.history)
+    result = detector.analyze(10, "approved", "00", detector.history.counts())
     print(f"1. Volume baixo (10):")
     print(f"   Nível: {result['alert_level']}")
     print(f"   Score: {result['anomaly_score']:.2f}")
     print(f"   Recomendação: {result['recommendation']}\n")
     
     # Teste 2: Transação falha
-    result = detector.analyze(100, "failed", "59", detector.history)
+    result = detector.analyze(100, "failed", "59", detector.history.counts())
     print(f"2. Transação falha:")
     print(f"   Nível: {result['alert_level']}")
     print(f"   Score: {result['anomaly_score']:.2f}")
     print(f"   Recomendação: {result['recommendation']}\n")
     
     # Teste 3: Spike
-    result = detector.analyze(400, "approved", "00", detector.history)
+    result = detector.analyze(400, "approved", "00", detector.history.counts())
     print(f"3. Spike de volume (400):")
     print(f"   Nível: {result['alert_level']}")
     print(f"   Score: {result['anomaly_score']:.2f}")
     print(f"   Recomendação: {result['recommendation']}\n")
-    
+
+    # Teste 4: lote misto (linhas com chave, hits de cache) == caminho sequencial
+    rng = np.random.RandomState(7)
+    n = 120
+    counts = rng.normal(115, 15, n).astype(int)
+    counts[[40, 90]] = [420, 5]
+    statuses = rng.choice(["approved", "approved", "approved", "denied", "failed"], n).tolist()
+    keys = [f"m{i % 3}" if i % 4 == 0 else None for i in range(n)]
+    hits = {i for i in range(n) if i % 7 == 3}  # Entram na janela sem análise
+    pending = [i for i in range(n) if i not in hits]
+
+    sequential, recent = AnomalyDetector(), []
+    expected = {}
+    for i in range(n):
+        if i not in hits:
+            expected[i] = sequential.analyze(int(counts[i]), statuses[i], "00", recent[-50:], shard_key=keys[i])
+        recent.append(int(counts[i]))
+
+    batched = AnomalyDetector()
+    got = batched.analyze_batch(
+        counts[pending], [statuses[i] for i in pending], ["00"] * len(pending), [],
+        shard_keys=[keys[i] for i in pending], batch_counts=counts, batch_positions=pending
+    )
+    mismatches = [
+        i for i, result in zip(pending, got)
+        if (result["alert_level"], result["anomaly_score"], result["metrics"]["ml_score"])
+        != (expected[i]["alert_level"], expected[i]["anomaly_score"], expected[i]["metrics"]["ml_score"])
+    ]
+    print(f"4. Lote misto ({len(pending)} analisadas, {len(hits)} hits, {sum(k is not None for k in keys)} com chave):")
+    print(f"   Divergências lote x sequencial: {len(mismatches)}")
+    assert not mismatches, mismatches
+    print()
+
+    # Teste 5: tráfego estacionário — o p99 não pode aumentar a taxa de alertas
+    def alert_levels(config):
+        detector, recent, levels = AnomalyDetector(config), [], []
+        for value in np.random.RandomState(11).normal(120, 15, 5000).astype(int):
+            levels.append(detector.analyze(int(value), "approved", "00", recent[-50:])["alert_level"])
+            recent.append(int(value))
+        return levels
+
+    with_p99 = alert_levels(DetectorConfig(quantile_refresh=1e-6))
+    without_p99 = alert_levels(DetectorConfig(quantile_min_samples=10**9))
+    alerts = sum(level != "NORMAL" for level in with_p99)
+    baseline = sum(level != "NORMAL" for level in without_p99)
+    print("5. Tráfego estacionário N(120, 15), 5000 transações:")
+    print(f"   Alertas com p99: {alerts} | sem p99: {baseline}")
+    assert alerts <= baseline, (alerts, baseline)
+    print()
+
     print("✅ Testes concluídos!")
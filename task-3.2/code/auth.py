@@ -14,7 +14,7 @@ import os
 import secrets
 import hashlib
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
 import jwt
 from fastapi import HTTPException, Security, Depends
@@ -40,6 +40,8 @@ class SecurityStore:
     def __init__(self):
         self.api_keys: Dict[str, Dict] = {}
         self.revoked_tokens: set = set()
+        # Alterações ainda não propagadas aos outros workers (None = sem shared_state)
+        self.pending_changes: Optional[List[Tuple[str, str, Optional[Dict]]]] = None
         self.users: Dict[str, Dict] = {
             "admin": {
                 "password_hash": self._hash("admin123"),
@@ -62,15 +64,27 @@ class SecurityStore:
     def _hash(self, value: str) -> str:
         return hashlib.sha256(value.encode()).hexdigest()
     
+    def add_api_key(self, key_hash: str, data: Dict) -> None:
+        self.api_keys[key_hash] = data
+        if self.pending_changes is not None:
+            self.pending_changes.append(("add", key_hash, data))
+    
+    def remove_api_key(self, key_hash: str) -> bool:
+        if self.api_keys.pop(key_hash, None) is None:
+            return False
+        if self.pending_changes is not None:
+            self.pending_changes.append(("remove", key_hash, None))
+        return True
+    
     def _create_default_api_key(self):
         default_key = "guardian-api-key-2024"
         key_hash = self._hash(default_key)
-        self.api_keys[key_hash] = {
+        self.add_api_key(key_hash, {
             "name": "default-key",
             "permissions": ["read", "write"],
             "created_at": datetime.now().isoformat(),
             "last_used": None
-        }
+        })
         print(f"🔑 Default API Key: {default_key}")
 
 
@@ -79,6 +93,12 @@ store = SecurityStore()
 
 # ============== JWT FUNCTIONS ==============
 
+def set_jwt_secret(secret: str) -> None:
+    """Troca o segredo JWT (workers compartilham o mesmo via shared_state)"""
+    global JWT_SECRET
+    JWT_SECRET = secret
+
+
 def create_jwt_token(username: str, role: str, permissions: List[str]) -> str:
     payload = {
         "sub": username,
@@ -120,12 +140,12 @@ def authenticate_user(username: str, password: str) -> Optional[Dict]:
 def generate_api_key(name: str, permissions: List[str] = None) -> str:
     key = f"guardian-{secrets.token_hex(16)}"
     key_hash = store._hash(key)
-    store.api_keys[key_hash] = {
+    store.add_api_key(key_hash, {
         "name": name,
         "permissions": permissions or ["read"],
         "created_at": datetime.now().isoformat(),
         "last_used": None
-    }
+    })
     return key
 
 
@@ -139,11 +159,7 @@ def validate_api_key(api_key: str) -> Optional[Dict]:
 
 
 def revoke_api_key(api_key: str) -> bool:
-    key_hash = store._hash(api_key)
-    if key_hash in store.api_keys:
-        del store.api_keys[key_hash]
-        return True
-    return False
+    return store.remove_api_key(store._hash(api_key))
 
 
 # ============== FASTAPI DEPENDENCIES ==============
@@ -126,7 +126,7 @@ async def delete_api_key(
     # Find key by name
     for key_hash, data in list(store.api_keys.items()):
         if data["name"] == key_name:
-            del store.api_keys[key_hash]
+            store.remove_api_key(key_hash)
             return {"message": f"API Key '{key_name}' revoked"}
     
     raise HTTPException(status_code=404, detail="API Key not found")
@@ -8,12 +8,17 @@ Features:
 - Rate limiting por IP/client
 - Métricas de cache (hits/misses)
 - TTL configurável
+- Cliente assíncrono (redis.asyncio) com pool de conexões
+- Cache L1 em processo (LRU + TTL) na frente do Redis
 """
 
 import redis
+import redis.asyncio as aioredis
 import json
 import hashlib
-from typing import Optional, Any, Dict
+import time
+from collections import OrderedDict
+from typing import Optional, Any, Dict, List, Tuple, Hashable
 from datetime import datetime
 import os
 
@@ -250,8 +255,436 @@ class RedisCache:
         }, ttl)
 
 
+# ============== CACHE L1 (EM PROCESSO) ==============
+
+class LocalCache:
+    """
+    Cache em memória com despejo LRU por tamanho e TTL por entrada.
+    
+    Usado como L1 na frente do Redis: respostas repetidas saem em
+    microssegundos, sem serialização JSON, hash MD5 nem round trip.
+    """
+    
+    def __init__(self, max_entries: int = 10_000, default_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Busca valor; expirados contam como miss e são removidos"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return None
+        
+        self._data.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: float = None) -> None:
+        """Salva valor, despejando o menos usado se estiver cheio"""
+        ttl = self.default_ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        self.stats["sets"] += 1
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    def clear(self) -> None:
+        self._data.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.default_ttl,
+            "hit_rate": round(self.stats["hits"] / max(total, 1) * 100, 2)
+        }
+
+
+# ============== CLIENTE ASSÍNCRONO ==============
+
+# INCR + EXPIRE (se chave nova) + TTL em um único round trip atômico
+RATE_LIMIT_LUA = """
+local current = redis.call('INCR', KEYS[1])
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    ttl = tonumber(ARGV[1])
+end
+return {current, ttl}
+"""
+
+
+class AsyncRedisCache:
+    """
+    Cliente assíncrono para uso dentro dos handlers FastAPI.
+    
+    Mesmas operações do RedisCache, mas como coroutines — por isso não é
+    subclasse dele (um AsyncRedisCache não substitui um RedisCache).
+    Compõe o cliente redis.asyncio e o L1 em processo, sem bloquear o
+    event loop:
+    - Pool de conexões redis.asyncio compartilhado
+    - Rate limit em um único EVALSHA (script Lua)
+    - Leituras/escritas em lote via MGET e pipeline
+    - L1 em processo consultado antes do Redis para resultados de transação
+    """
+    
+    def __init__(
+        self,
+        host: str = None,
+        port: int = 6379,
+        db: int = 0,
+        default_ttl: int = 300,
+        prefix: str = "guardian",
+        max_connections: int = None,
+        l1_max_entries: int = None,
+        l1_ttl: float = None
+    ):
+        # A conexão é feita em connect()
+        self.host = host or os.getenv("REDIS_HOST", "guardian-redis")
+        self.port = port
+        self.db = db
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.max_connections = max_connections or int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+        
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "errors": 0
+        }
+        
+        self.l1 = LocalCache(
+            max_entries=l1_max_entries or int(os.getenv("CACHE_L1_MAX_ENTRIES", 10_000)),
+            default_ttl=l1_ttl or float(os.getenv("CACHE_L1_TTL", 30))
+        )
+        
+        self.pool: Optional[aioredis.ConnectionPool] = None
+        self.client: Optional[aioredis.Redis] = None
+        self.connected = False
+        self._rate_limit_script = None
+    
+    async def connect(self) -> bool:
+        """Cria o pool e testa a conexão"""
+        try:
+            self.pool = aioredis.ConnectionPool(
+                host=self.host,
+                port=self.port,
+                db=self.db,
+                decode_responses=True,
+                max_connections=self.max_connections,
+                socket_connect_timeout=5,
+                socket_timeout=5
+            )
+            self.client = aioredis.Redis(connection_pool=self.pool)
+            await self.client.ping()
+            self._rate_limit_script = self.client.register_script(RATE_LIMIT_LUA)
+            self.connected = True
+            print(f"✅ Redis (async) conectado: {self.host}:{self.port} (pool={self.max_connections})")
+        except (redis.ConnectionError, redis.TimeoutError, OSError) as e:
+            print(f"⚠️ Redis não disponível: {e}")
+            await self.close()
+        return self.connected
+    
+    async def close(self) -> None:
+        """Fecha o pool de conexões"""
+        if self.client is not None:
+            try:
+                await self.client.aclose()
+            except Exception:
+                pass
+        if self.pool is not None:
+            await self.pool.disconnect()
+        self.client = None
+        self.pool = None
+        self.connected = False
+    
+    def _make_key(self, key: str) -> str:
+        """Cria chave com prefixo"""
+        return f"{self.prefix}:{key}"
+    
+    # ============== CACHE BÁSICO ==============
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Busca valor do cache"""
+        if not self.connected:
+            return None
+        
+        try:
+            value = await self.client.get(self._make_key(key))
+            if value:
+                self.stats["hits"] += 1
+                return json.loads(value)
+            self.stats["misses"] += 1
+            return None
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Cache get error: {e}")
+            return None
+    
+    async def set(self, key: str, value: Any, ttl: int = None) -> bool:
+        """Salva valor no cache"""
+        if not self.connected:
+            return False
+        
+        try:
+            await self.client.setex(self._make_key(key), ttl or self.default_ttl, json.dumps(value))
+            self.stats["sets"] += 1
+            return True
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Cache set error: {e}")
+            return False
+    
+    async def delete(self, key: str) -> bool:
+        """Remove valor do cache"""
+        if not self.connected:
+            return False
+        
+        try:
+            await self.client.delete(self._make_key(key))
+            return True
+        except Exception:
+            self.stats["errors"] += 1
+            return False
+    
+    async def flush(self) -> bool:
+        """Limpa o banco Redis"""
+        self.l1.clear()
+        if not self.connected:
+            return False
+        await self.client.flushdb()
+        return True
+    
+    # ============== CACHE DE TRANSAÇÕES ==============
+    
+    @staticmethod
+    def _l1_key(tx_data: Dict) -> Tuple:
+        """Chave L1: a tupla crua (status, count, auth_code, merchant), sem serializar"""
+        return (
+            tx_data.get("status"), tx_data.get("count"), tx_data.get("auth_code"),
+            tx_data.get("merchant_id"), tx_data.get("merchant_category")
+        )
+    
+    @staticmethod
+    def result_key(tx_data: Dict) -> Tuple:
+        """Identidade do resultado em cache: transações com a mesma chave recebem o mesmo veredito"""
+        return AsyncRedisCache._l1_key(tx_data)
+    
+    @staticmethod
+    def _redis_key(tx_data: Dict) -> str:
+        """Chave Redis do resultado: hash da mesma tupla do L1 (sem timestamp)"""
+        digest = hashlib.md5(json.dumps(AsyncRedisCache._l1_key(tx_data), default=str).encode()).hexdigest()[:12]
+        return f"tx:{digest}"
+    
+    def _l1_ttl(self, ttl: int) -> float:
+        return min(ttl, self.l1.default_ttl)
+    
+    async def get_transaction_result(self, tx_data: Dict) -> Optional[Dict]:
+        """Busca resultado de análise: L1 em processo, depois Redis"""
+        l1_key = self._l1_key(tx_data)
+        value = self.l1.get(l1_key)
+        if value is not None:
+            return dict(value)
+        
+        value = await self.get(self._redis_key(tx_data))
+        if value is not None:
+            self.l1.set(l1_key, value)
+            return dict(value)
+        return None
+    
+    async def set_transaction_result(self, tx_data: Dict, result: Dict, ttl: int = 60) -> bool:
+        """Salva resultado de análise no L1 e no Redis (TTL curto - 60s)"""
+        self.l1.set(self._l1_key(tx_data), result, self._l1_ttl(ttl))
+        return await self.set(self._redis_key(tx_data), result, ttl)
+    
+    async def get_transaction_results(self, tx_list: List[Dict]) -> List[Optional[Dict]]:
+        """Busca vários resultados: L1 primeiro, um único MGET para o restante"""
+        results: List[Optional[Dict]] = [None] * len(tx_list)
+        missing = []
+        for i, tx in enumerate(tx_list):
+            value = self.l1.get(self._l1_key(tx))
+            if value is not None:
+                results[i] = dict(value)
+            else:
+                missing.append(i)
+        
+        if not self.connected or not missing:
+            return results
+        
+        try:
+            keys = [self._make_key(self._redis_key(tx_list[i])) for i in missing]
+            values = await self.client.mget(keys)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Cache mget error: {e}")
+            return results
+        
+        for i, value in zip(missing, values):
+            if value:
+                self.stats["hits"] += 1
+                decoded = json.loads(value)
+                self.l1.set(self._l1_key(tx_list[i]), decoded)
+                results[i] = dict(decoded)
+            else:
+                self.stats["misses"] += 1
+        return results
+    
+    async def set_transaction_results(self, items: List[Tuple[Dict, Dict]], ttl: int = 60) -> bool:
+        """Salva vários resultados no L1 e em um único pipeline Redis (um round trip)"""
+        for tx_data, result in items:
+            self.l1.set(self._l1_key(tx_data), result, self._l1_ttl(ttl))
+        
+        if not self.connected or not items:
+            return False
+        
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for tx_data, result in items:
+                pipe.setex(self._make_key(self._redis_key(tx_data)), ttl, json.dumps(result))
+            await pipe.execute()
+            self.stats["sets"] += len(items)
+            return True
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Cache pipeline error: {e}")
+            return False
+    
+    # ============== RATE LIMITING ==============
+    
+    async def check_rate_limit(
+        self,
+        client_id: str,
+        limit: int = 100,
+        window: int = 60
+    ) -> Dict[str, Any]:
+        """
+        Verifica rate limit para um cliente (janela fixa, um round trip).
+        
+        Returns:
+            Dict com allowed, remaining, reset_in
+        """
+        if not self.connected:
+            return {"allowed": True, "remaining": limit, "reset_in": 0, "limit": limit}
+        
+        try:
+            key = self._make_key(f"ratelimit:{client_id}")
+            current_count, ttl = await self._rate_limit_script(keys=[key], args=[window])
+            
+            return {
+                "allowed": current_count <= limit,
+                "remaining": max(0, limit - current_count),
+                "reset_in": ttl if ttl > 0 else window,
+                "current": current_count,
+                "limit": limit
+            }
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Rate limit error: {e}")
+            return {"allowed": True, "remaining": limit, "reset_in": 0, "limit": limit}
+    
+    # ============== MÉTRICAS ==============
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache"""
+        total = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / max(total, 1)
+        
+        info = {}
+        if self.connected:
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                pipe.info("memory")
+                pipe.info("clients")
+                memory, clients = await pipe.execute()
+                info = {
+                    "used_memory": memory.get("used_memory_human", "N/A"),
+                    "connected_clients": clients.get("connected_clients", 0)
+                }
+            except Exception:
+                pass
+        
+        return {
+            "connected": self.connected,
+            "host": f"{self.host}:{self.port}",
+            "mode": "async",
+            "pool_size": self.max_connections,
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "sets": self.stats["sets"],
+            "errors": self.stats["errors"],
+            "hit_rate": round(hit_rate * 100, 2),
+            "redis_info": info,
+            "tiers": {
+                "l1": self.l1.get_stats(),
+                "redis": {
+                    "hits": self.stats["hits"],
+                    "misses": self.stats["misses"],
+                    "hit_rate": round(hit_rate * 100, 2)
+                }
+            }
+        }
+    
+    async def get_keys_count(self, pattern: str = "*") -> int:
+        """Conta chaves que correspondem ao padrão (SCAN, sem bloquear o Redis)"""
+        if not self.connected:
+            return 0
+        
+        try:
+            count = 0
+            async for _ in self.client.scan_iter(match=self._make_key(pattern), count=1000):
+                count += 1
+            return count
+        except Exception:
+            return 0
+    
+    # ============== CIRCUIT BREAKER STATE ==============
+    
+    async def get_circuit_state(self, service: str) -> str:
+        """Obtém estado do circuit breaker"""
+        state = await self.get(f"circuit:{service}")
+        return state.get("state", "closed") if state else "closed"
+    
+    async def set_circuit_state(
+        self,
+        service: str,
+        state: str,
+        failures: int = 0,
+        ttl: int = 300
+    ) -> bool:
+        """Define estado do circuit breaker"""
+        return await self.set(f"circuit:{service}", {
+            "state": state,
+            "failures": failures,
+            "updated_at": datetime.now().isoformat()
+        }, ttl)
+
+
 # Singleton para uso global
 _cache_instance = None
+_async_cache_instance: Optional[AsyncRedisCache] = None
 
 def get_cache() -> RedisCache:
     """Retorna instância singleton do cache"""
@@ -259,3 +692,12 @@ def get_cache() -> RedisCache:
     if _cache_instance is None:
         _cache_instance = RedisCache()
     return _cache_instance
+
+
+async def get_async_cache() -> AsyncRedisCache:
+    """Retorna instância singleton do cache assíncrono (conecta na primeira chamada)"""
+    global _async_cache_instance
+    if _async_cache_instance is None:
+        _async_cache_instance = AsyncRedisCache()
+        await _async_cache_instance.connect()
+    return _async_cache_instance
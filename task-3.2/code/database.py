@@ -18,13 +18,15 @@ Uso:
 """
 
 import os
+import time
 import asyncio
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from dataclasses import dataclass, field
 from decimal import Decimal
 import asyncpg
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 
 # =============================================================================
@@ -39,9 +41,211 @@ DATABASE_CONFIG = {
     "database": os.getenv("DB_NAME", "transaction_guardian"),
     "min_size": int(os.getenv("DB_POOL_MIN", 5)),
     "max_size": int(os.getenv("DB_POOL_MAX", 20)),
+    # Statement cache por conexão (LRU do asyncpg): registro STATEMENTS + SQL dinâmico
+    "statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100)),
 }
 
 
+# Colunas gravadas em transactions (ordem usada por INSERT e COPY)
+TRANSACTION_COLUMNS = (
+    "timestamp", "status", "amount", "currency", "auth_code",
+    "merchant_id", "merchant_category", "is_anomaly", "anomaly_score",
+    "ml_score", "zscore", "detection_method", "transaction_count",
+)
+
+
+# Colunas devolvidas pelos exports (streaming)
+EXPORT_COLUMNS = ("id",) + TRANSACTION_COLUMNS
+
+
+# =============================================================================
+# Statement Registry
+# =============================================================================
+
+# Queries quentes: preparadas na primeira execução em cada conexão e mantidas
+# no statement cache do asyncpg (DATABASE_CONFIG["statement_cache_size"]).
+# Intervalos entram como parâmetro INTERVAL (timedelta), sem concatenar texto.
+STATEMENTS: Dict[str, str] = {
+    "insert_transaction": """
+        INSERT INTO transactions (
+            timestamp, status, amount, currency, auth_code,
+            merchant_id, merchant_category, is_anomaly, anomaly_score,
+            ml_score, zscore, detection_method, transaction_count
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+        RETURNING id
+    """,
+    "insert_transactions_batch": """
+        INSERT INTO transactions (
+            timestamp, status, amount, currency, auth_code,
+            merchant_id, merchant_category, is_anomaly, anomaly_score,
+            ml_score, zscore, detection_method, transaction_count
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+    """,
+    "insert_anomaly": """
+        INSERT INTO anomalies (
+            detected_at, anomaly_type, severity, combined_score,
+            ml_score, zscore, transaction_count, expected_count,
+            time_window_minutes, status, notes
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        RETURNING id
+    """,
+    "insert_anomalies_batch": """
+        INSERT INTO anomalies (
+            detected_at, anomaly_type, severity, combined_score,
+            ml_score, zscore, transaction_count, expected_count,
+            time_window_minutes, status, notes
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+    """,
+    "get_active_anomalies": """
+        SELECT * FROM anomalies
+        WHERE status IN ('open', 'acknowledged')
+        ORDER BY 
+            CASE severity 
+                WHEN 'critical' THEN 1 
+                WHEN 'high' THEN 2 
+                WHEN 'medium' THEN 3 
+                ELSE 4 
+            END,
+            detected_at DESC
+    """,
+    "resolve_anomaly": """
+        UPDATE anomalies
+        SET status = $1, resolved_at = NOW(), resolved_by = $2, notes = COALESCE($3, notes)
+        WHERE id = $4
+    """,
+    "get_stats": """
+        SELECT 
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE status = 'approved') AS approved,
+            COUNT(*) FILTER (WHERE status = 'denied') AS denied,
+            COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+            COUNT(*) FILTER (WHERE status = 'reversed') AS reversed,
+            COUNT(*) FILTER (WHERE is_anomaly = TRUE) AS anomalies,
+            COALESCE(SUM(amount), 0) AS total_amount,
+            COALESCE(AVG(amount), 0) AS avg_amount
+        FROM transactions
+        WHERE timestamp > NOW() - $1::INTERVAL
+    """,
+    "get_hourly_metrics": """
+        SELECT * FROM transactions_per_hour
+        WHERE bucket > NOW() - $1::INTERVAL
+        ORDER BY bucket DESC
+    """,
+    "get_minute_metrics": """
+        SELECT * FROM transactions_per_minute
+        WHERE bucket > NOW() - $1::INTERVAL
+        ORDER BY bucket DESC
+    """,
+    "get_minute_counts": """
+        SELECT
+            time_bucket('1 minute', timestamp) AS bucket,
+            SUM(transaction_count) FILTER (WHERE status = 'approved') AS approved,
+            SUM(transaction_count) FILTER (WHERE status = 'denied') AS denied,
+            SUM(transaction_count) FILTER (WHERE status = 'failed') AS failed
+        FROM transactions
+        WHERE timestamp >= $1
+        GROUP BY bucket
+        ORDER BY bucket
+    """,
+    "check_volume_anomaly": "SELECT * FROM check_volume_anomaly($1, $2)",
+    "get_approval_rate": "SELECT * FROM get_approval_rate($1, $2)",
+    "health_ping": "SELECT 1",
+    "count_transactions": "SELECT COUNT(*) FROM transactions",
+    "count_open_anomalies": "SELECT COUNT(*) FROM anomalies WHERE status = 'open'",
+}
+
+
+# Continuous aggregates por tier: (view, largura do bucket em segundos)
+ROLLUP_VIEWS = {
+    "minute": ("transactions_per_minute", 60),
+    "hour": ("transactions_per_hour", 3600),
+}
+
+# Buckets materializados desde $1 + cauda ainda não materializada, agregada
+# da tabela crua no mesmo bucket. Com real-time aggregation o último bucket
+# já vem da view e a cauda fica vazia.
+ROLLUP_QUERY = """
+    WITH rollup AS (
+        SELECT bucket, total, approved, denied, failed, reversed, refunded, anomalies,
+               volume, volume_sq, min_count, max_count, total_amount
+        FROM {view}
+        WHERE bucket >= $1
+    ),
+    watermark AS (
+        SELECT COALESCE(MAX(bucket) + INTERVAL '{width} seconds', $1) AS ts FROM rollup
+    ),
+    tail AS (
+        SELECT
+            to_timestamp(floor(extract(epoch FROM timestamp) / {width}) * {width}) AS bucket,
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE status = 'approved') AS approved,
+            COUNT(*) FILTER (WHERE status = 'denied') AS denied,
+            COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+            COUNT(*) FILTER (WHERE status = 'reversed') AS reversed,
+            COUNT(*) FILTER (WHERE status = 'refunded') AS refunded,
+            COUNT(*) FILTER (WHERE is_anomaly = TRUE) AS anomalies,
+            SUM(transaction_count) AS volume,
+            SUM(transaction_count::BIGINT * transaction_count) AS volume_sq,
+            MIN(transaction_count) AS min_count,
+            MAX(transaction_count) AS max_count,
+            SUM(amount) AS total_amount
+        FROM transactions
+        WHERE timestamp >= (SELECT ts FROM watermark)
+        GROUP BY 1
+    )
+    SELECT * FROM rollup
+    UNION ALL
+    SELECT * FROM tail
+    ORDER BY bucket
+"""
+
+for _tier, (_view, _width) in ROLLUP_VIEWS.items():
+    STATEMENTS[f"rollup_{_tier}"] = ROLLUP_QUERY.format(view=_view, width=_width)
+
+
+class StatementStats:
+    """Latência de um statement: totais + janela recente para percentis"""
+    
+    __slots__ = ("count", "errors", "total_seconds", "samples")
+    
+    def __init__(self, window: int = 2048):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.samples = deque(maxlen=window)
+    
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.samples.append(seconds)
+    
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        
+        def pct(q: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 6),
+            "p50": round(pct(0.50), 6),
+            "p95": round(pct(0.95), 6),
+            "p99": round(pct(0.99), 6),
+        }
+
+
+# Compartilhado por todas as instâncias (API, write-behind, exports)
+QUERY_STATS: Dict[str, StatementStats] = {}
+
+
+def get_query_stats() -> Dict[str, Dict[str, float]]:
+    """Latências por statement (p50/p95/p99 em segundos)"""
+    return {name: stats.summary() for name, stats in sorted(QUERY_STATS.items())}
+
+
 # =============================================================================
 # Data Models
 # =============================================================================
@@ -60,6 +264,7 @@ class Transaction:
     ml_score: Optional[Decimal] = None
     zscore: Optional[Decimal] = None
     detection_method: Optional[str] = None
+    transaction_count: int = 1  # Transações agregadas no registro (campo `count` da API)
     timestamp: datetime = field(default_factory=datetime.utcnow)
     id: Optional[int] = None
 
@@ -100,6 +305,7 @@ class Stats:
 # Database Class
 # =============================================================================
 
+
 class Database:
     """
     Classe principal para operações com TimescaleDB.
@@ -142,47 +348,136 @@ class Database:
         async with self.pool.acquire() as conn:
             yield conn
     
+    # =========================================================================
+    # Statement Timing
+    # =========================================================================
+    
+    @contextmanager
+    def _timed(self, name: str):
+        """Mede a latência de uma operação em QUERY_STATS[name]."""
+        stats = QUERY_STATS.get(name)
+        if stats is None:
+            stats = QUERY_STATS[name] = StatementStats()
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.observe(time.perf_counter() - start)
+    
+    async def _run(self, name: str, method: str, *args, query: Optional[str] = None):
+        """
+        Executa uma query do registro pelo nome e mede a latência.
+        `query` executa SQL dinâmico medido sob o mesmo nome.
+        """
+        async with self.connection() as conn:
+            with self._timed(name):
+                return await getattr(conn, method)(query or STATEMENTS[name], *args)
+    
     # =========================================================================
     # Transactions
     # =========================================================================
     
     async def insert_transaction(self, tx: Transaction) -> int:
         """Insere uma transação e retorna o ID."""
-        query = """
-            INSERT INTO transactions (
-                timestamp, status, amount, currency, auth_code,
-                merchant_id, merchant_category, is_anomaly, anomaly_score,
-                ml_score, zscore, detection_method
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
-            RETURNING id
-        """
-        async with self.connection() as conn:
-            row = await conn.fetchrow(
-                query,
-                tx.timestamp, tx.status, tx.amount, tx.currency, tx.auth_code,
-                tx.merchant_id, tx.merchant_category, tx.is_anomaly, tx.anomaly_score,
-                tx.ml_score, tx.zscore, tx.detection_method
-            )
-            return row['id']
+        row = await self._run(
+            "insert_transaction", "fetchrow",
+            tx.timestamp, tx.status, tx.amount, tx.currency, tx.auth_code,
+            tx.merchant_id, tx.merchant_category, tx.is_anomaly, tx.anomaly_score,
+            tx.ml_score, tx.zscore, tx.detection_method, tx.transaction_count
+        )
+        return row['id']
     
     async def insert_transactions_batch(self, transactions: List[Transaction]) -> int:
         """Insere múltiplas transações em batch. Retorna quantidade inserida."""
-        query = """
-            INSERT INTO transactions (
-                timestamp, status, amount, currency, auth_code,
-                merchant_id, merchant_category, is_anomaly, anomaly_score,
-                ml_score, zscore, detection_method
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
-        """
         data = [
             (tx.timestamp, tx.status, tx.amount, tx.currency, tx.auth_code,
              tx.merchant_id, tx.merchant_category, tx.is_anomaly, tx.anomaly_score,
-             tx.ml_score, tx.zscore, tx.detection_method)
+             tx.ml_score, tx.zscore, tx.detection_method, tx.transaction_count)
             for tx in transactions
         ]
+        await self._run("insert_transactions_batch", "executemany", data)
+        return len(data)
+    
+    async def copy_transactions(self, records: List[tuple]) -> int:
+        """
+        Insere transações via COPY binário (copy_records_to_table).
+        
+        Muito mais rápido que executemany para cargas grandes. Cada record
+        é uma tupla na ordem de TRANSACTION_COLUMNS.
+        """
+        async with self.connection() as conn:
+            with self._timed("copy_transactions"):
+                await conn.copy_records_to_table(
+                    "transactions", records=records, columns=TRANSACTION_COLUMNS
+                )
+            return len(records)
+    
+    # =========================================================================
+    # Migration Checkpoints
+    # =========================================================================
+    
+    async def ensure_migration_checkpoints(self) -> None:
+        """Cria a tabela de checkpoints de migração se não existir."""
+        query = """
+            CREATE TABLE IF NOT EXISTS migration_checkpoints (
+                source TEXT NOT NULL,
+                chunk_start BIGINT NOT NULL,
+                chunk_end BIGINT NOT NULL,
+                rows_loaded INTEGER NOT NULL,
+                completed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (source, chunk_start)
+            )
+        """
+        async with self.connection() as conn:
+            await conn.execute(query)
+    
+    async def get_migration_checkpoints(self, source: str) -> List[tuple]:
+        """Retorna os chunks (início, fim) já concluídos de uma origem."""
+        query = """
+            SELECT chunk_start, chunk_end FROM migration_checkpoints
+            WHERE source = $1
+            ORDER BY chunk_start
+        """
+        async with self.connection() as conn:
+            rows = await conn.fetch(query, source)
+            return [(row['chunk_start'], row['chunk_end']) for row in rows]
+    
+    async def clear_migration_checkpoints(self, source: str) -> None:
+        """Remove os checkpoints de uma origem (recomeçar do zero)."""
+        async with self.connection() as conn:
+            await conn.execute("DELETE FROM migration_checkpoints WHERE source = $1", source)
+    
+    async def copy_transactions_checkpointed(
+        self,
+        records: List[tuple],
+        source: str,
+        chunk_start: int,
+        chunk_end: int
+    ) -> int:
+        """
+        COPY de um chunk + registro do checkpoint na mesma transação.
+        
+        Ou o chunk inteiro entra junto com o checkpoint, ou nada entra —
+        uma migração retomada nunca duplica nem perde linhas.
+        """
         async with self.connection() as conn:
-            await conn.executemany(query, data)
-            return len(data)
+            with self._timed("copy_transactions_checkpointed"):
+                async with conn.transaction():
+                    if records:
+                        await conn.copy_records_to_table(
+                            "transactions", records=records, columns=TRANSACTION_COLUMNS
+                        )
+                    await conn.execute(
+                        """
+                        INSERT INTO migration_checkpoints (source, chunk_start, chunk_end, rows_loaded)
+                        VALUES ($1, $2, $3, $4)
+                        """,
+                        source, chunk_start, chunk_end, len(records)
+                    )
+            return len(records)
     
     async def get_recent_transactions(
         self, 
@@ -209,9 +504,73 @@ class Database:
         query += f" ORDER BY timestamp DESC LIMIT ${param_idx}"
         params.append(limit)
         
+        # SQL dinâmico: usa o cache de statements do asyncpg, medido pelo nome
+        rows = await self._run("get_recent_transactions", "fetch", *params, query=query)
+        return [dict(row) for row in rows]
+    
+    # =========================================================================
+    # Streaming (server-side cursors)
+    # =========================================================================
+    
+    async def stream_query(
+        self,
+        query: str,
+        *params,
+        batch_size: int = 5000
+    ) -> AsyncIterator[List[asyncpg.Record]]:
+        """
+        Executa a query com cursor server-side e gera lotes de registros.
+        
+        Apenas um lote fica em memória por vez; a conexão permanece
+        reservada (em transação read-only) até o gerador terminar.
+        
+        Exemplo:
+            async for rows in db.stream_query("SELECT * FROM transactions"):
+                process(rows)
+        """
         async with self.connection() as conn:
-            rows = await conn.fetch(query, *params)
-            return [dict(row) for row in rows]
+            async with conn.transaction(readonly=True):
+                cursor = await conn.cursor(query, *params)
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+    
+    async def stream_transactions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        status: Optional[str] = None,
+        only_anomalies: bool = False,
+        batch_size: int = 5000
+    ) -> AsyncIterator[List[asyncpg.Record]]:
+        """Gera lotes de transações de um período, em ordem cronológica."""
+        query = f"""
+            SELECT {", ".join(EXPORT_COLUMNS)} FROM transactions
+            WHERE 1=1
+        """
+        params = []
+        
+        if start:
+            params.append(start)
+            query += f" AND timestamp >= ${len(params)}"
+        
+        if end:
+            params.append(end)
+            query += f" AND timestamp < ${len(params)}"
+        
+        if status:
+            params.append(status)
+            query += f" AND status = ${len(params)}"
+        
+        if only_anomalies:
+            query += " AND is_anomaly = TRUE"
+        
+        query += " ORDER BY timestamp"
+        
+        async for rows in self.stream_query(query, *params, batch_size=batch_size):
+            yield rows
     
     # =========================================================================
     # Anomalies
@@ -219,41 +578,30 @@ class Database:
     
     async def insert_anomaly(self, anomaly: Anomaly) -> int:
         """Insere uma anomalia detectada."""
-        query = """
-            INSERT INTO anomalies (
-                detected_at, anomaly_type, severity, combined_score,
-                ml_score, zscore, transaction_count, expected_count,
-                time_window_minutes, status, notes
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-            RETURNING id
-        """
-        async with self.connection() as conn:
-            row = await conn.fetchrow(
-                query,
-                anomaly.detected_at, anomaly.anomaly_type, anomaly.severity,
-                anomaly.combined_score, anomaly.ml_score, anomaly.zscore,
-                anomaly.transaction_count, anomaly.expected_count,
-                anomaly.time_window_minutes, anomaly.status, anomaly.notes
-            )
-            return row['id']
+        row = await self._run(
+            "insert_anomaly", "fetchrow",
+            anomaly.detected_at, anomaly.anomaly_type, anomaly.severity,
+            anomaly.combined_score, anomaly.ml_score, anomaly.zscore,
+            anomaly.transaction_count, anomaly.expected_count,
+            anomaly.time_window_minutes, anomaly.status, anomaly.notes
+        )
+        return row['id']
+    
+    async def insert_anomalies_batch(self, anomalies: List[Anomaly]) -> int:
+        """Insere múltiplas anomalias em batch. Retorna quantidade inserida."""
+        data = [
+            (a.detected_at, a.anomaly_type, a.severity, a.combined_score,
+             a.ml_score, a.zscore, a.transaction_count, a.expected_count,
+             a.time_window_minutes, a.status, a.notes)
+            for a in anomalies
+        ]
+        await self._run("insert_anomalies_batch", "executemany", data)
+        return len(data)
     
     async def get_active_anomalies(self) -> List[Dict]:
         """Busca anomalias não resolvidas."""
-        query = """
-            SELECT * FROM anomalies
-            WHERE status IN ('open', 'acknowledged')
-            ORDER BY 
-                CASE severity 
-                    WHEN 'critical' THEN 1 
-                    WHEN 'high' THEN 2 
-                    WHEN 'medium' THEN 3 
-                    ELSE 4 
-                END,
-                detected_at DESC
-        """
-        async with self.connection() as conn:
-            rows = await conn.fetch(query)
-            return [dict(row) for row in rows]
+        rows = await self._run("get_active_anomalies", "fetch")
+        return [dict(row) for row in rows]
     
     async def resolve_anomaly(
         self, 
@@ -263,14 +611,8 @@ class Database:
         notes: Optional[str] = None
     ) -> bool:
         """Marca uma anomalia como resolvida."""
-        query = """
-            UPDATE anomalies
-            SET status = $1, resolved_at = NOW(), resolved_by = $2, notes = COALESCE($3, notes)
-            WHERE id = $4
-        """
-        async with self.connection() as conn:
-            result = await conn.execute(query, status, resolved_by, notes, anomaly_id)
-            return result == "UPDATE 1"
+        result = await self._run("resolve_anomaly", "execute", status, resolved_by, notes, anomaly_id)
+        return result == "UPDATE 1"
     
     # =========================================================================
     # Statistics
@@ -278,61 +620,49 @@ class Database:
     
     async def get_stats(self, hours: int = 1) -> Stats:
         """Busca estatísticas agregadas das últimas N horas."""
-        query = """
-            SELECT 
-                COUNT(*) AS total,
-                COUNT(*) FILTER (WHERE status = 'approved') AS approved,
-                COUNT(*) FILTER (WHERE status = 'denied') AS denied,
-                COUNT(*) FILTER (WHERE status = 'failed') AS failed,
-                COUNT(*) FILTER (WHERE status = 'reversed') AS reversed,
-                COUNT(*) FILTER (WHERE is_anomaly = TRUE) AS anomalies,
-                COALESCE(SUM(amount), 0) AS total_amount,
-                COALESCE(AVG(amount), 0) AS avg_amount
-            FROM transactions
-            WHERE timestamp > NOW() - ($1 || ' hours')::INTERVAL
-        """
-        async with self.connection() as conn:
-            row = await conn.fetchrow(query, str(hours))
-            
-            total = row['total'] or 0
-            approved = row['approved'] or 0
-            approval_rate = (approved / total * 100) if total > 0 else 0
-            tx_per_min = total / (hours * 60) if hours > 0 else 0
-            
-            return Stats(
-                total_transactions=total,
-                approved=approved,
-                denied=row['denied'] or 0,
-                failed=row['failed'] or 0,
-                reversed=row['reversed'] or 0,
-                approval_rate=round(approval_rate, 2),
-                anomaly_count=row['anomalies'] or 0,
-                total_amount=row['total_amount'],
-                avg_amount=row['avg_amount'],
-                transactions_per_minute=round(tx_per_min, 2)
-            )
+        row = await self._run("get_stats", "fetchrow", timedelta(hours=hours))
+        total = row['total'] or 0
+        approved = row['approved'] or 0
+        approval_rate = (approved / total * 100) if total > 0 else 0
+        tx_per_min = total / (hours * 60) if hours > 0 else 0
+        
+        return Stats(
+            total_transactions=total,
+            approved=approved,
+            denied=row['denied'] or 0,
+            failed=row['failed'] or 0,
+            reversed=row['reversed'] or 0,
+            approval_rate=round(approval_rate, 2),
+            anomaly_count=row['anomalies'] or 0,
+            total_amount=row['total_amount'],
+            avg_amount=row['avg_amount'],
+            transactions_per_minute=round(tx_per_min, 2)
+        )
     
     async def get_hourly_metrics(self, hours: int = 24) -> List[Dict]:
         """Busca métricas agregadas por hora."""
-        query = """
-            SELECT * FROM transactions_per_hour
-            WHERE bucket > NOW() - ($1 || ' hours')::INTERVAL
-            ORDER BY bucket DESC
-        """
-        async with self.connection() as conn:
-            rows = await conn.fetch(query, str(hours))
-            return [dict(row) for row in rows]
+        rows = await self._run("get_hourly_metrics", "fetch", timedelta(hours=hours))
+        return [dict(row) for row in rows]
     
     async def get_minute_metrics(self, minutes: int = 60) -> List[Dict]:
         """Busca métricas agregadas por minuto."""
-        query = """
-            SELECT * FROM transactions_per_minute
-            WHERE bucket > NOW() - ($1 || ' minutes')::INTERVAL
-            ORDER BY bucket DESC
+        rows = await self._run("get_minute_metrics", "fetch", timedelta(minutes=minutes))
+        return [dict(row) for row in rows]
+    
+    async def get_rollup_buckets(self, tier: str, start: datetime) -> List[Dict]:
+        """Buckets do tier ("minute"/"hour") desde `start`, incluindo a cauda recente."""
+        if tier not in ROLLUP_VIEWS:
+            raise ValueError(f"Tier desconhecido: {tier}")
+        rows = await self._run(f"rollup_{tier}", "fetch", start)
+        return [dict(row) for row in rows]
+    
+    async def get_minute_counts(self, start: datetime) -> List[Dict]:
         """
-        async with self.connection() as conn:
-            rows = await conn.fetch(query, str(minutes))
-            return [dict(row) for row in rows]
+        Volume por minuto e status desde `start`, somando `transaction_count`
+        (a escala do campo `count` da API, não o número de linhas).
+        """
+        rows = await self._run("get_minute_counts", "fetch", start)
+        return [dict(row) for row in rows]
     
     # =========================================================================
     # Anomaly Detection Helpers
@@ -344,10 +674,8 @@ class Database:
         threshold: float = 2.5
     ) -> Dict:
         """Verifica se há anomalia de volume usando função do banco."""
-        query = "SELECT * FROM check_volume_anomaly($1, $2)"
-        async with self.connection() as conn:
-            row = await conn.fetchrow(query, window_minutes, threshold)
-            return dict(row)
+        row = await self._run("check_volume_anomaly", "fetchrow", window_minutes, threshold)
+        return dict(row)
     
     async def get_approval_rate(
         self, 
@@ -358,10 +686,8 @@ class Database:
         start = start_time or (datetime.utcnow() - timedelta(hours=1))
         end = end_time or datetime.utcnow()
         
-        query = "SELECT * FROM get_approval_rate($1, $2)"
-        async with self.connection() as conn:
-            row = await conn.fetchrow(query, start, end)
-            return dict(row)
+        row = await self._run("get_approval_rate", "fetchrow", start, end)
+        return dict(row)
     
     # =========================================================================
     # Health Check
@@ -370,22 +696,19 @@ class Database:
     async def health_check(self) -> Dict:
         """Verifica saúde da conexão com o banco."""
         try:
-            async with self.connection() as conn:
-                # Verificar conexão básica
-                await conn.fetchval("SELECT 1")
-                
-                # Contar registros
-                tx_count = await conn.fetchval("SELECT COUNT(*) FROM transactions")
-                anomaly_count = await conn.fetchval(
-                    "SELECT COUNT(*) FROM anomalies WHERE status = 'open'"
-                )
-                
-                return {
-                    "status": "healthy",
-                    "database": "connected",
-                    "transactions_total": tx_count,
-                    "open_anomalies": anomaly_count
-                }
+            # Verificar conexão básica
+            await self._run("health_ping", "fetchval")
+            
+            # Contar registros
+            tx_count = await self._run("count_transactions", "fetchval")
+            anomaly_count = await self._run("count_open_anomalies", "fetchval")
+            
+            return {
+                "status": "healthy",
+                "database": "connected",
+                "transactions_total": tx_count,
+                "open_anomalies": anomaly_count
+            }
         except Exception as e:
             return {
                 "status": "unhealthy",
@@ -404,11 +727,20 @@ async def get_database() -> Database:
     """Retorna instância singleton do banco."""
     global _db_instance
     if _db_instance is None:
-        _db_instance = Database()
-        await _db_instance.connect()
+        db = Database()
+        await db.connect()
+        _db_instance = db
     return _db_instance
 
 
+async def close_database() -> None:
+    """Fecha a instância singleton, se existir."""
+    global _db_instance
+    if _db_instance is not None:
+        await _db_instance.close()
+        _db_instance = None
+
+
 # =============================================================================
 # CLI para testes
 # =============================================================================
@@ -0,0 +1,280 @@
+"""
+🧩 Detector Shards
+==================
+Baselines do detector por chave (merchant_id ou merchant_category).
+
+Um merchant de 5 tx/min e outro de 5.000 tx/min na mesma EWMA deixam a
+média sem sentido para os dois. Transações com chave são pontuadas contra
+a baseline da própria chave; as sem chave seguem no detector global.
+
+- Estado por chave mínimo: média, desvio e taxa de aprovação móveis,
+  contagem de observações, anomalias e último acesso
+- Struct-of-arrays: um array NumPy por campo, pré-alocado com
+  DETECTOR_SHARDS_MAX posições (~70 bytes por chave); a chave só guarda
+  o índice do slot
+- Criação preguiçosa na primeira transação da chave; as primeiras
+  `warmup` observações formam a baseline (média/variância exatas) e só
+  então a chave passa a gerar z-score e regras de spike/queda
+- Despejo LRU quando os slots acabam, e por ociosidade
+  (DETECTOR_SHARD_IDLE_TTL): chave que volta depois disso recomeça a baseline
+- Lotes: as linhas de cada chave passam pela mesma EWMA vetorizada do
+  detector global
+
+Configuração (env):
+    DETECTOR_SHARD_BY=merchant_id
+    DETECTOR_SHARDS_MAX=10000
+    DETECTOR_SHARD_IDLE_TTL=3600
+
+CloudWalk Task 3.2
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .snapshot import pack_json, unpack_json
+
+SHARD_BY = os.getenv("DETECTOR_SHARD_BY", "merchant_id")
+
+# Campos do struct-of-arrays (float64, exceto os contadores)
+FLOAT_FIELDS = ("mean", "m2", "std", "approval", "last_seen")
+INT_FIELDS = ("n", "anomalies")
+
+
+def shard_key(tx_data: Dict[str, Any]) -> Optional[str]:
+    """Chave do shard de uma transação (None = detector global)"""
+    value = tx_data.get(SHARD_BY)
+    return str(value) if value not in (None, "") else None
+
+
+class DetectorShards:
+    """
+    Registro de baselines por chave com despejo LRU.
+
+    Exemplo:
+        shards = DetectorShards(alpha=0.1, ewma=detector._ewma, ewma_std=detector._ewma_std)
+        mean, std, approval, warm = shards.observe("MERCHANT_001", 42, "approved")
+    """
+
+    def __init__(
+        self,
+        alpha: float,
+        ewma: Callable[[np.ndarray, float], np.ndarray],
+        ewma_std: Callable[[np.ndarray, float], np.ndarray],
+        capacity: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        warmup: int = 10
+    ):
+        self.alpha = alpha
+        self._ewma = ewma
+        self._ewma_std = ewma_std
+        self.capacity = capacity or int(os.getenv("DETECTOR_SHARDS_MAX", 10_000))
+        self.idle_ttl = idle_ttl or float(os.getenv("DETECTOR_SHARD_IDLE_TTL", 3600))
+        self.warmup = warmup
+
+        self.slots: "OrderedDict[str, int]" = OrderedDict()  # Chave → slot, menos recente primeiro
+        self._free: List[int] = list(range(self.capacity - 1, -1, -1))
+        for field in FLOAT_FIELDS:
+            setattr(self, field, np.zeros(self.capacity, dtype=np.float64))
+        for field in INT_FIELDS:
+            setattr(self, field, np.zeros(self.capacity, dtype=np.int64))
+
+        self.stats = {
+            "created": 0,
+            "evicted_lru": 0,
+            "evicted_idle": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.slots
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(getattr(self, field).nbytes for field in FLOAT_FIELDS + INT_FIELDS)
+
+    def clear(self) -> None:
+        self.slots.clear()
+        self._free = list(range(self.capacity - 1, -1, -1))
+        for field in FLOAT_FIELDS + INT_FIELDS:
+            getattr(self, field)[:] = 0
+
+    # ============== SLOTS ==============
+
+    def _slot(self, key: str, now: float) -> int:
+        """Slot da chave (move para o fim da LRU); cria se necessário"""
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.slots.move_to_end(key)
+            if now - self.last_seen[slot] > self.idle_ttl:
+                self._reset_slot(slot)  # Baseline velha demais: recomeça
+                self.stats["evicted_idle"] += 1
+            return slot
+
+        self._evict_idle(now)
+        if not self._free:
+            _, oldest = self.slots.popitem(last=False)
+            self._free.append(oldest)
+            self.stats["evicted_lru"] += 1
+        slot = self._free.pop()
+        self._reset_slot(slot)
+        self.slots[key] = slot
+        self.stats["created"] += 1
+        return slot
+
+    def _reset_slot(self, slot: int) -> None:
+        for field in FLOAT_FIELDS + INT_FIELDS:
+            getattr(self, field)[slot] = 0
+
+    def _evict_idle(self, now: float) -> None:
+        """Remove chaves ociosas a partir do início da LRU (O(despejadas))"""
+        cutoff = now - self.idle_ttl
+        while self.slots:
+            key, slot = next(iter(self.slots.items()))
+            if self.last_seen[slot] >= cutoff:
+                break
+            del self.slots[key]
+            self._free.append(slot)
+            self.stats["evicted_idle"] += 1
+
+    # ============== OBSERVAÇÃO ==============
+
+    def _observe_slot(self, slot: int, count: float, approved: float) -> None:
+        """Welford durante o warm-up, depois a mesma EWMA do detector global"""
+        self.n[slot] += 1
+        n = self.n[slot]
+        if n <= self.warmup:
+            delta = count - self.mean[slot]
+            self.mean[slot] += delta / n
+            self.m2[slot] += delta * (count - self.mean[slot])
+            self.approval[slot] += (approved - self.approval[slot]) / n
+            self.std[slot] = max(np.sqrt(self.m2[slot] / n), 1.0)
+            return
+        mean = (1 - self.alpha) * self.mean[slot] + self.alpha * count
+        variance = (count - mean) ** 2
+        new_var = (1 - self.alpha) * self.std[slot] ** 2 + self.alpha * variance
+        self.mean[slot] = mean
+        self.std[slot] = max(np.sqrt(new_var), 1.0)
+        self.approval[slot] = (1 - self.alpha) * self.approval[slot] + self.alpha * approved
+
+    def observe(self, key: str, count: float, status: str) -> Tuple[float, float, float, bool]:
+        """
+        Registra uma transação da chave.
+
+        Returns:
+            (média, desvio, taxa de aprovação, baseline pronta) já incluindo a transação
+        """
+        now = time.time()
+        slot = self._slot(key, now)
+        self._observe_slot(slot, float(count), 1.0 if status == "approved" else 0.0)
+        self.last_seen[slot] = now
+        return (
+            float(self.mean[slot]), float(self.std[slot]),
+            float(self.approval[slot]), bool(self.n[slot] >= self.warmup)
+        )
+
+    def observe_many(
+        self, keys: Sequence[str], counts: np.ndarray, statuses: Sequence[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Versão em lote de observe(): arrays por linha, na ordem recebida.
+
+        Linhas da mesma chave são processadas em ordem; passado o warm-up,
+        a recorrência roda vetorizada por chave.
+        """
+        n = len(counts)
+        values = np.asarray(counts, dtype=float)
+        approved = (np.asarray(statuses, dtype=object) == "approved").astype(float)
+        means = np.empty(n)
+        stds = np.empty(n)
+        approvals = np.empty(n)
+        warm = np.empty(n, dtype=bool)
+
+        groups: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(key, []).append(i)
+
+        now = time.time()
+        for key, rows in groups.items():
+            slot = self._slot(key, now)
+            rows = np.asarray(rows)
+            k = min(len(rows), max(0, self.warmup - int(self.n[slot])))
+            for row in rows[:k]:
+                self._observe_slot(slot, values[row], approved[row])
+                means[row], stds[row], approvals[row] = self.mean[slot], self.std[slot], self.approval[slot]
+                warm[row] = self.n[slot] >= self.warmup
+            if k < len(rows):
+                rest = rows[k:]
+                m = self._ewma(values[rest], self.mean[slot])
+                s = self._ewma_std((values[rest] - m) ** 2, self.std[slot])
+                a = self._ewma(approved[rest], self.approval[slot])
+                means[rest], stds[rest], approvals[rest] = m, s, a
+                warm[rest] = True
+                self.mean[slot], self.std[slot], self.approval[slot] = m[-1], s[-1], a[-1]
+                self.n[slot] += len(rest)
+            self.last_seen[slot] = now
+        return means, stds, approvals, warm
+
+    def record_anomalies(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            slot = self.slots.get(key)
+            if slot is not None:
+                self.anomalies[slot] += 1
+
+    # ============== CONSULTA ==============
+
+    def describe(self, key: str) -> Optional[Dict[str, Any]]:
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        return {
+            "key": key,
+            "observations": int(self.n[slot]),
+            "warm": bool(self.n[slot] >= self.warmup),
+            "running_mean": round(float(self.mean[slot]), 2),
+            "running_std": round(float(self.std[slot]), 2),
+            "approval_rate": round(float(self.approval[slot]), 4),
+            "anomalies": int(self.anomalies[slot]),
+            "idle_seconds": round(time.time() - float(self.last_seen[slot]), 1),
+        }
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Chaves usadas mais recentemente"""
+        keys = list(self.slots)[-limit:] if limit > 0 else []
+        return [self.describe(key) for key in reversed(keys)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "shard_by": SHARD_BY,
+            "active": len(self.slots),
+            "capacity": self.capacity,
+            "idle_ttl_seconds": self.idle_ttl,
+            "warmup": self.warmup,
+            "memory_bytes": self.memory_bytes,
+            **self.stats
+        }
+
+    # ============== SNAPSHOT ==============
+
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        """Chaves em ordem LRU e os campos dos slots ocupados"""
+        slots = np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+        state = {"keys": pack_json(list(self.slots))}
+        for field in FLOAT_FIELDS + INT_FIELDS:
+            state[field] = getattr(self, field)[slots].copy()
+        return state
+
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.clear()
+        keys = unpack_json(state["keys"])
+        offset = max(0, len(keys) - self.capacity)  # Capacidade menor: mantém as mais recentes
+        for key in keys[offset:]:
+            self.slots[key] = self._free.pop()
+        slots = np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+        for field in FLOAT_FIELDS + INT_FIELDS:
+            getattr(self, field)[slots] = state[field][offset:]
@@ -0,0 +1,137 @@
+"""
+📤 Export Routes
+================
+Exportação de transações direto do cursor do TimescaleDB.
+
+Os dados saem em lotes (server-side cursor) e são escritos na resposta
+conforme chegam: a memória da API fica limitada a um lote, independente
+do tamanho do período exportado.
+
+Formatos:
+- csv: text/csv
+- arrow: Arrow IPC stream (requer pyarrow)
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import Optional, List
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from .auth import require_permission
+from .database import get_database, EXPORT_COLUMNS
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+router = APIRouter(prefix="/export", tags=["📤 Export"])
+
+MAX_BATCH_SIZE = 50_000
+
+
+def _arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("status", pa.string()),
+        ("amount", pa.decimal128(15, 2)),
+        ("currency", pa.string()),
+        ("auth_code", pa.string()),
+        ("merchant_id", pa.string()),
+        ("merchant_category", pa.string()),
+        ("is_anomaly", pa.bool_()),
+        ("anomaly_score", pa.decimal128(5, 4)),
+        ("ml_score", pa.decimal128(5, 4)),
+        ("zscore", pa.decimal128(10, 4)),
+        ("detection_method", pa.string()),
+        ("transaction_count", pa.int32()),
+    ])
+
+
+async def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+
+
+async def _arrow_chunks(batches):
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+    
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate(0)
+        return data
+    
+    yield drain()  # schema
+    async for rows in batches:
+        columns = list(zip(*rows))
+        arrays = [pa.array(column, type=field.type) for column, field in zip(columns, schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()  # marcador de fim do stream
+
+
+@router.get("/transactions")
+async def export_transactions(
+    start: Optional[datetime] = Query(None, description="Início (inclusivo), ISO 8601"),
+    end: Optional[datetime] = Query(None, description="Fim (exclusivo), ISO 8601"),
+    status: Optional[str] = None,
+    anomalies_only: bool = False,
+    format: str = Query("csv", pattern="^(csv|arrow)$"),
+    batch_size: int = Query(5000, ge=100, le=MAX_BATCH_SIZE),
+    user: dict = Depends(require_permission("read"))
+):
+    """
+    📤 Exporta transações de um período em streaming
+    
+    - **start/end**: Período (ISO 8601)
+    - **format**: `csv` ou `arrow` (Arrow IPC stream)
+    - **batch_size**: Linhas por lote lido do cursor
+    
+    Exemplo:
+        curl -H "X-API-Key: ..." "http://localhost:8000/export/transactions?start=2025-07-12&format=csv" -o tx.csv
+    """
+    if format == "arrow" and not PYARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="pyarrow não instalado - use format=csv")
+    
+    try:
+        db = await get_database()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"TimescaleDB indisponível: {e}")
+    
+    batches = db.stream_transactions(
+        start=start, end=end, status=status,
+        only_anomalies=anomalies_only, batch_size=batch_size
+    )
+    
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if format == "arrow":
+        return StreamingResponse(
+            _arrow_chunks(batches),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"Content-Disposition": f'attachment; filename="transactions_{stamp}.arrows"'}
+        )
+    return StreamingResponse(
+        _csv_chunks(batches),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="transactions_{stamp}.csv"'}
+    )
@@ -0,0 +1,344 @@
+"""
+⚙️ Job Executor
+===============
+Trabalho CPU-bound (treino MLflow, checagem de drift, fit do Shugo, lotes
+grandes) fora do event loop, em um ProcessPoolExecutor.
+
+- Cada tipo de job tem fila própria (limitada) e limite de concorrência:
+  um re-treino nunca ocupa os workers reservados aos lotes, e vice-versa
+- `submit` só enfileira e devolve o Job na hora (id para /jobs/{id});
+  fila cheia → JobQueueFull (a rota responde 503)
+- A função roda em outro processo: recebe e devolve apenas dados
+  (arrays, dicts). O `on_result` opcional roda de volta no event loop
+  para aplicar o resultado ao estado em memória (instalar um modelo,
+  registrar o lote) e pode ser async
+- `on_error` opcional: se a função falhar no pool, seu retorno substitui
+  o resultado (ex.: refazer o trabalho em thread) e segue para on_result,
+  para jobs cujo estado já foi adiantado e não podem ficar sem registro
+- Processos criados com "spawn": o fork de um processo com threads
+  (re-treino, writer) não é seguro. Se um processo morrer (OOM, kill)
+  o pool é recriado e só os jobs em andamento falham
+- Métricas por tipo: profundidade da fila, jobs rodando, totais por
+  desfecho, tempo de espera e de execução
+
+Configuração (env):
+    JOB_WORKERS=2                         # processos do pool
+    JOB_QUEUE_SIZE=32                     # jobs pendentes por tipo
+    JOB_CONCURRENCY=batch=2,default=1     # jobs simultâneos por tipo
+    JOB_HISTORY=500                       # jobs finalizados mantidos para consulta
+    JOB_START_METHOD=spawn
+
+CloudWalk Task 3.2
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import inspect
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobQueueFull(RuntimeError):
+    """Fila do tipo de job cheia"""
+
+
+def _parse_concurrency(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = max(1, int(value))
+    return limits
+
+
+# ============== JOB ==============
+
+class Job:
+    """Um job submetido e seu estado"""
+
+    def __init__(
+        self,
+        job_type: str,
+        fn: Callable,
+        args: tuple,
+        on_result: Optional[Callable],
+        on_error: Optional[Callable] = None
+    ):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.fn = fn
+        self.args = args
+        self.on_result = on_result
+        self.on_error = on_error
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "wait_seconds": round((self.started_at or time.time()) - self.submitted_at, 4),
+            "run_seconds": round((self.finished_at or time.time()) - self.started_at, 4) if self.started_at else None,
+            "status_url": f"/jobs/{self.id}",
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.status == SUCCEEDED:
+            data["result"] = self.result
+        return data
+
+
+# ============== EXECUTOR ==============
+
+class JobExecutor:
+    """
+    Filas por tipo de job sobre um ProcessPoolExecutor compartilhado.
+
+    Exemplo:
+        executor = get_executor()
+        await executor.start()
+        job = executor.submit("shugo_fit", fit_forecaster, start, values, config,
+                              on_result=shugo.install_model_state)
+        ...
+        await executor.stop()
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        concurrency: Optional[Dict[str, int]] = None
+    ):
+        self.workers = workers or int(os.getenv("JOB_WORKERS", 2))
+        self.queue_size = queue_size or int(os.getenv("JOB_QUEUE_SIZE", 32))
+        if concurrency is None:
+            concurrency = _parse_concurrency(os.getenv("JOB_CONCURRENCY", "batch=2,default=1"))
+        self.concurrency = concurrency
+        self.history = int(os.getenv("JOB_HISTORY", 500))
+        self.start_method = os.getenv("JOB_START_METHOD", "spawn")
+
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self._runners: Dict[str, List[asyncio.Task]] = {}
+        self.running: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.pool_restarts = 0
+
+    @property
+    def started(self) -> bool:
+        return self.pool is not None
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context(self.start_method)
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    async def start(self) -> None:
+        if self.pool is None:
+            self.pool = self._new_pool()
+            logger.info(f"⚙️ Job executor com {self.workers} processos ({self.start_method})")
+
+    async def stop(self) -> None:
+        """Cancela as filas e encerra o pool sem esperar jobs em andamento"""
+        for runners in self._runners.values():
+            for runner in runners:
+                runner.cancel()
+        for runners in self._runners.values():
+            await asyncio.gather(*runners, return_exceptions=True)
+        self._runners.clear()
+        self.queues.clear()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    # ============== SUBMISSÃO ==============
+
+    def _queue(self, job_type: str) -> asyncio.Queue:
+        """Fila do tipo, criada no primeiro uso com seus consumidores"""
+        queue = self.queues.get(job_type)
+        if queue is None:
+            queue = self.queues[job_type] = asyncio.Queue(maxsize=self.queue_size)
+            limit = self.concurrency.get(job_type, self.concurrency.get("default", 1))
+            self._runners[job_type] = [
+                asyncio.create_task(self._run(job_type, queue)) for _ in range(limit)
+            ]
+            self.running.setdefault(job_type, 0)
+            self.stats.setdefault(job_type, {
+                "submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0, "fallbacks": 0,
+                "wait_seconds_sum": 0.0, "run_seconds_sum": 0.0,
+            })
+        return queue
+
+    def full(self, job_type: str) -> bool:
+        """Fila do tipo sem espaço: o próximo submit levantaria JobQueueFull"""
+        queue = self.queues.get(job_type)
+        return queue is not None and queue.full()
+
+    def submit(
+        self,
+        job_type: str,
+        fn: Callable,
+        *args,
+        on_result: Optional[Callable[[Any], Any]] = None,
+        on_error: Optional[Callable[[BaseException], Any]] = None
+    ) -> Job:
+        """
+        Enfileira `fn(*args)` para rodar no pool.
+
+        `fn` precisa ser uma função de módulo (picklable). O valor final do
+        job é o retorno de `on_result(resultado)` quando informado; se `fn`
+        falhar e houver `on_error`, `on_error(exceção)` fornece o resultado.
+        """
+        if not self.started:
+            raise RuntimeError("JobExecutor não iniciado")
+        queue = self._queue(job_type)
+        job = Job(job_type, fn, args, on_result, on_error)
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats[job_type]["rejected"] += 1
+            raise JobQueueFull(f"Fila de jobs '{job_type}' cheia ({self.queue_size})")
+        self.stats[job_type]["submitted"] += 1
+        self.jobs[job.id] = job
+        self._trim_history()
+        return job
+
+    def _trim_history(self) -> None:
+        """Descarta os jobs finalizados mais antigos além de JOB_HISTORY"""
+        excess = len(self.jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished][:excess]:
+            del self.jobs[job_id]
+
+    async def _run(self, job_type: str, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        stats = self.stats[job_type]
+        while True:
+            job = await queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self.running[job_type] += 1
+            pool = self.pool
+            try:
+                try:
+                    result = await loop.run_in_executor(pool, job.fn, *job.args)
+                except BrokenProcessPool as e:
+                    self._restart_pool(pool)
+                    result = await self._fallback(job, e)
+                except Exception as e:
+                    result = await self._fallback(job, e)
+                if job.on_result is not None:
+                    result = job.on_result(result)
+                    if inspect.isawaitable(result):
+                        result = await result
+                job.result = result
+                job.status = SUCCEEDED
+                stats["succeeded"] += 1
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "cancelado no shutdown"
+                raise
+            except Exception as e:
+                job.status = FAILED
+                job.error = f"{type(e).__name__}: {e}"
+                stats["failed"] += 1
+                logger.error(f"Job {job.type} {job.id} falhou: {job.error}")
+            finally:
+                job.finished_at = time.time()
+                stats["wait_seconds_sum"] += job.started_at - job.submitted_at
+                stats["run_seconds_sum"] += job.finished_at - job.started_at
+                self.running[job_type] -= 1
+                job.fn = job.args = job.on_result = job.on_error = None  # Libera os dados de entrada
+                job.done.set()
+                queue.task_done()
+
+    def _restart_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Recria o pool quebrado (uma vez, mesmo com vários jobs afetados)"""
+        if self.pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+            self.pool_restarts += 1
+            logger.error("Processo do pool de jobs morreu; pool recriado")
+
+    async def _fallback(self, job: Job, error: BaseException) -> Any:
+        """Resultado de `on_error` para um job que falhou no pool (sem on_error: propaga)"""
+        if job.on_error is None:
+            raise error
+        logger.error(f"Job {job.type} {job.id} falhou no pool ({type(error).__name__}: {error}); usando fallback")
+        self.stats[job.type]["fallbacks"] += 1
+        result = job.on_error(error)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    # ============== CONSULTA ==============
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> bool:
+        """Espera o job por até `timeout` segundos; True se terminou"""
+        if timeout > 0 and not job.finished:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job.finished
+
+    def recent(self, limit: int = 50, job_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        jobs = [job for job in reversed(self.jobs.values()) if job_type is None or job.type == job_type]
+        return [job.to_dict(include_result=False) for job in jobs[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        types = {}
+        for job_type, stats in self.stats.items():
+            queue = self.queues.get(job_type)
+            types[job_type] = {
+                "queue_depth": queue.qsize() if queue is not None else 0,
+                "running": self.running.get(job_type, 0),
+                "concurrency": self.concurrency.get(job_type, self.concurrency.get("default", 1)),
+                **stats
+            }
+        return {
+            "started": self.started,
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "queue_size": self.queue_size,
+            "tracked_jobs": len(self.jobs),
+            "pool_restarts": self.pool_restarts,
+            "types": types,
+        }
+
+
+# ============== SINGLETON ==============
+
+_executor: Optional[JobExecutor] = None
+
+
+def get_executor() -> JobExecutor:
+    global _executor
+    if _executor is None:
+        _executor = JobExecutor()
+    return _executor
@@ -0,0 +1,69 @@
+"""
+⚙️ Job Routes
+=============
+Status dos jobs do JobExecutor (treino, drift, fit do Shugo, lotes grandes)
+
+    GET /jobs           → jobs recentes (sem resultado)
+    GET /jobs/{id}      → status, tempos e resultado quando concluído
+
+CloudWalk Task 3.2
+"""
+
+from typing import Any, Callable, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+from .job_executor import get_executor, Job, JobQueueFull
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+# ============== HELPERS ==============
+
+def submit_job(
+    job_type: str,
+    fn: Callable,
+    *args,
+    on_result: Optional[Callable[[Any], Any]] = None,
+    on_error: Optional[Callable[[BaseException], Any]] = None
+) -> Job:
+    """Submete ao executor; fila cheia vira 503"""
+    try:
+        return get_executor().submit(job_type, fn, *args, on_result=on_result, on_error=on_error)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def ensure_capacity(job_type: str) -> None:
+    """503 antes de qualquer efeito colateral quando a fila do tipo está cheia"""
+    executor = get_executor()
+    if executor.full(job_type):
+        raise HTTPException(status_code=503, detail=f"Fila de jobs '{job_type}' cheia ({executor.queue_size})")
+
+
+async def job_response(job: Job, wait: float = 0.0) -> JSONResponse:
+    """
+    200 com o resultado se o job terminar em até `wait` segundos,
+    senão 202 com o id para acompanhar em /jobs/{id}
+    """
+    finished = await get_executor().wait(job, wait)
+    return JSONResponse(status_code=200 if finished else 202, content=job.to_dict())
+
+
+# ============== ENDPOINTS ==============
+
+@router.get("")
+async def list_jobs(limit: int = Query(50, ge=1, le=500), type: Optional[str] = None):
+    """📋 Jobs mais recentes e estatísticas por tipo"""
+    executor = get_executor()
+    return {"jobs": executor.recent(limit, type), "executor": executor.get_stats()}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """🔎 Status de um job"""
+    job = get_executor().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job não encontrado: {job_id}")
+    return job.to_dict()
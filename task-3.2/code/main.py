@@ -11,28 +11,45 @@ Phase 2: Performance
 Author: Sérgio (Candidate for Monitoring Intelligence Analyst)
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response, Request
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response, Request, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import PlainTextResponse, StreamingResponse
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 import asyncio
 import json
+import pickle
 import sys
 import os
 
 # Import local modules
-from .anomaly_detector import AnomalyDetector
+from .anomaly_detector import AnomalyDetector, build_results_chunks
 from .alert_manager import AlertManager
-from .cache import get_cache, RedisCache
+from .cache import get_async_cache, AsyncRedisCache
+from .ring_buffer import TransactionRing
+from .rollups import RollupEngine
+from .model_trainer import RetrainScheduler
+from .rate_limiter import RateLimiter, EXEMPT_PATHS
+from .persistence import WriteBehindWriter, FLUSH_BUCKETS
+from .sse_hub import SSEHub
+from .ws_stream import WebSocketHub
+from .detector_shards import shard_key
+from .snapshot import SnapshotManager, prefixed, section, pack_json, unpack_json
+from .shared_state import SharedState
+from .job_executor import get_executor
+from .job_routes import router as jobs_router, submit_job, job_response, ensure_capacity
+from .stream_ingest import get_decoder, encode_line, StreamDecodeError, DuplexStreamingResponse
 from .auth_routes import router as auth_router
 from .mlops_routes import router as mlops_router
 from .telegram_bot import send_anomaly_alert, get_bot
 from .telegram_routes import router as telegram_router
 from .ai_summary_routes import router as ai_router
 from .shugo_routes import router as shugo_router
+from .export_routes import router as export_router
+from .database import close_database, get_query_stats
+from .stats_service import get_stats_service, parse_window
 from .shugo import get_shugo
 from .auth import get_optional_user
 
@@ -48,15 +65,18 @@ Sistema de monitoramento de transações em tempo real com detecção de anomali
 ### 🎯 Funcionalidades:
 - **POST /transaction** - Recebe dados de transação e retorna análise
 - **POST /transactions/batch** - Processa múltiplas transações
+- **POST /transactions/stream** - Ingestão NDJSON/msgpack com vereditos em streaming
 - **GET /anomalies** - Lista anomalias detectadas
 - **GET /metrics** - Métricas Prometheus
 - **GET /health** - Health check
 - **GET /stream** - SSE real-time updates
+- **WS /ws/stream** - Eventos filtrados (nível/status/score) em lotes JSON ou msgpack
+- **GET /export/transactions** - Export CSV/Arrow em streaming do TimescaleDB
 
 ### 🚀 Phase 2 Features:
-- **Redis Cache** - Respostas em cache para performance
-- **Rate Limiting** - Proteção contra abuso (100 req/min)
-- **Cache Stats** - Métricas de cache (GET /cache/stats)
+- **Redis Cache** - Respostas em cache para performance (cliente async com pool)
+- **Rate Limiting** - Token bucket local por cliente/rota (100 req/min padrão), sync com Redis
+- **Cache Stats** - Métricas de cache por camada L1/Redis (GET /cache/stats)
 
 ### 🔐 Phase 3 Features:
 - **JWT Authentication** - Login com token (POST /auth/login)
@@ -79,6 +99,8 @@ app.include_router(mlops_router)
 app.include_router(telegram_router)
 app.include_router(ai_router)
 app.include_router(shugo_router)
+app.include_router(export_router)
+app.include_router(jobs_router)
 
 # CORS
 app.add_middleware(
@@ -98,14 +120,20 @@ app.include_router(auth_router)
 class AppState:
     def __init__(self):
         self.detector = AnomalyDetector()
+        self.trainer = RetrainScheduler(self.detector)
         self.alert_manager = AlertManager()
-        self.cache: RedisCache = None
+        self.cache: AsyncRedisCache = None
+        self.rate_limiter = RateLimiter()
+        self.writer = WriteBehindWriter()
         self.start_time = datetime.now()
         self.transactions_processed = 0
         self.anomalies_detected = 0
-        self.recent_transactions: List[Dict] = []
+        self.recent_transactions = TransactionRing(capacity=1000, windows=(50, 100))
+        self.rollups = RollupEngine()
         self.recent_anomalies: List[Dict] = []
-        self.sse_clients: List[asyncio.Queue] = []
+        self.recent_anomalies_appended = 0  # Registros adicionados por este worker (monotônico)
+        self.sse = SSEHub()
+        self.ws = WebSocketHub()
         
         self.metrics = {
             "total_transactions": 0,
@@ -115,8 +143,43 @@ class AppState:
             "avg_count": 0,
             "approval_rate": 0,
         }
+    
+    def snapshot_state(self) -> Dict[str, Any]:
+        state = {
+            "counters": pack_json({
+                "transactions_processed": self.transactions_processed,
+                "anomalies_detected": self.anomalies_detected,
+                "metrics": self.metrics,
+                "recent_anomalies": self.recent_anomalies,
+            })
+        }
+        state.update(prefixed(self.recent_transactions.snapshot_state(), "recent"))
+        return state
+    
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        counters = unpack_json(state["counters"])
+        self.transactions_processed = counters["transactions_processed"]
+        self.anomalies_detected = counters["anomalies_detected"]
+        self.metrics = counters["metrics"]
+        self.recent_anomalies = counters["recent_anomalies"]
+        self.recent_transactions.restore_state(section(state, "recent"))
+    
+    def warm_start(self, counts, statuses, timestamps) -> None:
+        self.recent_transactions.extend(counts, statuses, timestamps)
 
 state = AppState()
+# Multi-worker: contadores, histórico e modelo reconciliados via Redis; só o escritor treina
+state.shared = SharedState(state)
+state.trainer.should_fit = lambda: state.shared.is_writer
+# Trabalho CPU-bound (treinos, drift, lotes grandes) em processos separados
+state.jobs = get_executor()
+get_shugo().attach_rollups(state.rollups)
+state.snapshots = SnapshotManager({
+    "app": state,
+    "detector": state.detector,
+    "rollups": state.rollups,
+    "shugo": get_shugo(),
+})
 
 # ============== MODELS ==============
 
@@ -132,10 +195,30 @@ class TransactionInput(BaseModel):
     status: TransactionStatus = Field(..., description="Status da transação")
     count: int = Field(default=1, ge=0, description="Número de transações")
     auth_code: Optional[str] = Field(default="00", description="Código de autorização")
+    merchant_id: Optional[str] = Field(default=None, description="Merchant (chave do shard do detector)")
+    merchant_category: Optional[str] = Field(default=None, description="Categoria do merchant")
+
+def transaction_data(tx: TransactionInput) -> Dict[str, Any]:
+    """Dict da transação usado por detector, cache e persistência"""
+    return {
+        "timestamp": tx.timestamp or datetime.now().isoformat(),
+        "status": tx.status.value,
+        "count": tx.count,
+        "auth_code": tx.auth_code,
+        "merchant_id": tx.merchant_id,
+        "merchant_category": tx.merchant_category,
+    }
 
 class BatchInput(BaseModel):
     transactions: List[TransactionInput]
 
+# Registros por micro-lote em /transactions/stream
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 1000))
+# Lotes a partir deste tamanho montam os resultados no pool de processos (202 + job)
+JOB_BATCH_MIN_ROWS = int(os.getenv("JOB_BATCH_MIN_ROWS", 5000))
+# Linhas registradas por vez ao aplicar um lote do pool (devolve o loop entre blocos)
+JOB_RECORD_CHUNK = 500
+
 class AnomalyResponse(BaseModel):
     is_anomaly: bool
     alert_level: str
@@ -160,39 +243,40 @@ def update_metrics(status: str, count: int, is_anomaly: bool):
     state.metrics["approval_rate"] = round(approved / max(total, 1), 4)
     
     if state.recent_transactions:
-        counts = [t.get("count", 0) for t in state.recent_transactions[-100:]]
-        state.metrics["avg_count"] = sum(counts) / len(counts)
+        state.metrics["avg_count"] = state.recent_transactions.window_mean(100)
 
 async def broadcast_event(event_type: str, data: dict):
-    for queue in state.sse_clients:
-        await queue.put({"type": event_type, "data": data})
+    # Não bloqueia: serializa uma vez e enfileira (fila limitada por cliente)
+    state.sse.publish(event_type, data)
+    state.ws.publish(event_type, data)
 
 # ============== RATE LIMIT MIDDLEWARE ==============
 
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
-    if request.url.path in ["/health", "/metrics", "/docs", "/openapi.json", "/redoc"]:
+    if request.url.path in EXEMPT_PATHS:
         return await call_next(request)
     
     client_ip = request.client.host if request.client else "unknown"
+    rate_check = await state.rate_limiter.check(client_ip, request.url.path)
+    headers = {
+        "X-RateLimit-Limit": str(rate_check["limit"]),
+        "X-RateLimit-Remaining": str(rate_check["remaining"]),
+        "X-RateLimit-Reset": str(rate_check["reset_in"]),
+    }
     
-    if state.cache and state.cache.connected:
-        rate_check = state.cache.check_rate_limit(client_id=client_ip, limit=100, window=60)
-        
-        response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(rate_check["limit"])
-        response.headers["X-RateLimit-Remaining"] = str(rate_check["remaining"])
-        response.headers["X-RateLimit-Reset"] = str(rate_check["reset_in"])
-        
-        if not rate_check["allowed"]:
-            return Response(
-                content=json.dumps({"error": "Rate limit exceeded", "retry_after": rate_check["reset_in"]}),
-                status_code=429,
-                media_type="application/json"
-            )
-        return response
+    # Rejeita antes do handler: tráfego acima do limite não consome análise
+    if not rate_check["allowed"]:
+        return Response(
+            content=json.dumps({"error": "Rate limit exceeded", "retry_after": rate_check["reset_in"]}),
+            status_code=429,
+            media_type="application/json",
+            headers={**headers, "Retry-After": str(rate_check["reset_in"])}
+        )
     
-    return await call_next(request)
+    response = await call_next(request)
+    response.headers.update(headers)
+    return response
 
 # ============== ENDPOINTS ==============
 
@@ -209,46 +293,48 @@ async def root():
 @app.get("/health", tags=["Health"])
 async def health_check():
     cache_status = "healthy" if (state.cache and state.cache.connected) else "disconnected"
+    if not state.writer.enabled:
+        persistence_status = "disabled"
+    elif state.writer.stats["dropped"] or state.writer.queue_depth >= state.writer.queue_size * 0.8:
+        persistence_status = "degraded"
+    else:
+        persistence_status = "healthy" if state.writer.db_connected else "spilling"
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "uptime_seconds": (datetime.now() - state.start_time).total_seconds(),
-        "components": {"api": "healthy", "detector": "healthy", "cache": cache_status},
+        "components": {"api": "healthy", "detector": "healthy", "cache": cache_status, "persistence": persistence_status},
         "version": "2.0.0"
     }
 
 @app.post("/transaction", response_model=AnomalyResponse, tags=["Transactions"])
 async def analyze_transaction(tx: TransactionInput, background_tasks: BackgroundTasks):
-    tx_data = {
-        "timestamp": tx.timestamp or datetime.now().isoformat(),
-        "status": tx.status.value,
-        "count": tx.count,
-        "auth_code": tx.auth_code
-    }
+    tx_data = transaction_data(tx)
     
-    # Check cache
-    if state.cache and state.cache.connected:
-        cached_result = state.cache.get_transaction_result(tx_data)
-        if cached_result:
-            cached_result["cached"] = True
-            return AnomalyResponse(**cached_result)
-    
-    # Process
-    historical = [t.get("count", 100) for t in state.recent_transactions[-50:]] or [100]
-    result = state.detector.analyze(
-        current_count=tx.count,
-        status=tx.status.value,
-        auth_code=tx.auth_code,
-        historical_counts=historical
-    )
+    # Check cache (L1 em processo funciona mesmo sem Redis): um hit só dispensa a
+    # pontuação; a transação continua sendo contada, persistida e transmitida
+    cached_result = await state.cache.get_transaction_result(tx_data) if state.cache else None
+    if cached_result is not None:
+        result = cached_result
+    else:
+        historical = state.recent_transactions.counts(50) if state.recent_transactions else [100]
+        result = state.detector.analyze(
+            current_count=tx.count,
+            status=tx.status.value,
+            auth_code=tx.auth_code,
+            historical_counts=historical,
+            shard_key=shard_key(tx_data)
+        )
     
     state.transactions_processed += 1
-    state.recent_transactions.append(tx_data)
-    if len(state.recent_transactions) > 1000:
-        state.recent_transactions = state.recent_transactions[-500:]
+    state.recent_transactions.append(tx.count, tx.status.value)
+    state.rollups.add(tx.count, tx.status.value)
     
     update_metrics(tx.status.value, tx.count, result["is_anomaly"])
     
+    # Persistência write-behind (só enfileira)
+    state.writer.record(tx_data, result)
+    
     # Alimentar Shugo com observação
     get_shugo().add_observation(datetime.now(), tx.count, tx.status.value)
     
@@ -262,6 +348,7 @@ async def analyze_transaction(tx: TransactionInput, background_tasks: Background
             "transaction": tx_data
         }
         state.recent_anomalies.append(anomaly_record)
+        state.recent_anomalies_appended += 1
         if len(state.recent_anomalies) > 100:
             state.recent_anomalies = state.recent_anomalies[-50:]
         background_tasks.add_task(broadcast_event, "anomaly", anomaly_record)
@@ -276,48 +363,254 @@ async def analyze_transaction(tx: TransactionInput, background_tasks: Background
         "rule_violations": result["rule_violations"],
         "recommendation": result["recommendation"],
         "metrics": result["metrics"],
-        "cached": False
+        "cached": cached_result is not None
     }
     
     # Save to cache
-    if state.cache and state.cache.connected:
-        state.cache.set_transaction_result(tx_data, response_data, ttl=60)
+    if state.cache and cached_result is None:
+        await state.cache.set_transaction_result(tx_data, response_data, ttl=60)
     
     return AnomalyResponse(**response_data)
 
+def batch_columns(tx_list: List[Dict], pending: Optional[List] = None) -> Dict[str, Any]:
+    """Argumentos de analyze_batch/prepare_batch para um lote (ou só para as linhas `pending` dele)"""
+    rows = tx_list if pending is None else [tx_data for _, tx_data in pending]
+    columns = {
+        "counts": [tx_data["count"] for tx_data in rows],
+        "statuses": [tx_data["status"] for tx_data in rows],
+        "auth_codes": [tx_data["auth_code"] for tx_data in rows],
+        "historical_counts": state.recent_transactions.counts(50),
+        "shard_keys": [shard_key(tx_data) for tx_data in rows],
+    }
+    if pending is not None:
+        # O lote inteiro (hits e repetições inclusive) entra na janela recente
+        columns["batch_counts"] = [tx_data["count"] for tx_data in tx_list]
+        columns["batch_positions"] = [i for i, _ in pending]
+    return columns
+
+def analyze_and_record(tx_list: List[Dict]) -> List[Dict]:
+    """Analisa um lote com o caminho vetorizado e atualiza o estado global"""
+    analyses = state.detector.analyze_batch(**batch_columns(tx_list))
+    record_analyses(tx_list, analyses)
+    return analyses
+
+def record_analyses(tx_list: List[Dict], analyses: List[Dict], window: bool = True) -> None:
+    """Contadores, janela recente, rollups e persistência de um lote analisado"""
+    for tx_data, result in zip(tx_list, analyses):
+        state.transactions_processed += 1
+        if window:  # False: o lote já entrou na janela recente ao ser submetido
+            state.recent_transactions.append(tx_data["count"], tx_data["status"])
+        update_metrics(tx_data["status"], tx_data["count"], result["is_anomaly"])
+        if result["is_anomaly"]:
+            state.anomalies_detected += 1
+    
+    state.rollups.add_many(
+        [tx_data["count"] for tx_data in tx_list],
+        [tx_data["status"] for tx_data in tx_list]
+    )
+    state.writer.record_many(tx_list, analyses)
+
+async def record_batch_rows(results: List[Optional[Dict]], pending: List, analyses: List[Dict]) -> int:
+    """Preenche as linhas analisadas da resposta de /transactions/batch e grava o cache; retorna as anomalias"""
+    anomaly_count = 0
+    to_cache = []
+    for (i, tx_data), result in zip(pending, analyses):
+        if result["is_anomaly"]:
+            anomaly_count += 1
+        
+        if state.cache is not None:
+            to_cache.append((tx_data, {"is_anomaly": result["is_anomaly"], "alert_level": result["alert_level"], "anomaly_score": result["anomaly_score"], "rule_violations": result["rule_violations"], "recommendation": result["recommendation"], "metrics": result["metrics"]}))
+        
+        results[i] = {"timestamp": tx_data["timestamp"], "is_anomaly": result["is_anomaly"], "alert_level": result["alert_level"], "score": result["anomaly_score"], "cached": False}
+    
+    # Escritas de cache das linhas em um único pipeline
+    if to_cache:
+        await state.cache.set_transaction_results(to_cache, ttl=60)
+    return anomaly_count
+
+def row_results(cached_results: List[Optional[Dict]], pending: List, duplicates: List, analyses: List[Dict]) -> List[Dict]:
+    """Resultado completo de cada linha do lote: do cache, da análise ou da primeira ocorrência"""
+    rows = list(cached_results)
+    for (i, _), result in zip(pending, analyses):
+        rows[i] = result
+    for i, first in duplicates:
+        rows[i] = rows[first]
+    return rows
+
+def fill_duplicates(results: List[Optional[Dict]], tx_list: List[Dict], duplicates: List) -> int:
+    """Repetições dentro do lote recebem o veredito da primeira ocorrência, como hits de cache; retorna as anomalias"""
+    anomaly_count = 0
+    for i, first in duplicates:
+        results[i] = {**results[first], "timestamp": tx_list[i]["timestamp"], "cached": True}
+        if results[i]["is_anomaly"]:
+            anomaly_count += 1
+    return anomaly_count
+
+def batch_summary(results: List[Optional[Dict]], anomaly_count: int, cache_hits: int) -> Dict[str, Any]:
+    return {"processed": len(results), "anomalies_found": anomaly_count, "anomaly_rate": anomaly_count / max(len(results), 1), "cache_hits": cache_hits, "results": results}
+
+def submit_batch_job(
+    results: List[Optional[Dict]], tx_list: List[Dict], cached_results: List[Optional[Dict]],
+    pending: List, duplicates: List, anomaly_count: int, cache_hits: int
+):
+    """
+    Lote grande: o estado do detector é atualizado aqui (EWMA, quantis,
+    shards, em ordem), a montagem dos resultados roda no pool e o
+    registro volta ao loop em blocos de JOB_RECORD_CHUNK.
+    
+    Fila cheia responde 503 antes de tocar no detector. O lote entra na
+    janela recente já na submissão, junto com o histórico do detector, e
+    se o pool falhar os resultados são montados em thread: o registro
+    acontece de qualquer forma.
+    """
+    ensure_capacity("batch")
+    pending_tx = [tx_data for _, tx_data in pending]
+    prepared = state.detector.prepare_batch(**batch_columns(tx_list, pending))
+    state.recent_transactions.extend(
+        [tx_data["count"] for tx_data in tx_list],
+        [tx_data["status"] for tx_data in tx_list]
+    )
+    
+    def build_in_thread(error: BaseException):
+        return asyncio.to_thread(build_results_chunks, state.detector.config, prepared, JOB_RECORD_CHUNK)
+    
+    async def apply(chunks: List[bytes]) -> Dict[str, Any]:
+        anomalies = anomaly_count
+        analyses: List[Dict] = []
+        for start, chunk in zip(range(0, len(pending_tx), JOB_RECORD_CHUNK), chunks):
+            rows = pickle.loads(chunk)
+            anomalies += await record_batch_rows(results, pending[start:start + len(rows)], rows)
+            analyses.extend(rows)
+            await asyncio.sleep(0)
+        state.detector.record_shard_anomalies(prepared, analyses)
+        anomalies += fill_duplicates(results, tx_list, duplicates)
+        rows = row_results(cached_results, pending, duplicates, analyses)
+        for start in range(0, len(tx_list), JOB_RECORD_CHUNK):
+            end = start + JOB_RECORD_CHUNK
+            record_analyses(tx_list[start:end], rows[start:end], window=False)
+            await asyncio.sleep(0)
+        return batch_summary(results, anomalies, cache_hits)
+    
+    return submit_job(
+        "batch", build_results_chunks, state.detector.config, prepared, JOB_RECORD_CHUNK,
+        on_result=apply, on_error=build_in_thread
+    )
+
 @app.post("/transactions/batch", tags=["Transactions"])
-async def analyze_batch(batch: BatchInput, background_tasks: BackgroundTasks):
-    results = []
+async def analyze_batch(batch: BatchInput, background_tasks: BackgroundTasks, wait: float = Query(0.0, ge=0, le=60)):
+    """
+    Lotes com JOB_BATCH_MIN_ROWS ou mais transações não cacheadas
+    respondem 202 com o id do job (resultado em /jobs/{id}).
+    """
+    results: List[Optional[Dict]] = [None] * len(batch.transactions)
     anomaly_count = 0
     cache_hits = 0
     
-    for tx in batch.transactions:
-        tx_data = {"timestamp": tx.timestamp or datetime.now().isoformat(), "status": tx.status.value, "count": tx.count, "auth_code": tx.auth_code}
-        
-        cached = state.cache.get_transaction_result(tx_data) if (state.cache and state.cache.connected) else None
+    # 1. Cache: um MGET para o lote inteiro, separa hits das transações a analisar
+    tx_list = [transaction_data(tx) for tx in batch.transactions]
+    cache_enabled = state.cache is not None
+    cached_results = await state.cache.get_transaction_results(tx_list) if cache_enabled else [None] * len(tx_list)
+    
+    pending = []
+    # Repetições de uma linha pendente seriam hit de cache no caminho sequencial
+    duplicates = []
+    first_seen: Dict[Any, int] = {}
+    for i, (tx_data, cached) in enumerate(zip(tx_list, cached_results)):
         if cached:
             cache_hits += 1
             if cached.get("is_anomaly"): anomaly_count += 1
-            results.append({"timestamp": tx_data["timestamp"], "is_anomaly": cached["is_anomaly"], "alert_level": cached["alert_level"], "score": cached["anomaly_score"], "cached": True})
+            results[i] = {"timestamp": tx_data["timestamp"], "is_anomaly": cached["is_anomaly"], "alert_level": cached["alert_level"], "score": cached["anomaly_score"], "cached": True}
             continue
+        if cache_enabled:
+            first = first_seen.setdefault(state.cache.result_key(tx_data), i)
+            if first != i:
+                cache_hits += 1
+                duplicates.append((i, first))
+                continue
+        pending.append((i, tx_data))
+    
+    # 2. Lote grande: resultados montados no pool de processos
+    if len(pending) >= JOB_BATCH_MIN_ROWS:
+        job = submit_batch_job(results, tx_list, cached_results, pending, duplicates, anomaly_count, cache_hits)
+        return await job_response(job, wait)
+    
+    # 3. Análise vetorizada de todas as transações não cacheadas
+    analyses = []
+    if pending:
+        analyses = state.detector.analyze_batch(**batch_columns(tx_list, pending))
+        anomaly_count += await record_batch_rows(results, pending, analyses)
+    anomaly_count += fill_duplicates(results, tx_list, duplicates)
+    
+    # 4. Todas as linhas (hits inclusive) entram em contadores, janela, rollups e persistência
+    record_analyses(tx_list, row_results(cached_results, pending, duplicates, analyses))
+    
+    return batch_summary(results, anomaly_count, cache_hits)
+
+@app.post("/transactions/stream", tags=["Transactions"])
+async def analyze_stream(request: Request):
+    """
+    🌊 Ingestão contínua de transações.
+    
+    Corpo em NDJSON (`application/x-ndjson`, um TransactionInput por linha) ou
+    msgpack com prefixo de tamanho (`application/x-msgpack`). Os registros são
+    analisados em micro-lotes à medida que chegam e cada veredito volta como
+    uma linha NDJSON; a última linha traz o resumo.
+    
+    Exemplo:
+        curl -N -X POST http://localhost:8000/transactions/stream \\
+             -H "Content-Type: application/x-ndjson" --data-binary @transactions.ndjson
+    """
+    try:
+        decoder = get_decoder(request.headers.get("content-type", ""))
+    except RuntimeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    async def verdicts():
+        summary = {"processed": 0, "anomalies_found": 0, "errors": 0}
         
-        historical = [t.get("count", 100) for t in state.recent_transactions[-50:]] or [100]
-        result = state.detector.analyze(current_count=tx.count, status=tx.status.value, auth_code=tx.auth_code, historical_counts=historical)
-        
-        state.transactions_processed += 1
-        state.recent_transactions.append(tx_data)
-        update_metrics(tx.status.value, tx.count, result["is_anomaly"])
-        
-        if result["is_anomaly"]:
-            anomaly_count += 1
-            state.anomalies_detected += 1
+        def run_batch(records) -> List[bytes]:
+            lines, valid = [], []
+            for seq, obj in records:
+                if isinstance(obj, StreamDecodeError):
+                    summary["errors"] += 1
+                    lines.append((seq, {"seq": seq, "error": str(obj)}))
+                    continue
+                try:
+                    tx = TransactionInput(**obj)
+                except ValidationError as e:
+                    summary["errors"] += 1
+                    lines.append((seq, {"seq": seq, "error": e.errors(include_url=False)}))
+                    continue
+                valid.append((seq, transaction_data(tx)))
+            
+            if valid:
+                analyses = analyze_and_record([tx_data for _, tx_data in valid])
+                for (seq, tx_data), result in zip(valid, analyses):
+                    summary["processed"] += 1
+                    if result["is_anomaly"]:
+                        summary["anomalies_found"] += 1
+                    lines.append((seq, {"seq": seq, "timestamp": tx_data["timestamp"], "is_anomaly": result["is_anomaly"], "alert_level": result["alert_level"], "score": result["anomaly_score"]}))
+            
+            lines.sort(key=lambda item: item[0])
+            return [encode_line(line) for _, line in lines]
         
-        if state.cache and state.cache.connected:
-            state.cache.set_transaction_result(tx_data, {"is_anomaly": result["is_anomaly"], "alert_level": result["alert_level"], "anomaly_score": result["anomaly_score"], "rule_violations": result["rule_violations"], "recommendation": result["recommendation"], "metrics": result["metrics"]}, ttl=60)
+        try:
+            async for chunk in request.stream():
+                records = decoder.feed(chunk)
+                # Micro-lotes: latência baixa para feeds ao vivo, memória limitada
+                for start in range(0, len(records), STREAM_BATCH_SIZE):
+                    for line in run_batch(records[start:start + STREAM_BATCH_SIZE]):
+                        yield line
+            for line in run_batch(decoder.close()):
+                yield line
+        except StreamDecodeError as e:
+            summary["errors"] += 1
+            yield encode_line({"error": str(e), "fatal": True})
         
-        results.append({"timestamp": tx_data["timestamp"], "is_anomaly": result["is_anomaly"], "alert_level": result["alert_level"], "score": result["anomaly_score"], "cached": False})
+        summary["anomaly_rate"] = summary["anomalies_found"] / max(summary["processed"], 1)
+        yield encode_line({"summary": summary})
     
-    return {"processed": len(results), "anomalies_found": anomaly_count, "anomaly_rate": anomaly_count / max(len(results), 1), "cache_hits": cache_hits, "results": results}
+    return DuplexStreamingResponse(verdicts(), media_type="application/x-ndjson")
 
 @app.get("/anomalies", tags=["Monitoring"])
 async def get_anomalies(limit: int = 50, level: Optional[str] = None):
@@ -330,6 +623,10 @@ async def get_anomalies(limit: int = 50, level: Optional[str] = None):
 async def get_prometheus_metrics():
     cache_hits = state.cache.stats["hits"] if state.cache else 0
     cache_misses = state.cache.stats["misses"] if state.cache else 0
+    model_info = state.detector.get_model_info()
+    rate_stats = state.rate_limiter.get_stats()
+    l1_stats = state.cache.l1.get_stats() if state.cache else {"hits": 0, "misses": 0, "evictions": 0, "entries": 0}
+    writer_stats = state.writer.stats
     
     lines = [
         "# HELP transaction_guardian_total Total transactions",
@@ -348,6 +645,36 @@ async def get_prometheus_metrics():
         "# TYPE transaction_guardian_cache_misses counter",
         f"transaction_guardian_cache_misses {cache_misses}",
         "",
+        "# HELP transaction_guardian_cache_tier_hits Cache hits per tier",
+        "# TYPE transaction_guardian_cache_tier_hits counter",
+        f'transaction_guardian_cache_tier_hits{{tier="l1"}} {l1_stats["hits"]}',
+        f'transaction_guardian_cache_tier_hits{{tier="redis"}} {cache_hits}',
+        "",
+        "# HELP transaction_guardian_cache_tier_misses Cache misses per tier",
+        "# TYPE transaction_guardian_cache_tier_misses counter",
+        f'transaction_guardian_cache_tier_misses{{tier="l1"}} {l1_stats["misses"]}',
+        f'transaction_guardian_cache_tier_misses{{tier="redis"}} {cache_misses}',
+        "",
+        "# HELP transaction_guardian_cache_l1_evictions L1 cache LRU evictions",
+        "# TYPE transaction_guardian_cache_l1_evictions counter",
+        f"transaction_guardian_cache_l1_evictions {l1_stats['evictions']}",
+        "",
+        "# HELP transaction_guardian_cache_l1_entries L1 cache entries",
+        "# TYPE transaction_guardian_cache_l1_entries gauge",
+        f"transaction_guardian_cache_l1_entries {l1_stats['entries']}",
+        "",
+        "# HELP transaction_guardian_rate_limit_allowed Requests allowed by the rate limiter",
+        "# TYPE transaction_guardian_rate_limit_allowed counter",
+        f"transaction_guardian_rate_limit_allowed {rate_stats['allowed']}",
+        "",
+        "# HELP transaction_guardian_rate_limit_rejected Requests rejected with 429",
+        "# TYPE transaction_guardian_rate_limit_rejected counter",
+        f"transaction_guardian_rate_limit_rejected {rate_stats['rejected']}",
+        "",
+        "# HELP transaction_guardian_rate_limit_buckets Active local token buckets",
+        "# TYPE transaction_guardian_rate_limit_buckets gauge",
+        f"transaction_guardian_rate_limit_buckets {rate_stats['active_buckets']}",
+        "",
         "# HELP transaction_guardian_current_count Current transaction count",
         "# TYPE transaction_guardian_current_count gauge",
         f"transaction_guardian_current_count {state.metrics['current_count']}",
@@ -365,11 +692,273 @@ async def get_prometheus_metrics():
     ]
     for status, count in state.metrics["status_counts"].items():
         lines.append(f'transaction_guardian_by_status{{status="{status}"}} {count}')
+    lines += [
+        "",
+        "# HELP transaction_guardian_model_trained Whether the Isolation Forest is trained",
+        "# TYPE transaction_guardian_model_trained gauge",
+        f"transaction_guardian_model_trained {int(model_info['trained'])}",
+        "",
+        "# HELP transaction_guardian_model_age_seconds Seconds since the current model was fitted",
+        "# TYPE transaction_guardian_model_age_seconds gauge",
+        f"transaction_guardian_model_age_seconds {model_info['age_seconds'] if model_info['age_seconds'] is not None else -1}",
+        "",
+        "# HELP transaction_guardian_model_fit_duration_seconds Duration of the last model fit",
+        "# TYPE transaction_guardian_model_fit_duration_seconds gauge",
+        f"transaction_guardian_model_fit_duration_seconds {model_info['fit_duration_seconds']}",
+        "",
+        "# HELP transaction_guardian_model_training_samples Samples used in the last model fit",
+        "# TYPE transaction_guardian_model_training_samples gauge",
+        f"transaction_guardian_model_training_samples {model_info['training_samples']}",
+        "",
+        "# HELP transaction_guardian_model_fits_total Model fits since startup",
+        "# TYPE transaction_guardian_model_fits_total counter",
+        f"transaction_guardian_model_fits_total {model_info['fits_total']}",
+        "",
+        "# HELP transaction_guardian_persist_queue_depth Records waiting in the write-behind queue",
+        "# TYPE transaction_guardian_persist_queue_depth gauge",
+        f"transaction_guardian_persist_queue_depth {state.writer.queue_depth}",
+        "",
+        "# HELP transaction_guardian_persist_flushed Records written to TimescaleDB",
+        "# TYPE transaction_guardian_persist_flushed counter",
+        f'transaction_guardian_persist_flushed{{table="transactions"}} {writer_stats["flushed_transactions"]}',
+        f'transaction_guardian_persist_flushed{{table="anomalies"}} {writer_stats["flushed_anomalies"]}',
+        "",
+        "# HELP transaction_guardian_persist_dropped Records dropped because the queue was full",
+        "# TYPE transaction_guardian_persist_dropped counter",
+        f"transaction_guardian_persist_dropped {writer_stats['dropped']}",
+        "",
+        "# HELP transaction_guardian_persist_flush_errors Failed flush attempts",
+        "# TYPE transaction_guardian_persist_flush_errors counter",
+        f"transaction_guardian_persist_flush_errors {writer_stats['flush_errors']}",
+        "",
+        "# HELP transaction_guardian_persist_spilled Records spilled to disk while the database was down",
+        "# TYPE transaction_guardian_persist_spilled counter",
+        f"transaction_guardian_persist_spilled {writer_stats['spilled']}",
+        "",
+        "# HELP transaction_guardian_persist_replayed Spilled records replayed into the database",
+        "# TYPE transaction_guardian_persist_replayed counter",
+        f"transaction_guardian_persist_replayed {writer_stats['replayed']}",
+        "",
+        "# HELP transaction_guardian_persist_flush_seconds Write-behind batch flush latency",
+        "# TYPE transaction_guardian_persist_flush_seconds histogram",
+    ]
+    cumulative = 0
+    for bound, hits in zip(FLUSH_BUCKETS + ("+Inf",), state.writer.flush_histogram):
+        cumulative += hits
+        lines.append(f'transaction_guardian_persist_flush_seconds_bucket{{le="{bound}"}} {cumulative}')
+    lines += [
+        f"transaction_guardian_persist_flush_seconds_sum {round(writer_stats['flush_seconds_sum'], 6)}",
+        f"transaction_guardian_persist_flush_seconds_count {writer_stats['flushes']}",
+    ]
+    
+    sse_stats = state.sse.get_stats()
+    lines += [
+        "",
+        "# HELP transaction_guardian_sse_clients Connected SSE clients",
+        "# TYPE transaction_guardian_sse_clients gauge",
+        f"transaction_guardian_sse_clients {sse_stats['clients']}",
+        "",
+        "# HELP transaction_guardian_sse_published Events published to the SSE hub",
+        "# TYPE transaction_guardian_sse_published counter",
+        f"transaction_guardian_sse_published {sse_stats['published']}",
+        "",
+        "# HELP transaction_guardian_sse_dropped_total Events dropped from full SSE client queues",
+        "# TYPE transaction_guardian_sse_dropped_total counter",
+        f"transaction_guardian_sse_dropped_total {sse_stats['dropped']}",
+        "",
+        "# HELP transaction_guardian_sse_coalesced_total State events replaced by a newer one before delivery",
+        "# TYPE transaction_guardian_sse_coalesced_total counter",
+        f"transaction_guardian_sse_coalesced_total {sse_stats['coalesced']}",
+    ]
+    ws_stats = state.ws.get_stats()
+    lines += [
+        "",
+        "# HELP transaction_guardian_ws_clients Connected /ws/stream clients",
+        "# TYPE transaction_guardian_ws_clients gauge",
+        f"transaction_guardian_ws_clients {ws_stats['clients']}",
+        "",
+        "# HELP transaction_guardian_ws_events Events handled by the WebSocket hub",
+        "# TYPE transaction_guardian_ws_events counter",
+        f'transaction_guardian_ws_events{{outcome="delivered"}} {ws_stats["delivered"]}',
+        f'transaction_guardian_ws_events{{outcome="filtered"}} {ws_stats["filtered"]}',
+        f'transaction_guardian_ws_events{{outcome="dropped"}} {ws_stats["dropped"]}',
+        "",
+        "# HELP transaction_guardian_ws_frames Batched frames sent to WebSocket clients",
+        "# TYPE transaction_guardian_ws_frames counter",
+        f"transaction_guardian_ws_frames {ws_stats['frames']}",
+        "",
+        "# HELP transaction_guardian_ws_bytes_sent Bytes sent to WebSocket clients",
+        "# TYPE transaction_guardian_ws_bytes_sent counter",
+        f"transaction_guardian_ws_bytes_sent {ws_stats['bytes_sent']}",
+    ]
+    shard_stats = state.detector.shards.get_stats()
+    lines += [
+        "",
+        "# HELP transaction_guardian_detector_shards Active per-merchant detector baselines",
+        "# TYPE transaction_guardian_detector_shards gauge",
+        f"transaction_guardian_detector_shards {shard_stats['active']}",
+        "",
+        "# HELP transaction_guardian_detector_shard_evictions Per-merchant baselines evicted",
+        "# TYPE transaction_guardian_detector_shard_evictions counter",
+        f'transaction_guardian_detector_shard_evictions{{reason="lru"}} {shard_stats["evicted_lru"]}',
+        f'transaction_guardian_detector_shard_evictions{{reason="idle"}} {shard_stats["evicted_idle"]}',
+    ]
+    shared_stats = state.shared.get_stats()
+    lines += [
+        "",
+        "# HELP transaction_guardian_shared_state_syncs Reconciliations with the shared Redis state",
+        "# TYPE transaction_guardian_shared_state_syncs counter",
+        f'transaction_guardian_shared_state_syncs{{outcome="ok"}} {shared_stats["syncs"]}',
+        f'transaction_guardian_shared_state_syncs{{outcome="error"}} {shared_stats["sync_errors"]}',
+        "",
+        "# HELP transaction_guardian_shared_state_sync_ms Duration of the last shared state sync",
+        "# TYPE transaction_guardian_shared_state_sync_ms gauge",
+        f"transaction_guardian_shared_state_sync_ms {shared_stats['last_sync_ms']}",
+        "",
+        "# HELP transaction_guardian_shared_state_writer 1 if this worker holds the model training lease",
+        "# TYPE transaction_guardian_shared_state_writer gauge",
+        f"transaction_guardian_shared_state_writer {int(shared_stats['is_writer'])}",
+        "",
+        "# HELP transaction_guardian_shared_state_model_version Shared model version installed in this worker",
+        "# TYPE transaction_guardian_shared_state_model_version gauge",
+        f"transaction_guardian_shared_state_model_version {shared_stats['model_version']}",
+    ]
+    job_types = state.jobs.get_stats()["types"]
+    for field, kind, help_text in (
+        ("queue_depth", "gauge", "Jobs waiting in the executor queue"),
+        ("running", "gauge", "Jobs running in the process pool"),
+    ):
+        lines += [
+            "",
+            f"# HELP transaction_guardian_job_{field} {help_text}",
+            f"# TYPE transaction_guardian_job_{field} {kind}",
+        ]
+        for job_type, job_stats in job_types.items():
+            lines.append(f'transaction_guardian_job_{field}{{type="{job_type}"}} {job_stats[field]}')
+    lines += [
+        "",
+        "# HELP transaction_guardian_jobs_total Jobs by type and outcome",
+        "# TYPE transaction_guardian_jobs_total counter",
+    ]
+    for job_type, job_stats in job_types.items():
+        for outcome in ("succeeded", "failed", "rejected"):
+            lines.append(f'transaction_guardian_jobs_total{{type="{job_type}",outcome="{outcome}"}} {job_stats[outcome]}')
+    lines += [
+        "",
+        "# HELP transaction_guardian_job_fallbacks_total Jobs that failed in the pool and were completed by their fallback",
+        "# TYPE transaction_guardian_job_fallbacks_total counter",
+    ]
+    for job_type, job_stats in job_types.items():
+        lines.append(f'transaction_guardian_job_fallbacks_total{{type="{job_type}"}} {job_stats["fallbacks"]}')
+    for phase, help_text in (
+        ("wait", "Time jobs spent queued before running"),
+        ("run", "Job run time, including applying the result"),
+    ):
+        lines += [
+            "",
+            f"# HELP transaction_guardian_job_{phase}_seconds {help_text}",
+            f"# TYPE transaction_guardian_job_{phase}_seconds summary",
+        ]
+        for job_type, job_stats in job_types.items():
+            finished = job_stats["succeeded"] + job_stats["failed"]
+            lines.append(f'transaction_guardian_job_{phase}_seconds_sum{{type="{job_type}"}} {job_stats[phase + "_seconds_sum"]:.6f}')
+            lines.append(f'transaction_guardian_job_{phase}_seconds_count{{type="{job_type}"}} {finished}')
+    client_stats = state.sse.client_stats()
+    for field, kind, help_text in (
+        ("lag_events", "gauge", "Events published but not yet written to the client"),
+        ("queue_depth", "gauge", "Frames waiting in the client queue"),
+        ("dropped", "counter", "Events dropped for the client"),
+        ("sent", "counter", "Events written to the client"),
+    ):
+        lines += [
+            "",
+            f"# HELP transaction_guardian_sse_client_{field} {help_text}",
+            f"# TYPE transaction_guardian_sse_client_{field} {kind}",
+        ]
+        for client in client_stats:
+            lines.append(f'transaction_guardian_sse_client_{field}{{client="{client["client_id"]}"}} {client[field]}')
+    
+    # Último bucket fechado de cada resolução (Grafana lê o histórico do Prometheus)
+    rollup_buckets = {resolution: state.rollups.last_complete(resolution) for resolution in ("1m", "1h")}
+    for field, help_text in (
+        ("events", "Transactions in the last complete rollup bucket"),
+        ("sum", "Sum of transaction counts in the last complete rollup bucket"),
+        ("min", "Minimum transaction count in the last complete rollup bucket"),
+        ("max", "Maximum transaction count in the last complete rollup bucket"),
+    ):
+        lines += [
+            "",
+            f"# HELP transaction_guardian_rollup_{field} {help_text}",
+            f"# TYPE transaction_guardian_rollup_{field} gauge",
+        ]
+        for resolution, by_status in rollup_buckets.items():
+            for status, values in by_status.items():
+                lines.append(f'transaction_guardian_rollup_{field}{{resolution="{resolution}",status="{status}"}} {values[field]}')
+    
+    query_stats = get_query_stats()
+    if query_stats:
+        lines += [
+            "",
+            "# HELP transaction_guardian_db_query_seconds TimescaleDB query latency per statement",
+            "# TYPE transaction_guardian_db_query_seconds summary",
+        ]
+        for name, q in query_stats.items():
+            for key, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+                lines.append(f'transaction_guardian_db_query_seconds{{statement="{name}",quantile="{quantile}"}} {q[key]}')
+            lines.append(f'transaction_guardian_db_query_seconds_sum{{statement="{name}"}} {q["total_seconds"]}')
+            lines.append(f'transaction_guardian_db_query_seconds_count{{statement="{name}"}} {q["count"]}')
+        lines += [
+            "",
+            "# HELP transaction_guardian_db_query_errors Failed queries per statement",
+            "# TYPE transaction_guardian_db_query_errors counter",
+        ]
+        for name, q in query_stats.items():
+            lines.append(f'transaction_guardian_db_query_errors{{statement="{name}"}} {q["errors"]}')
     return "\n".join(lines)
 
+async def _window_stats(window: str) -> Optional[Dict[str, Any]]:
+    """Estatísticas da janela via rollups (None se o banco estiver fora)"""
+    try:
+        return await get_stats_service().get_window_stats(window)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _memory_window_stats(window: str) -> Dict[str, Any]:
+    """Mesma janela a partir dos rollups em processo (sem banco)"""
+    seconds = parse_window(window).total_seconds()
+    return {"window": window, "source": "memory", **state.rollups.summary(seconds)}
+
 @app.get("/metrics/json", tags=["Monitoring"])
-async def get_metrics_json():
-    return state.metrics
+async def get_metrics_json(window: Optional[str] = None):
+    if window is None:
+        return state.metrics
+    stats = await _window_stats(window)
+    return stats if stats is not None else _memory_window_stats(window)
+
+@app.get("/rollups", tags=["Monitoring"])
+async def get_rollups(
+    window: str = "1h",
+    resolution: Optional[str] = None,
+    status: Optional[str] = None,
+    max_points: int = Query(1000, ge=10, le=10_000)
+):
+    """Série temporal dos rollups em processo (resolução escolhida pela janela)"""
+    try:
+        seconds = parse_window(window).total_seconds()
+        return state.rollups.series(seconds, resolution=resolution, max_points=max_points, status=status)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/shards", tags=["Monitoring"])
+async def get_shards(key: Optional[str] = None, limit: int = Query(20, ge=1, le=1000)):
+    """🧩 Baselines por merchant: uma chave ou as usadas mais recentemente"""
+    shards = state.detector.shards
+    if key is not None:
+        shard = shards.describe(key)
+        if shard is None:
+            raise HTTPException(status_code=404, detail=f"Shard '{key}' não encontrado")
+        return shard
+    return {**shards.get_stats(), "shards": shards.recent(limit)}
 
 # ============== CACHE ENDPOINTS ==============
 
@@ -377,71 +966,129 @@ async def get_metrics_json():
 async def get_cache_stats():
     if not state.cache:
         return {"error": "Cache não inicializado"}
-    return state.cache.get_stats()
+    return await state.cache.get_stats()
 
 @app.delete("/cache/flush", tags=["Cache"])
 async def flush_cache():
     if state.cache and state.cache.connected:
-        state.cache.client.flushdb()
+        await state.cache.flush()
         return {"message": "Cache limpo"}
     return {"error": "Cache não disponível"}
 
 # ============== OTHER ENDPOINTS ==============
 
 @app.get("/stream", tags=["Real-time"])
-async def sse_stream():
-    async def event_generator():
-        queue = asyncio.Queue()
-        state.sse_clients.append(queue)
-        try:
-            yield f"event: connected\ndata: {json.dumps({'message': 'Connected to Transaction Guardian v2.0'})}\n\n"
-            while True:
-                event = await queue.get()
-                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
-        except asyncio.CancelledError:
-            state.sse_clients.remove(queue)
-            raise
-    return StreamingResponse(event_generator(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+async def sse_stream(request: Request):
+    hello = {"message": "Connected to Transaction Guardian v2.0"}
+    return StreamingResponse(
+        state.sse.subscribe(request, hello),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/stream")
+async def ws_stream(websocket: WebSocket):
+    """
+    Stream filtrado no servidor. Envie {"action": "subscribe", "levels": [...],
+    "statuses": [...], "min_score": 0.8, "format": "json"|"msgpack", "batch_ms": 100}.
+    """
+    await state.ws.serve(websocket)
 
 @app.get("/stats", tags=["Monitoring"])
-async def get_stats():
-    if not state.recent_transactions:
+async def get_stats(window: str = "1h"):
+    # Janela servida pelos continuous aggregates; sem banco, pelos rollups em processo
+    history = await _window_stats(window)
+    if history is None and not state.rollups.total_events:
         return {"message": "Nenhuma transação processada"}
-    counts = [t["count"] for t in state.recent_transactions]
-    return {
+    response = {
         "total_processed": state.transactions_processed,
         "total_anomalies": state.anomalies_detected,
         "anomaly_rate": state.anomalies_detected / max(state.transactions_processed, 1),
-        "transaction_stats": {"min": min(counts), "max": max(counts), "avg": sum(counts) / len(counts)},
-        "status_distribution": state.metrics["status_counts"],
-        "cache": state.cache.get_stats() if state.cache else {"connected": False},
+        "cache": await state.cache.get_stats() if state.cache else {"connected": False},
+        "shared_state": state.shared.get_stats(),
+        "jobs": state.jobs.get_stats(),
         "uptime_seconds": (datetime.now() - state.start_time).total_seconds()
     }
+    if history is not None:
+        response.update(
+            source="timescaledb",
+            transaction_stats=history["transaction_stats"],
+            status_distribution=history["status_distribution"],
+            window=history
+        )
+    else:
+        memory = _memory_window_stats(window)
+        response.update(
+            source="memory",
+            transaction_stats=memory["transaction_stats"],
+            status_distribution=memory["status_distribution"],
+            window=memory
+        )
+    return response
 
 @app.post("/reset", tags=["Admin"])
 async def reset_system():
     state.transactions_processed = 0
     state.anomalies_detected = 0
     state.recent_transactions.clear()
+    state.rollups.clear()
     state.recent_anomalies.clear()
     state.detector.reset()
     state.metrics = {"total_transactions": 0, "total_anomalies": 0, "status_counts": {"approved": 0, "denied": 0, "failed": 0, "reversed": 0, "refunded": 0}, "current_count": 0, "avg_count": 0, "approval_rate": 0}
-    if state.cache and state.cache.connected:
-        state.cache.client.flushdb()
+    await state.shared.reset()
+    if state.cache:
+        await state.cache.flush()
     return {"message": "Sistema resetado"}
 
+@app.post("/snapshot", tags=["Admin"])
+async def save_snapshot():
+    """💾 Grava um snapshot do estado em memória agora"""
+    saved = await state.snapshots.save()
+    return {"saved": saved, **state.snapshots.get_stats()}
+
 # ============== STARTUP ==============
 
 @app.on_event("startup")
 async def startup():
     print("🛡️ Transaction Guardian v2.0 iniciando...")
-    state.cache = get_cache()
+    state.cache = await get_async_cache()
     if state.cache.connected:
         print("🚀 Redis cache conectado!")
     else:
         print("⚠️ Redis não disponível - cache desabilitado")
+    state.rate_limiter.cache = state.cache
+    state.rate_limiter.start()
+    # Warm-start antes do re-treino: o detector já sobe com estatísticas e modelo
+    source = await state.snapshots.restore()
+    if source == "snapshot":
+        print(f"♻️ Estado restaurado do snapshot em {state.snapshots.stats['restore_seconds'] * 1000:.0f}ms")
+    elif source == "timescaledb":
+        print(f"♻️ Estado reconstruído do TimescaleDB em {state.snapshots.stats['restore_seconds']:.1f}s")
+    else:
+        print("⚠️ Sem snapshot nem histórico - iniciando a frio")
+    await state.snapshots.start()
+    await state.jobs.start()
+    state.shared.attach(state.cache)
+    state.shared.start()
+    await state.sse.start(lambda: state.metrics)
+    state.trainer.start()
+    await state.writer.start()
     print("✅ Sistema pronto!")
 
+@app.on_event("shutdown")
+async def shutdown():
+    state.trainer.stop()
+    await state.jobs.stop()
+    await state.sse.stop()
+    await state.shared.stop()
+    await state.snapshots.stop()
+    await state.rate_limiter.stop()
+    await state.writer.stop()
+    await get_stats_service().close()
+    await close_database()
+    if state.cache:
+        await state.cache.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
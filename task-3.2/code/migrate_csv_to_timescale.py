@@ -12,22 +12,58 @@ Uso:
         --csv-path ../data/transactions.csv \
         --batch-size 1000 \
         --dry-run
+    
+    # Modo rápido (COPY binário, lotes concorrentes) para backfills grandes
+    python migrate_csv_to_timescale.py \
+        --csv-path ../data/transactions.csv \
+        --fast --batch-size 50000 --workers 4
+    
+    # Modo paralelo: chunks em todos os cores, retomável via checkpoints
+    python migrate_csv_to_timescale.py \
+        --csv-path ../data/transactions.csv \
+        --parallel --chunk-mb 64 --processes 8
 """
 
 import os
 import sys
 import asyncio
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from operator import itemgetter
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
-from typing import List, Dict, Generator
+from typing import List, Dict, Generator, Optional, Callable, Tuple
 import csv
 
 # Adicionar path do módulo database
 sys.path.insert(0, str(Path(__file__).parent))
 
-from database import Database, Transaction
+from database import Database, Transaction, DATABASE_CONFIG
+
+
+TIMESTAMP_FIELDS = ['timestamp', 'time', 'datetime', 'created_at', 'date']
+TIMESTAMP_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%d/%m/%Y %H:%M:%S',
+    '%Y-%m-%d',
+]
+# Formatos que datetime.fromisoformat (C) entende direto
+ISO_FORMATS = {'%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d'}
+
+STATUS_MAP = {
+    'approved': 'approved',
+    'aprovado': 'approved',
+    'denied': 'denied',
+    'negado': 'denied',
+    'failed': 'failed',
+    'falha': 'failed',
+    'reversed': 'reversed',
+    'estornado': 'reversed',
+}
 
 
 # =============================================================================
@@ -41,19 +77,12 @@ def parse_csv_row(row: Dict) -> Transaction:
     """
     # Tentar diferentes formatos de timestamp
     timestamp = None
-    timestamp_fields = ['timestamp', 'time', 'datetime', 'created_at', 'date']
     
-    for field in timestamp_fields:
+    for field in TIMESTAMP_FIELDS:
         if field in row and row[field]:
             try:
                 # Tentar diferentes formatos
-                for fmt in [
-                    '%Y-%m-%d %H:%M:%S',
-                    '%Y-%m-%dT%H:%M:%S',
-                    '%Y-%m-%d %H:%M:%S.%f',
-                    '%d/%m/%Y %H:%M:%S',
-                    '%Y-%m-%d',
-                ]:
+                for fmt in TIMESTAMP_FORMATS:
                     try:
                         timestamp = datetime.strptime(row[field], fmt)
                         break
@@ -69,17 +98,7 @@ def parse_csv_row(row: Dict) -> Transaction:
     
     # Mapear status
     status_raw = row.get('status', row.get('transaction_status', 'approved')).lower()
-    status_map = {
-        'approved': 'approved',
-        'aprovado': 'approved',
-        'denied': 'denied',
-        'negado': 'denied',
-        'failed': 'failed',
-        'falha': 'failed',
-        'reversed': 'reversed',
-        'estornado': 'reversed',
-    }
-    status = status_map.get(status_raw, status_raw)
+    status = STATUS_MAP.get(status_raw, status_raw)
     
     # Amount
     amount = None
@@ -108,6 +127,13 @@ def parse_csv_row(row: Dict) -> Transaction:
         except:
             pass
     
+    # Transações agregadas na linha (CSV por minuto: timestamp,status,count)
+    transaction_count = 1
+    for field in ['count', 'transaction_count']:
+        if field in row and row[field]:
+            transaction_count = int(row[field])
+            break
+    
     return Transaction(
         timestamp=timestamp,
         status=status,
@@ -116,6 +142,7 @@ def parse_csv_row(row: Dict) -> Transaction:
         merchant_id=merchant_id,
         is_anomaly=is_anomaly,
         anomaly_score=anomaly_score,
+        transaction_count=transaction_count,
     )
 
 
@@ -245,6 +272,483 @@ async def migrate_csv_to_timescale(
     return stats
 
 
+# =============================================================================
+# Fast Path: parser colunar + COPY binário
+# =============================================================================
+
+AMOUNT_FIELDS = ['amount', 'value', 'valor', 'transaction_amount']
+COUNT_FIELDS = ['count', 'transaction_count']
+ANOMALY_TRUE = {'true', '1', 'yes', 'sim'}
+
+
+def _first_column(index: Dict[str, int], names: List[str]) -> Optional[int]:
+    for name in names:
+        if name in index:
+            return index[name]
+    return None
+
+
+def detect_timestamp_parser(values: List[str]) -> Optional[Callable[[str], datetime]]:
+    """
+    Detecta o formato de timestamp uma única vez a partir de uma amostra.
+    
+    Retorna a função de parse (fromisoformat quando possível, que é C puro)
+    ou None se nenhum formato conhecido bate.
+    """
+    sample = next((v for v in values if v), None)
+    if sample is None:
+        return None
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            datetime.strptime(sample, fmt)
+        except ValueError:
+            continue
+        if fmt in ISO_FORMATS:
+            return datetime.fromisoformat
+        return lambda value, fmt=fmt: datetime.strptime(value, fmt)
+    return None
+
+
+class ColumnarParser:
+    """
+    Converte lotes de linhas CSV em records prontos para COPY.
+    
+    Cabeçalho, índices de colunas e formato de timestamp são resolvidos uma
+    vez por arquivo; cada lote é transposto e convertido coluna a coluna.
+    Lotes irregulares caem no parse linha a linha (parse_csv_row).
+    """
+    
+    def __init__(self, header: List[str], sample_rows: List[List[str]]):
+        self.header = header
+        self.width = len(header)
+        index = {name: i for i, name in enumerate(header)}
+        
+        self.ts_idx = _first_column(index, TIMESTAMP_FIELDS)
+        self.status_idx = _first_column(index, ['status', 'transaction_status'])
+        self.amount_idx = _first_column(index, AMOUNT_FIELDS)
+        self.auth_idx = _first_column(index, ['auth_code', 'authorization_code', 'codigo_autorizacao'])
+        self.merchant_idx = _first_column(index, ['merchant_id', 'merchant', 'lojista'])
+        self.anomaly_idx = _first_column(index, ['is_anomaly', 'anomaly'])
+        self.score_idx = index.get('anomaly_score')
+        self.count_idx = _first_column(index, COUNT_FIELDS)
+        
+        self.ts_parser = None
+        if self.ts_idx is not None:
+            self.ts_parser = detect_timestamp_parser(
+                [row[self.ts_idx] for row in sample_rows if len(row) > self.ts_idx]
+            )
+    
+    def parse(self, rows: List[List[str]]) -> Tuple[List[tuple], int]:
+        """Retorna (records na ordem de TRANSACTION_COLUMNS, erros)"""
+        if not rows:
+            return [], 0
+        try:
+            return self._parse_columns(rows), 0
+        except (ValueError, ArithmeticError, IndexError):
+            return self._parse_rows(rows)
+    
+    def _parse_columns(self, rows: List[List[str]]) -> List[tuple]:
+        if any(len(row) != self.width for row in rows):
+            raise IndexError("linhas com número de colunas diferente do cabeçalho")
+        n = len(rows)
+        columns = list(zip(*rows))
+        nothing = [None] * n
+        
+        if self.ts_parser is not None:
+            timestamps = list(map(self.ts_parser, columns[self.ts_idx]))
+        else:
+            timestamps = [datetime.utcnow()] * n
+        
+        if self.status_idx is not None:
+            statuses = [STATUS_MAP.get(v.lower(), v.lower()) for v in columns[self.status_idx]]
+        else:
+            statuses = ['approved'] * n
+        
+        amounts = nothing
+        if self.amount_idx is not None:
+            amounts = [
+                Decimal(v.replace(',', '.').replace('R$', '').strip()) if v else None
+                for v in columns[self.amount_idx]
+            ]
+        
+        auth_codes = columns[self.auth_idx] if self.auth_idx is not None else nothing
+        merchants = columns[self.merchant_idx] if self.merchant_idx is not None else nothing
+        
+        if self.anomaly_idx is not None:
+            anomalies = [v.lower() in ANOMALY_TRUE for v in columns[self.anomaly_idx]]
+        else:
+            anomalies = [False] * n
+        
+        scores = nothing
+        if self.score_idx is not None:
+            scores = [Decimal(v) if v else None for v in columns[self.score_idx]]
+        
+        counts = [1] * n
+        if self.count_idx is not None:
+            counts = [int(v) if v else 1 for v in columns[self.count_idx]]
+        
+        return list(zip(
+            timestamps, statuses, amounts, ['BRL'] * n, auth_codes,
+            merchants, nothing, anomalies, scores, nothing, nothing, nothing, counts
+        ))
+    
+    def _parse_rows(self, rows: List[List[str]]) -> Tuple[List[tuple], int]:
+        records, errors = [], 0
+        for row in rows:
+            try:
+                tx = parse_csv_row(dict(zip(self.header, row)))
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ Error parsing row: {e}")
+                continue
+            records.append((
+                tx.timestamp, tx.status, tx.amount, tx.currency, tx.auth_code,
+                tx.merchant_id, tx.merchant_category, tx.is_anomaly, tx.anomaly_score,
+                tx.ml_score, tx.zscore, tx.detection_method, tx.transaction_count
+            ))
+        return records, errors
+
+
+def read_csv_rows(csv_path: str, batch_size: int) -> Tuple[List[str], Generator[List[List[str]], None, None]]:
+    """Lê o CSV como listas (csv.reader), em lotes. Retorna (cabeçalho, lotes)."""
+    f = open(csv_path, 'r', encoding='utf-8-sig', newline='')
+    sample = f.read(4096)
+    f.seek(0)
+    delimiter = ';' if (';' in sample and ',' not in sample) else ','
+    reader = csv.reader(f, delimiter=delimiter)
+    header = next(reader, [])
+    
+    def batches():
+        with f:
+            batch = []
+            for row in reader:
+                if not row:
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+    
+    return header, batches()
+
+
+async def migrate_csv_fast(
+    csv_path: str,
+    batch_size: int = 50_000,
+    workers: int = 4,
+    dry_run: bool = False
+) -> Dict:
+    """
+    Migração rápida: parser colunar + COPY binário em lotes concorrentes.
+    
+    Cada lote vai por uma conexão do pool via copy_records_to_table; até
+    `workers` lotes ficam em voo enquanto o próximo é lido e convertido.
+    
+    Args:
+        csv_path: Caminho do arquivo CSV
+        batch_size: Linhas por COPY
+        workers: Lotes simultâneos (conexões do pool)
+        dry_run: Se True, apenas converte sem inserir
+        
+    Returns:
+        Dict com estatísticas da migração
+    """
+    stats = {
+        "mode": "copy",
+        "workers": workers,
+        "total_rows": 0,
+        "inserted": 0,
+        "errors": 0,
+        "status_counts": {},
+        "duration_seconds": 0,
+    }
+    
+    start_time = datetime.now()
+    
+    csv_file = Path(csv_path)
+    if not csv_file.exists():
+        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+    
+    print(f"📂 Reading CSV: {csv_path}")
+    total_rows = count_csv_rows(csv_path)
+    print(f"📊 Total rows to migrate: {total_rows:,} (COPY, {workers} workers, batch {batch_size:,})")
+    
+    if dry_run:
+        print("🔍 DRY RUN MODE - No data will be inserted")
+    
+    # Pool com conexões suficientes para os lotes em voo
+    db = Database({
+        **DATABASE_CONFIG,
+        "min_size": min(workers, DATABASE_CONFIG["min_size"]),
+        "max_size": max(workers, DATABASE_CONFIG["max_size"]),
+    })
+    if not dry_run:
+        await db.connect()
+    
+    slots = asyncio.Semaphore(workers)
+    in_flight = set()
+    
+    async def copy_batch(records: List[tuple]) -> None:
+        try:
+            inserted = await db.copy_transactions(records)
+            stats["inserted"] += inserted
+        except Exception as e:
+            stats["errors"] += len(records)
+            print(f"\n❌ Error copying batch: {e}")
+        finally:
+            slots.release()
+    
+    try:
+        header, batches = read_csv_rows(csv_path, batch_size)
+        parser = None
+        
+        for rows in batches:
+            if parser is None:
+                parser = ColumnarParser(header, rows[:100])
+            
+            records, errors = parser.parse(rows)
+            stats["errors"] += errors
+            stats["total_rows"] += len(records)
+            for status, count in Counter(map(itemgetter(1), records)).items():
+                stats["status_counts"][status] = stats["status_counts"].get(status, 0) + count
+            
+            if dry_run:
+                stats["inserted"] += len(records)
+            elif records:
+                await slots.acquire()
+                task = asyncio.create_task(copy_batch(records))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            
+            progress = (stats["total_rows"] / max(total_rows, 1)) * 100
+            print(f"\r   Processing: {stats['total_rows']:,}/{total_rows:,} ({progress:.1f}%)", end="")
+        
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        print()
+        
+    finally:
+        if not dry_run:
+            await db.close()
+    
+    stats["duration_seconds"] = (datetime.now() - start_time).total_seconds()
+    
+    return stats
+
+
+# =============================================================================
+# Parallel Engine: chunks por faixa de bytes + process pool + checkpoints
+# =============================================================================
+
+# Estado por processo worker (preenchido pelo initializer)
+_worker: Dict = {}
+
+
+def read_csv_header(csv_path: str) -> Tuple[List[str], str, int, List[List[str]]]:
+    """
+    Lê cabeçalho, delimitador, offset do início dos dados e uma amostra de
+    linhas (para detectar o formato de timestamp uma vez por arquivo).
+    """
+    with open(csv_path, 'rb') as f:
+        header_line = f.readline().decode('utf-8-sig')
+        data_start = f.tell()
+        sample_lines = [line.decode('utf-8', errors='replace') for line in (f.readline() for _ in range(100)) if line]
+    sample = (header_line + ''.join(sample_lines))[:4096]
+    delimiter = ';' if (';' in sample and ',' not in sample) else ','
+    header = next(csv.reader([header_line], delimiter=delimiter), [])
+    sample_rows = [row for row in csv.reader(sample_lines, delimiter=delimiter) if row]
+    return header, delimiter, data_start, sample_rows
+
+
+def split_byte_ranges(csv_path: str, data_start: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Divide o arquivo em faixas [início, fim) alinhadas em fim de linha.
+    
+    Determinístico para o mesmo arquivo e tamanho de chunk, o que permite
+    retomar a partir dos checkpoints. Assume registros de uma linha (sem
+    quebras de linha dentro de campos entre aspas).
+    """
+    size = os.path.getsize(csv_path)
+    ranges = []
+    start = data_start
+    with open(csv_path, 'rb') as f:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _init_worker(header, delimiter, sample_rows, db_config, source, dry_run):
+    """Initializer do process pool: parser, event loop e conexão por processo."""
+    _worker["parser"] = ColumnarParser(header, sample_rows)
+    _worker["delimiter"] = delimiter
+    _worker["source"] = source
+    _worker["dry_run"] = dry_run
+    _worker["loop"] = asyncio.new_event_loop()
+    _worker["db"] = None if dry_run else Database({**db_config, "min_size": 1, "max_size": 1})
+
+
+def _load_chunk(csv_path: str, start: int, end: int) -> Dict:
+    """Lê, converte e grava (COPY + checkpoint) uma faixa do arquivo. Roda no worker."""
+    result = {"start": start, "end": end, "bytes": end - start, "rows": 0, "errors": 0, "error": None}
+    try:
+        with open(csv_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        lines = data.decode('utf-8').splitlines()
+        rows = [row for row in csv.reader(lines, delimiter=_worker["delimiter"]) if row]
+        records, errors = _worker["parser"].parse(rows)
+        result["errors"] = errors
+        
+        db = _worker["db"]
+        if db is not None:
+            loop = _worker["loop"]
+            if db.pool is None:
+                loop.run_until_complete(db.connect())
+            loop.run_until_complete(
+                db.copy_transactions_checkpointed(records, _worker["source"], start, end)
+            )
+        result["rows"] = len(records)
+        result["status_counts"] = dict(Counter(map(itemgetter(1), records)))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def migrate_csv_parallel(
+    csv_path: str,
+    chunk_mb: float = 64,
+    processes: Optional[int] = None,
+    resume: bool = True,
+    dry_run: bool = False
+) -> Dict:
+    """
+    Migração paralela e retomável.
+    
+    O arquivo é dividido em faixas de bytes; cada processo do pool lê sua
+    faixa, converte com o parser colunar e faz COPY com a própria conexão.
+    Cada chunk concluído grava um checkpoint na mesma transação dos dados,
+    então uma execução interrompida retoma exatamente de onde parou.
+    
+    Args:
+        csv_path: Caminho do arquivo CSV
+        chunk_mb: Tamanho de cada faixa em MB
+        processes: Processos do pool (padrão: todos os cores)
+        resume: Pular chunks já registrados em migration_checkpoints
+        dry_run: Se True, apenas converte sem inserir
+        
+    Returns:
+        Dict com estatísticas da migração
+    """
+    csv_file = Path(csv_path)
+    if not csv_file.exists():
+        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+    
+    processes = processes or os.cpu_count() or 1
+    total_bytes = csv_file.stat().st_size
+    source = f"{csv_file.name}:{total_bytes}"
+    
+    stats = {
+        "mode": "parallel",
+        "processes": processes,
+        "total_rows": 0,
+        "inserted": 0,
+        "errors": 0,
+        "status_counts": {},
+        "chunks_total": 0,
+        "chunks_done": 0,
+        "chunks_skipped": 0,
+        "chunks_failed": 0,
+        "bytes_processed": 0,
+        "duration_seconds": 0,
+    }
+    
+    start_time = datetime.now()
+    
+    header, delimiter, data_start, sample_rows = read_csv_header(csv_path)
+    chunks = split_byte_ranges(csv_path, data_start, int(chunk_mb * 1024 * 1024))
+    stats["chunks_total"] = len(chunks)
+    
+    print(f"📂 Reading CSV: {csv_path} ({total_bytes / 1024 / 1024:,.1f} MB)")
+    print(f"🧩 {len(chunks)} chunks of ~{chunk_mb:g} MB, {processes} processes")
+    
+    if dry_run:
+        print("🔍 DRY RUN MODE - No data will be inserted")
+    
+    # Checkpoints: quais chunks já entraram em uma execução anterior
+    completed = set()
+    if not dry_run:
+        db = Database()
+        await db.connect()
+        try:
+            await db.ensure_migration_checkpoints()
+            if resume:
+                completed = set(await db.get_migration_checkpoints(source))
+            else:
+                await db.clear_migration_checkpoints(source)
+        finally:
+            await db.close()
+        if completed - set(chunks):
+            raise ValueError(
+                "Checkpoints existentes usam outra divisão de chunks; "
+                "repita com o mesmo --chunk-mb ou use --no-resume"
+            )
+    
+    pending = [chunk for chunk in chunks if chunk not in completed]
+    stats["chunks_skipped"] = len(chunks) - len(pending)
+    if stats["chunks_skipped"]:
+        print(f"⏩ Resuming: {stats['chunks_skipped']} chunks already loaded")
+    
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(header, delimiter, sample_rows, DATABASE_CONFIG, source, dry_run)
+    ) as pool:
+        futures = [loop.run_in_executor(pool, _load_chunk, csv_path, start, end) for start, end in pending]
+        
+        for future in asyncio.as_completed(futures):
+            result = await future
+            stats["bytes_processed"] += result["bytes"]
+            stats["errors"] += result["errors"]
+            if result["error"]:
+                stats["chunks_failed"] += 1
+                print(f"\n❌ Chunk {result['start']}-{result['end']} failed: {result['error']}")
+                continue
+            
+            stats["chunks_done"] += 1
+            stats["total_rows"] += result["rows"]
+            stats["inserted"] += result["rows"]
+            for status, count in result["status_counts"].items():
+                stats["status_counts"][status] = stats["status_counts"].get(status, 0) + count
+            
+            elapsed = max(loop.time() - started, 1e-9)
+            progress = (stats["chunks_done"] + stats["chunks_skipped"]) / max(len(chunks), 1) * 100
+            print(
+                f"\r   Chunks: {stats['chunks_done'] + stats['chunks_skipped']}/{len(chunks)} ({progress:.1f}%)"
+                f" | {stats['total_rows'] / elapsed:,.0f} rows/s"
+                f" | {stats['bytes_processed'] / 1024 / 1024 / elapsed:,.1f} MB/s",
+                end=""
+            )
+        print()
+    
+    stats["errors"] += stats["chunks_failed"]
+    stats["duration_seconds"] = (datetime.now() - start_time).total_seconds()
+    
+    if stats["chunks_failed"]:
+        print(f"⚠️ {stats['chunks_failed']} chunks failed - run again to resume")
+    
+    return stats
+
+
 # =============================================================================
 # CLI
 # =============================================================================
@@ -262,6 +766,13 @@ def print_stats(stats: Dict):
     if stats['duration_seconds'] > 0:
         rate = stats['inserted'] / stats['duration_seconds']
         print(f"   Rate: {rate:.0f} rows/second")
+        if stats.get('bytes_processed'):
+            mb_rate = stats['bytes_processed'] / 1024 / 1024 / stats['duration_seconds']
+            print(f"   Throughput: {mb_rate:.1f} MB/second")
+    
+    if 'chunks_total' in stats:
+        print(f"   Chunks: {stats['chunks_done']} loaded, {stats['chunks_skipped']} resumed, "
+              f"{stats['chunks_failed']} failed (of {stats['chunks_total']})")
     
     print("\n📈 Status Distribution:")
     for status, count in sorted(stats['status_counts'].items()):
@@ -283,14 +794,47 @@ async def main():
     parser.add_argument(
         "--batch-size", "-b",
         type=int,
-        default=1000,
-        help="Batch size for insertion (default: 1000)"
+        default=None,
+        help="Batch size for insertion (default: 1000, or 50000 with --fast)"
     )
     parser.add_argument(
         "--dry-run", "-n",
         action="store_true",
         help="Simulate migration without inserting"
     )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="Use binary COPY with concurrent batches (for large backfills)"
+    )
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=4,
+        help="Concurrent COPY batches in --fast mode (default: 4)"
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Parse and load byte-range chunks in a process pool, with checkpoints"
+    )
+    parser.add_argument(
+        "--chunk-mb",
+        type=float,
+        default=64,
+        help="Chunk size in MB for --parallel (default: 64)"
+    )
+    parser.add_argument(
+        "--processes", "-p",
+        type=int,
+        default=None,
+        help="Processes for --parallel (default: all cores)"
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Ignore existing checkpoints in --parallel mode"
+    )
     
     args = parser.parse_args()
     
@@ -298,17 +842,33 @@ async def main():
     print("=" * 50)
     
     try:
-        stats = await migrate_csv_to_timescale(
-            csv_path=args.csv_path,
-            batch_size=args.batch_size,
-            dry_run=args.dry_run
-        )
+        if args.parallel:
+            stats = await migrate_csv_parallel(
+                csv_path=args.csv_path,
+                chunk_mb=args.chunk_mb,
+                processes=args.processes,
+                resume=not args.no_resume,
+                dry_run=args.dry_run
+            )
+        elif args.fast:
+            stats = await migrate_csv_fast(
+                csv_path=args.csv_path,
+                batch_size=args.batch_size or 50_000,
+                workers=args.workers,
+                dry_run=args.dry_run
+            )
+        else:
+            stats = await migrate_csv_to_timescale(
+                csv_path=args.csv_path,
+                batch_size=args.batch_size or 1000,
+                dry_run=args.dry_run
+            )
         print_stats(stats)
         
         if stats['errors'] > 0:
             sys.exit(1)
             
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
     except Exception as e:
@@ -320,6 +320,31 @@ class MLOpsManager:
         }
 
 
+# ============== JOBS (ProcessPool) ==============
+# Funções de módulo (picklable) executadas pelo JobExecutor em outro
+# processo; cada processo do pool tem seu próprio MLOpsManager.
+
+def synthetic_training_data(seed: int = 42) -> np.ndarray:
+    """Dados sintéticos para treino (em produção, usar dados reais)"""
+    rng = np.random.RandomState(seed)
+    X_train = rng.randn(1000, 5)  # 1000 samples, 5 features
+    
+    # Adicionar algumas anomalias
+    X_anomalies = rng.uniform(low=-4, high=4, size=(50, 5))
+    return np.vstack([X_train, X_anomalies])
+
+
+def train_job(params: Dict[str, Any], tags: Dict[str, str]) -> Dict[str, Any]:
+    """Treina e registra um modelo; devolve só dados serializáveis"""
+    _, run_id = get_mlops().train_model(synthetic_training_data(), params, tags)
+    return {"run_id": run_id, "params": params}
+
+
+def drift_job(current_metrics: Dict[str, float], threshold: float = 0.1) -> Dict[str, Any]:
+    """Checagem de drift contra o baseline de produção"""
+    return get_mlops().check_model_drift(current_metrics, threshold)
+
+
 # ============== SINGLETON ==============
 
 _mlops_manager: Optional[MLOpsManager] = None
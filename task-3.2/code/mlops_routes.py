@@ -4,13 +4,13 @@
 Phase 4: MLOps - API Endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-import numpy as np
 
-from .mlops import get_mlops, MLOpsManager
+from .mlops import get_mlops, MLOpsManager, train_job, drift_job
 from .auth import get_current_user, require_permission
+from .job_routes import submit_job, job_response
 
 router = APIRouter(prefix="/mlops", tags=["MLOps"])
 
@@ -62,13 +62,15 @@ async def list_experiments(limit: int = 10):
 @router.post("/train")
 async def train_model(
     request: TrainRequest,
-    background_tasks: BackgroundTasks,
+    wait: float = Query(0.0, ge=0, le=60),
     user: dict = Depends(require_permission("admin"))
 ):
     """
     🎯 Treina novo modelo (apenas admin).
     
-    O treino roda em background.
+    O treino roda no pool de processos (job "mlops_train"): responde 202
+    com o id do job; acompanhe em /jobs/{id}. Com `wait` espera até N
+    segundos pelo resultado.
     """
     mlops = get_mlops()
     
@@ -78,14 +80,6 @@ async def train_model(
             detail="MLflow não está disponível"
         )
     
-    # Gerar dados sintéticos para treino (em produção, usar dados reais)
-    np.random.seed(42)
-    X_train = np.random.randn(1000, 5)  # 1000 samples, 5 features
-    
-    # Adicionar algumas anomalias
-    X_anomalies = np.random.uniform(low=-4, high=4, size=(50, 5))
-    X_train = np.vstack([X_train, X_anomalies])
-    
     params = {
         "n_estimators": request.n_estimators,
         "contamination": request.contamination
@@ -96,14 +90,8 @@ async def train_model(
         "description": request.description or "API training"
     }
     
-    model, run_id = mlops.train_model(X_train, params, tags)
-    
-    return {
-        "status": "success",
-        "message": "Modelo treinado e registrado",
-        "run_id": run_id,
-        "params": params
-    }
+    job = submit_job("mlops_train", train_job, params, tags)
+    return await job_response(job, wait)
 
 
 @router.post("/promote")
@@ -138,11 +126,13 @@ async def promote_model(
 
 
 @router.get("/drift")
-async def check_drift():
+async def check_drift(wait: float = Query(10.0, ge=0, le=60)):
     """
     🔍 Verifica drift do modelo.
     
-    Compara métricas atuais com baseline de produção.
+    Compara métricas atuais com baseline de produção. Roda no pool de
+    processos (job "mlops_drift"); espera até `wait` segundos pelo
+    resultado, senão responde 202 com o id do job.
     """
     mlops = get_mlops()
     
@@ -159,8 +149,8 @@ async def check_drift():
         "std_score": 0.08
     }
     
-    result = mlops.check_model_drift(current_metrics)
-    return result
+    job = submit_job("mlops_drift", drift_job, current_metrics)
+    return await job_response(job, wait)
 
 
 @router.get("/health")
@@ -0,0 +1,138 @@
+"""
+🎓 Model Trainer
+================
+Re-treino do Isolation Forest fora do request path.
+
+Features:
+- Thread worker dedicada ao fit (nunca bloqueia o event loop)
+- Re-treino periódico sobre o ring de histórico recente do detector
+- Troca atômica do modelo (o request path pontua sempre com um modelo completo)
+- Treino sob demanda quando o detector ainda não tem modelo
+
+CloudWalk Task 3.2
+"""
+
+import time
+import threading
+import logging
+from typing import Callable, Optional, Dict, Any
+
+import numpy as np
+
+from .anomaly_detector import AnomalyDetector
+
+logger = logging.getLogger(__name__)
+
+
+class RetrainScheduler:
+    """
+    Agenda re-treinos do modelo de um AnomalyDetector em background.
+
+    Exemplo:
+        scheduler = RetrainScheduler(detector, interval=300)
+        scheduler.start()
+        ...
+        scheduler.stop()
+    """
+
+    def __init__(
+        self,
+        detector: AnomalyDetector,
+        interval: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        should_fit: Optional[Callable[[], bool]] = None
+    ):
+        self.detector = detector
+        # Com vários workers só o escritor eleito treina (ver shared_state)
+        self.should_fit = should_fit
+        self.interval = interval if interval is not None else detector.config.retrain_interval
+        self.min_samples = min_samples if min_samples is not None else detector.config.min_train_samples
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {
+            "fits": 0,
+            "skipped": 0,
+            "not_writer": 0,
+            "errors": 0,
+            "last_error": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Inicia a thread de re-treino e acopla ao detector"""
+        if self.running:
+            return
+        self._stop.clear()
+        self.detector.trainer = self
+        self._thread = threading.Thread(target=self._run, name="guardian-retrain", daemon=True)
+        self._thread.start()
+        logger.info(f"🎓 Re-treino em background a cada {self.interval:.0f}s")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para a thread e devolve o detector ao treino síncrono"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        if self.detector.trainer is self:
+            self.detector.trainer = None
+
+    def request_fit(self) -> None:
+        """Pede um treino o quanto antes (não bloqueia)"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self.fit_now():
+                # Pedidos feitos durante o fit já foram atendidos por ele
+                self._wake.clear()
+
+    def fit_now(self) -> bool:
+        """
+        Treina sobre o snapshot atual do histórico e troca o modelo.
+
+        Returns:
+            True se um modelo novo foi instalado
+        """
+        if self.detector.model is None:
+            return False
+        if self.should_fit is not None and not self.should_fit():
+            self.stats["not_writer"] += 1
+            return False
+
+        # Cópia do ring: o request path continua escrevendo durante o fit
+        samples = np.array(self.detector.history.counts(), dtype=float)
+        if len(samples) < self.min_samples:
+            self.stats["skipped"] += 1
+            return False
+
+        try:
+            self.detector.fit_model(samples)
+            self.stats["fits"] += 1
+            return True
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+            logger.error(f"Erro no re-treino: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estado do agendador e do modelo em uso"""
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "min_samples": self.min_samples,
+            **self.stats,
+            "model": self.detector.get_model_info()
+        }
@@ -0,0 +1,435 @@
+"""
+💾 Write-Behind Persistence
+===========================
+Persistência assíncrona dos vereditos no TimescaleDB.
+
+O request path apenas enfileira (put_nowait, O(1)); uma task em background
+agrupa transações e anomalias e grava em lote quando o lote enche ou o
+intervalo de flush expira.
+
+Features:
+- Fila limitada: se o flusher não acompanha, novos registros são
+  descartados e contados (o request nunca espera o Postgres)
+- Retry com backoff exponencial por lote
+- Spill em disco (JSONL) quando o banco está fora, com replay automático
+  quando a conexão volta
+- Métricas de profundidade da fila e latência de flush (histograma)
+
+Configuração (env):
+    PERSISTENCE_ENABLED=true
+    PERSIST_QUEUE_SIZE=50000
+    PERSIST_BATCH_SIZE=500
+    PERSIST_FLUSH_INTERVAL=1.0
+    PERSIST_MAX_RETRIES=3
+    PERSIST_SPILL_DIR=/tmp/guardian_spill
+    PERSIST_SPILL_MAX_MB=256
+
+CloudWalk Task 3.2
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from dataclasses import asdict
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .database import Database, Transaction, Anomaly
+
+logger = logging.getLogger(__name__)
+
+# Buckets do histograma de latência de flush (segundos)
+FLUSH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+SEVERITY_BY_LEVEL = {"CRITICAL": "critical", "WARNING": "high"}
+
+SPILL_FILE_MAX_BYTES = 4 * 1024 * 1024
+
+
+# ============== CONVERSÃO ==============
+
+def _parse_timestamp(value: Optional[str]) -> datetime:
+    if value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.utcnow()
+
+
+def _decimal(value: Optional[float], places: int = 4) -> Optional[Decimal]:
+    if value is None:
+        return None
+    return Decimal(str(round(float(value), places)))
+
+
+def build_records(tx_data: Dict, result: Dict) -> Tuple[Transaction, Optional[Anomaly]]:
+    """Converte (transação, resultado do detector) em linhas do banco"""
+    metrics = result.get("metrics", {})
+    timestamp = _parse_timestamp(tx_data.get("timestamp"))
+
+    tx = Transaction(
+        timestamp=timestamp,
+        status=tx_data["status"],
+        auth_code=tx_data.get("auth_code"),
+        merchant_id=tx_data.get("merchant_id"),
+        merchant_category=tx_data.get("merchant_category"),
+        is_anomaly=result["is_anomaly"],
+        anomaly_score=_decimal(result["anomaly_score"]),
+        ml_score=_decimal(metrics.get("ml_score")),
+        zscore=_decimal(metrics.get("zscore")),
+        detection_method="combined",
+        transaction_count=int(tx_data.get("count", 1)),
+    )
+
+    anomaly = None
+    if result["is_anomaly"]:
+        count = tx_data.get("count", metrics.get("current_count"))
+        zscore = metrics.get("zscore", 0)
+        if count == 0:
+            anomaly_type = "zero_transactions"
+        elif zscore > 0:
+            anomaly_type = "spike"
+        elif zscore < 0:
+            anomaly_type = "drop"
+        else:
+            anomaly_type = "pattern"
+        anomaly = Anomaly(
+            detected_at=timestamp,
+            anomaly_type=anomaly_type,
+            severity=SEVERITY_BY_LEVEL.get(result["alert_level"], "medium"),
+            combined_score=tx.anomaly_score,
+            ml_score=tx.ml_score,
+            zscore=tx.zscore,
+            transaction_count=count,
+            expected_count=int(round(metrics.get("running_mean", 0))),
+            time_window_minutes=1,
+            notes="; ".join(result.get("rule_violations", [])) or None,
+        )
+    return tx, anomaly
+
+
+def _encode_record(kind: str, record) -> str:
+    data = asdict(record)
+    for key, value in data.items():
+        if isinstance(value, datetime):
+            data[key] = value.isoformat()
+        elif isinstance(value, Decimal):
+            data[key] = str(value)
+    return json.dumps({"kind": kind, "data": data})
+
+
+def _decode_record(line: str) -> Tuple[str, Any]:
+    item = json.loads(line)
+    kind, data = item["kind"], item["data"]
+    for key in ("timestamp", "detected_at"):
+        if data.get(key):
+            data[key] = datetime.fromisoformat(data[key])
+    for key in ("amount", "anomaly_score", "ml_score", "zscore", "combined_score"):
+        if data.get(key) is not None:
+            data[key] = Decimal(data[key])
+    cls = Transaction if kind == "transaction" else Anomaly
+    return kind, cls(**data)
+
+
+# ============== WRITER ==============
+
+class WriteBehindWriter:
+    """
+    Fila write-behind para as tabelas `transactions` e `anomalies`.
+
+    Exemplo:
+        writer = WriteBehindWriter()
+        await writer.start()
+        writer.record(tx_data, result)   # não bloqueia
+        ...
+        await writer.stop()              # drena a fila
+    """
+
+    def __init__(
+        self,
+        db: Optional[Database] = None,
+        queue_size: int = None,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_retries: int = None,
+        spill_dir: str = None,
+        spill_max_bytes: int = None,
+        enabled: Optional[bool] = None
+    ):
+        self.db = db or Database()
+        self.enabled = enabled if enabled is not None else os.getenv("PERSISTENCE_ENABLED", "true").lower() == "true"
+        self.queue_size = queue_size or int(os.getenv("PERSIST_QUEUE_SIZE", 50_000))
+        self.batch_size = batch_size or int(os.getenv("PERSIST_BATCH_SIZE", 500))
+        self.flush_interval = flush_interval or float(os.getenv("PERSIST_FLUSH_INTERVAL", 1.0))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("PERSIST_MAX_RETRIES", 3))
+        self.spill_dir = Path(spill_dir or os.getenv("PERSIST_SPILL_DIR", "/tmp/guardian_spill"))
+        self.spill_max_bytes = spill_max_bytes or int(os.getenv("PERSIST_SPILL_MAX_MB", 256)) * 1024 * 1024
+        self.reconnect_interval = 5.0
+        self.connect_timeout = 5.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._db_up = False
+        self._next_connect = 0.0
+        self._next_replay = 0.0
+        self._spill_file: Optional[Path] = None
+
+        self.flush_histogram = [0] * (len(FLUSH_BUCKETS) + 1)
+        self.stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "flushed_transactions": 0,
+            "flushed_anomalies": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "retries": 0,
+            "spilled": 0,
+            "spill_dropped": 0,
+            "replayed": 0,
+            "flush_seconds_sum": 0.0,
+            "last_flush_seconds": 0.0,
+        }
+
+    # ============== REQUEST PATH ==============
+
+    @property
+    def db_connected(self) -> bool:
+        return self._db_up
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _offer(self, kind: str, record) -> bool:
+        if self._queue is None or self._stopping:
+            return False
+        try:
+            self._queue.put_nowait((kind, record))
+        except asyncio.QueueFull:
+            # Backpressure: descarta em vez de bloquear o request
+            self.stats["dropped"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def record(self, tx_data: Dict, result: Dict) -> None:
+        """Enfileira uma transação analisada (e a anomalia, se houver)"""
+        if self._queue is None:
+            return
+        tx, anomaly = build_records(tx_data, result)
+        self._offer("transaction", tx)
+        if anomaly is not None:
+            self._offer("anomaly", anomaly)
+
+    def record_many(self, tx_list: List[Dict], results: List[Dict]) -> None:
+        """Enfileira um lote de transações analisadas"""
+        if self._queue is None:
+            return
+        for tx_data, result in zip(tx_list, results):
+            self.record(tx_data, result)
+
+    # ============== LIFECYCLE ==============
+
+    async def start(self) -> None:
+        """Inicia o flusher em background (requer event loop rodando)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        print(f"💾 Write-behind ativo (lote {self.batch_size}, flush {self.flush_interval}s)")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Drena a fila (banco ou spill) e encerra"""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error(f"Write-behind não drenou em {timeout}s; {self.queue_depth} registros perdidos")
+        self._task = None
+        await self.db.close()
+        self._db_up = False
+
+    # ============== FLUSHER ==============
+
+    async def _next_batch(self) -> List[Tuple[str, Any]]:
+        """Coleta até batch_size itens ou até o intervalo de flush expirar"""
+        batch: List[Tuple[str, Any]] = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0 or self._stopping:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+            elif self._stopping:
+                break
+            if not self._stopping:
+                await self._replay_spill()
+
+    async def _ensure_connected(self) -> bool:
+        if self._db_up and self.db.pool is not None:
+            return True
+        now = time.monotonic()
+        if now < self._next_connect:
+            return False
+        self._next_connect = now + self.reconnect_interval
+        try:
+            await asyncio.wait_for(self.db.connect(), timeout=self.connect_timeout)
+            self._db_up = True
+        except Exception as e:
+            logger.error(f"TimescaleDB indisponível: {e}")
+            self._db_up = False
+        return self._db_up
+
+    async def _write(self, batch: List[Tuple[str, Any]]) -> None:
+        transactions = [record for kind, record in batch if kind == "transaction"]
+        anomalies = [record for kind, record in batch if kind == "anomaly"]
+        if transactions:
+            await self.db.insert_transactions_batch(transactions)
+        if anomalies:
+            await self.db.insert_anomalies_batch(anomalies)
+        self.stats["flushed_transactions"] += len(transactions)
+        self.stats["flushed_anomalies"] += len(anomalies)
+
+    async def _flush(self, batch: List[Tuple[str, Any]]) -> None:
+        """Grava o lote com retry; se o banco continuar fora, faz spill"""
+        if not await self._ensure_connected():
+            await self._spill(batch)
+            return
+
+        delay = 0.1
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                await self._write(batch)
+                self._observe(time.perf_counter() - start)
+                return
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                logger.error(f"Erro no flush ({len(batch)} registros, tentativa {attempt + 1}): {e}")
+            if attempt < self.max_retries and not self._stopping:
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+            else:
+                break
+
+        self._db_up = False
+        await self._spill(batch)
+
+    def _observe(self, seconds: float) -> None:
+        self.stats["flushes"] += 1
+        self.stats["flush_seconds_sum"] += seconds
+        self.stats["last_flush_seconds"] = round(seconds, 6)
+        for i, bound in enumerate(FLUSH_BUCKETS):
+            if seconds <= bound:
+                self.flush_histogram[i] += 1
+                return
+        self.flush_histogram[-1] += 1
+
+    # ============== SPILL EM DISCO ==============
+
+    def spill_bytes(self) -> int:
+        if not self.spill_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.spill_dir.glob("spill-*.jsonl"))
+
+    def _spill_sync(self, lines: List[str]) -> int:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        if self.spill_bytes() >= self.spill_max_bytes:
+            return 0
+        if self._spill_file is None or not self._spill_file.exists() or self._spill_file.stat().st_size >= SPILL_FILE_MAX_BYTES:
+            self._spill_file = self.spill_dir / f"spill-{time.time_ns()}.jsonl"
+        with open(self._spill_file, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return len(lines)
+
+    async def _spill(self, batch: List[Tuple[str, Any]]) -> None:
+        lines = [_encode_record(kind, record) for kind, record in batch]
+        try:
+            written = await asyncio.to_thread(self._spill_sync, lines)
+        except OSError as e:
+            logger.error(f"Erro no spill em disco: {e}")
+            written = 0
+        self.stats["spilled"] += written
+        self.stats["spill_dropped"] += len(lines) - written
+
+    def _pending_spill_files(self) -> List[Path]:
+        if not self.spill_dir.exists():
+            return []
+        return sorted(self.spill_dir.glob("spill-*.jsonl"))
+
+    async def _replay_spill(self) -> None:
+        """Reenvia o arquivo de spill mais antigo quando o banco está de volta"""
+        now = time.monotonic()
+        if now < self._next_replay:
+            return
+        self._next_replay = now + self.flush_interval
+        files = await asyncio.to_thread(self._pending_spill_files)
+        if not files or not await self._ensure_connected():
+            return
+
+        path = files[0]
+        if path == self._spill_file:
+            # Fecha o arquivo ativo: novos spills vão para outro
+            self._spill_file = None
+        try:
+            lines = await asyncio.to_thread(path.read_text, encoding="utf-8")
+            records = [_decode_record(line) for line in lines.splitlines() if line.strip()]
+            for start in range(0, len(records), self.batch_size):
+                await self._write(records[start:start + self.batch_size])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Arquivo de spill inválido {path.name}: {e}")
+            path.rename(path.with_suffix(".corrupt"))
+            return
+        except Exception as e:
+            # Banco caiu de novo; o arquivo fica para a próxima tentativa
+            # (linhas já gravadas podem ser reenviadas: at-least-once)
+            self.stats["flush_errors"] += 1
+            self._db_up = False
+            logger.error(f"Erro no replay do spill {path.name}: {e}")
+            return
+        await asyncio.to_thread(path.unlink)
+        self.stats["replayed"] += len(records)
+        logger.info(f"💾 Spill reenviado: {path.name} ({len(records)} registros)")
+
+    # ============== MÉTRICAS ==============
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "db_connected": self.db_connected,
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "spill_files": len(self._pending_spill_files()),
+            "spill_bytes": self.spill_bytes(),
+            **self.stats
+        }
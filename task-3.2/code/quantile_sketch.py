@@ -0,0 +1,207 @@
+"""
+📐 Quantile Sketch
+==================
+Sketches de quantis no estilo DDSketch para contagens de transações.
+
+Cada valor cai em um bin logarítmico: o bin k (k >= 1) guarda valores em
+(γ^(k-2), γ^(k-1)], com γ = (1 + α) / (1 - α). Qualquer quantil é
+devolvido com erro relativo de no máximo α (padrão 1%). O bin 0 guarda
+valores < 1 (contagem zero).
+
+- add O(1): um log e um incremento
+- memória fixa: `n_bins` inteiros por sketch, independente do histórico
+- mergeable: somar os arrays de bins de dois sketches é exatamente o
+  sketch da união dos dados
+
+`QuantileBaselines` guarda um sketch por (status, hora do dia) em um único
+array (status, 24, bins); sketches por status, por hora ou globais saem
+do merge (soma) dos eixos.
+
+CloudWalk Task 3.2
+"""
+
+import math
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+from .ring_buffer import STATUS_NAMES, encode_status, encode_statuses
+
+DEFAULT_QUANTILES = (0.50, 0.95, 0.99)
+
+
+# ============== MAPEAMENTO LOGARÍTMICO ==============
+
+class SketchMapping:
+    """Valor ↔ índice de bin com erro relativo α"""
+
+    def __init__(self, relative_accuracy: float = 0.01, n_bins: int = 1024):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy deve estar em (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.n_bins = n_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # Valor representativo de cada bin (meio geométrico do intervalo)
+        keys = np.arange(n_bins, dtype=float)
+        self.values = np.where(keys == 0, 0.0, 2 * self.gamma ** (keys - 1) / (self.gamma + 1))
+
+    @property
+    def max_value(self) -> float:
+        """Maior valor com erro garantido (acima disso vai para o último bin)"""
+        return self.gamma ** (self.n_bins - 2)
+
+    def key(self, value: float) -> int:
+        if value < 1:
+            return 0
+        return min(1 + math.ceil(math.log(value) / self._log_gamma), self.n_bins - 1)
+
+    def keys(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        keys = np.zeros(values.shape, dtype=np.int64)
+        positive = values >= 1
+        keys[positive] = 1 + np.ceil(np.log(values[positive]) / self._log_gamma)
+        return np.minimum(keys, self.n_bins - 1)
+
+    def quantiles(self, bins: np.ndarray, qs: Sequence[float]) -> List[Optional[float]]:
+        """Quantis de um array de bins (None se vazio)"""
+        total = int(bins.sum())
+        if total == 0:
+            return [None] * len(qs)
+        cumulative = np.cumsum(bins)
+        # Primeiro bin cuja contagem acumulada passa do rank q·(n-1)
+        ranks = np.asarray(qs, dtype=float) * (total - 1)
+        idx = np.searchsorted(cumulative, ranks, side="right")
+        return [float(self.values[i]) for i in idx]
+
+
+# ============== SKETCH ==============
+
+class DDSketch:
+    """
+    Sketch de quantis com erro relativo α.
+
+    Exemplo:
+        sketch = DDSketch()
+        sketch.add(120)
+        sketch.quantile(0.99)
+        sketch.merge(other)       # união exata dos dois sketches
+    """
+
+    def __init__(self, mapping: Optional[SketchMapping] = None, bins: Optional[np.ndarray] = None):
+        self.mapping = mapping or SketchMapping()
+        self.bins = np.zeros(self.mapping.n_bins, dtype=np.int64) if bins is None else bins
+
+    @property
+    def count(self) -> int:
+        return int(self.bins.sum())
+
+    def add(self, value: float) -> None:
+        self.bins[self.mapping.key(value)] += 1
+
+    def add_many(self, values: Sequence[float]) -> None:
+        np.add.at(self.bins, self.mapping.keys(values), 1)
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.mapping.gamma != self.mapping.gamma or other.mapping.n_bins != self.mapping.n_bins:
+            raise ValueError("Sketches com mapeamentos diferentes não podem ser combinados")
+        self.bins += other.bins
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.mapping.quantiles(self.bins, [q])[0]
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> List[Optional[float]]:
+        return self.mapping.quantiles(self.bins, qs)
+
+
+# ============== BASELINES POR STATUS E HORA ==============
+
+class QuantileBaselines:
+    """
+    Sketches de `count` por status e hora do dia.
+
+    Exemplo:
+        baselines = QuantileBaselines()
+        baselines.add(120, "approved", hour=14)
+        baselines.baseline(status="approved", hour=14)   # {"count", "p50", "p95", "p99"}
+        baselines.baseline(hour=14)                      # todos os status (merge)
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, n_bins: int = 1024):
+        self.mapping = SketchMapping(relative_accuracy, n_bins)
+        self.bins = np.zeros((len(STATUS_NAMES), 24, n_bins), dtype=np.int64)
+        self.counts = np.zeros((len(STATUS_NAMES), 24), dtype=np.int64)
+
+    def clear(self) -> None:
+        self.bins[:] = 0
+        self.counts[:] = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.bins.nbytes + self.counts.nbytes
+
+    # ============== ESCRITA ==============
+
+    def add(self, count: float, status: str, hour: int) -> None:
+        """Registra uma observação em O(1)"""
+        code = encode_status(status)
+        self.bins[code, hour, self.mapping.key(count)] += 1
+        self.counts[code, hour] += 1
+
+    def add_many(self, counts: Sequence[float], statuses: Sequence[str], hours) -> None:
+        """Registra um lote (hours: int único ou um por observação)"""
+        codes = encode_statuses(statuses)
+        hours = np.broadcast_to(np.asarray(hours, dtype=np.int64), codes.shape)
+        np.add.at(self.bins, (codes, hours, self.mapping.keys(counts)), 1)
+        np.add.at(self.counts, (codes, hours), 1)
+
+    def merge(self, other: "QuantileBaselines") -> None:
+        if other.bins.shape != self.bins.shape or other.mapping.gamma != self.mapping.gamma:
+            raise ValueError("Baselines com mapeamentos diferentes não podem ser combinados")
+        self.bins += other.bins
+        self.counts += other.counts
+
+    # ============== SNAPSHOT ==============
+
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        return {
+            "gamma": np.array(self.mapping.gamma),
+            "bins": self.bins.copy(),
+            "counts": self.counts.copy(),
+        }
+
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        if state["bins"].shape != self.bins.shape or float(state["gamma"]) != self.mapping.gamma:
+            raise ValueError("Snapshot de baselines com mapeamento diferente")
+        self.bins[:] = state["bins"]
+        self.counts[:] = state["counts"]
+
+    # ============== CONSULTA ==============
+
+    def sketch(self, status: Optional[str] = None, hour: Optional[int] = None) -> DDSketch:
+        """Sketch de um recorte; eixos omitidos são combinados (merge)"""
+        bins = self.bins
+        bins = bins[encode_status(status)] if status is not None else bins.sum(axis=0)
+        bins = bins[hour] if hour is not None else bins.sum(axis=0)
+        return DDSketch(self.mapping, np.array(bins))
+
+    def count(self, status: Optional[str] = None, hour: Optional[int] = None) -> int:
+        counts = self.counts
+        counts = counts[encode_status(status)] if status is not None else counts.sum(axis=0)
+        return int(counts[hour] if hour is not None else counts.sum())
+
+    def baseline(self, status: Optional[str] = None, hour: Optional[int] = None) -> Dict[str, Optional[float]]:
+        """p50/p95/p99 do recorte (None se não houver observações)"""
+        p50, p95, p99 = self.sketch(status, hour).quantiles(DEFAULT_QUANTILES)
+        return {"count": self.count(status, hour), "p50": p50, "p95": p95, "p99": p99}
+
+    def hour_thresholds(self, hour: int, min_samples: int = 0) -> np.ndarray:
+        """
+        Matriz (status, 3) com p50/p95/p99 da hora para cada status.
+
+        NaN onde o status tem menos de `min_samples` observações na hora.
+        """
+        out = np.full((len(STATUS_NAMES), len(DEFAULT_QUANTILES)), np.nan)
+        for code in range(len(STATUS_NAMES)):
+            if self.counts[code, hour] and self.counts[code, hour] >= min_samples:
+                out[code] = self.mapping.quantiles(self.bins[code, hour], DEFAULT_QUANTILES)
+        return out
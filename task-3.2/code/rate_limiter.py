@@ -0,0 +1,328 @@
+"""
+🚦 Rate Limiter
+===============
+Phase 2: Performance - Rate limiting do Transaction Guardian
+
+Dois modos:
+- Local (padrão): token bucket em processo por cliente/rota, sem round
+  trip ao Redis por request. O consumo é reconciliado com o Redis em
+  background a cada `sync_interval` segundos, de modo que vários workers
+  compartilham o mesmo limite (com atraso máximo de um ciclo de sync).
+- Estrito (RATE_LIMIT_STRICT=true): sliding-window log no Redis (sorted
+  set) em um único script Lua por request — preciso entre workers.
+
+A decisão é tomada antes do handler: requests acima do limite recebem
+429 sem consumir CPU de análise.
+
+Configuração (env):
+    RATE_LIMIT_DEFAULT=100                # requests por janela (rotas sem limite próprio)
+    RATE_LIMIT_WINDOW=60                  # janela padrão em segundos
+    RATE_LIMIT_ROUTES=/transactions/batch=20/60,/mlops/train=5/60,/shugo/train=5/60
+    RATE_LIMIT_STRICT=false
+    RATE_LIMIT_SYNC_INTERVAL=5
+"""
+
+import os
+import time
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONFIGURATION ==============
+
+@dataclass(frozen=True)
+class RouteLimit:
+    """Limite de requisições por janela"""
+    limit: int = 100
+    window: int = 60  # segundos
+
+
+DEFAULT_LIMIT = RouteLimit(
+    limit=int(os.getenv("RATE_LIMIT_DEFAULT", 100)),
+    window=int(os.getenv("RATE_LIMIT_WINDOW", 60))
+)
+
+
+
+def _parse_route_limits(spec: str) -> Dict[str, RouteLimit]:
+    """"/rota=limite/janela,..." → {rota: RouteLimit}; janela omitida usa a padrão"""
+    routes = {}
+    for item in spec.split(","):
+        route, _, value = item.partition("=")
+        if not route.strip() or not value.strip():
+            continue
+        limit, _, window = value.partition("/")
+        routes[route.strip()] = RouteLimit(
+            limit=int(limit),
+            window=int(window) if window.strip() else DEFAULT_LIMIT.window
+        )
+    return routes
+
+
+# Limites por rota (prefixo mais longo vence)
+ROUTE_LIMITS: Dict[str, RouteLimit] = _parse_route_limits(os.getenv(
+    "RATE_LIMIT_ROUTES",
+    "/transactions/batch=20/60,/mlops/train=5/60,/shugo/train=5/60"
+))
+
+EXEMPT_PATHS = {"/health", "/metrics", "/docs", "/openapi.json", "/redoc"}
+
+# Sliding-window log: remove expirados, conta, registra e expira em um round trip
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window_ms)
+local current = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if current < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    current = current + 1
+    allowed = 1
+end
+redis.call('PEXPIRE', KEYS[1], window_ms)
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local reset_ms = window_ms
+if oldest[2] then
+    reset_ms = tonumber(oldest[2]) + window_ms - now
+end
+return {allowed, current, reset_ms}
+"""
+
+
+# ============== TOKEN BUCKET ==============
+
+class TokenBucket:
+    """Token bucket local: capacidade `limit`, recarga de limit/window por segundo"""
+
+    __slots__ = ("limit", "window", "rate", "tokens", "updated_at", "pending")
+
+    def __init__(self, route_limit: RouteLimit):
+        self.limit = route_limit.limit
+        self.window = route_limit.window
+        self.rate = route_limit.limit / route_limit.window
+        self.tokens = float(route_limit.limit)
+        self.updated_at = time.monotonic()
+        self.pending = 0  # Consumo ainda não enviado ao Redis
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.limit, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def consume(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.pending += 1
+            return True
+        return False
+
+    @property
+    def remaining(self) -> int:
+        return int(self.tokens)
+
+    @property
+    def reset_in(self) -> int:
+        """Segundos até o próximo token"""
+        if self.tokens >= 1:
+            return 0
+        return max(1, int((1 - self.tokens) / self.rate + 0.999))
+
+
+# ============== RATE LIMITER ==============
+
+class RateLimiter:
+    """
+    Subsistema de rate limiting por cliente e rota.
+
+    Exemplo:
+        limiter = RateLimiter(cache=state.cache)
+        result = await limiter.check(client_ip, request.url.path)
+        if not result["allowed"]:
+            ...  # 429
+    """
+
+    def __init__(
+        self,
+        cache=None,
+        routes: Optional[Dict[str, RouteLimit]] = None,
+        default: RouteLimit = DEFAULT_LIMIT,
+        strict: Optional[bool] = None,
+        sync_interval: float = None,
+        max_clients: int = 50_000
+    ):
+        self.cache = cache
+        self.routes = dict(ROUTE_LIMITS if routes is None else routes)
+        self.default = default
+        self.strict = strict if strict is not None else os.getenv("RATE_LIMIT_STRICT", "false").lower() == "true"
+        self.sync_interval = sync_interval or float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", 5))
+        self.max_clients = max_clients
+
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._sliding_script = None
+        self._sequence = itertools.count()
+        self._sync_task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "allowed": 0,
+            "rejected": 0,
+            "syncs": 0,
+            "sync_errors": 0,
+            "evicted_buckets": 0,
+        }
+
+    # ============== CONFIG ==============
+
+    def resolve(self, path: str) -> Tuple[str, RouteLimit]:
+        """Retorna (escopo, limite) para uma rota — prefixo mais longo vence"""
+        best = None
+        for prefix in self.routes:
+            if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        if best is None:
+            return "*", self.default
+        return best, self.routes[best]
+
+    @property
+    def redis_available(self) -> bool:
+        return self.cache is not None and getattr(self.cache, "connected", False)
+
+    # ============== CHECK ==============
+
+    async def check(self, client_id: str, path: str) -> Dict[str, Any]:
+        """Decide se o request pode seguir"""
+        scope, route_limit = self.resolve(path)
+
+        if self.strict and self.redis_available:
+            result = await self._check_sliding_window(client_id, scope, route_limit)
+        else:
+            result = self._check_local(client_id, scope, route_limit)
+
+        self.stats["allowed" if result["allowed"] else "rejected"] += 1
+        return result
+
+    def _bucket(self, client_id: str, scope: str, route_limit: RouteLimit) -> TokenBucket:
+        key = (client_id, scope)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(route_limit)
+            self._buckets[key] = bucket
+            # Memória limitada: descarta o bucket ocioso há mais tempo
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+                self.stats["evicted_buckets"] += 1
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _check_local(self, client_id: str, scope: str, route_limit: RouteLimit) -> Dict[str, Any]:
+        bucket = self._bucket(client_id, scope, route_limit)
+        allowed = bucket.consume()
+        return {
+            "allowed": allowed,
+            "remaining": bucket.remaining,
+            "reset_in": bucket.reset_in if not allowed else 0,
+            "limit": route_limit.limit,
+            "mode": "local"
+        }
+
+    async def _check_sliding_window(self, client_id: str, scope: str, route_limit: RouteLimit) -> Dict[str, Any]:
+        try:
+            if self._sliding_script is None:
+                self._sliding_script = self.cache.client.register_script(SLIDING_WINDOW_LUA)
+            now_ms = int(time.time() * 1000)
+            key = self.cache._make_key(f"ratelimit:sw:{scope}:{client_id}")
+            member = f"{now_ms}:{os.getpid()}:{next(self._sequence)}"
+            allowed, current, reset_ms = await self._sliding_script(
+                keys=[key], args=[now_ms, route_limit.window * 1000, route_limit.limit, member]
+            )
+            return {
+                "allowed": bool(allowed),
+                "remaining": max(0, route_limit.limit - current),
+                "reset_in": max(0, int(reset_ms / 1000 + 0.999)),
+                "limit": route_limit.limit,
+                "mode": "strict"
+            }
+        except Exception as e:
+            # Redis com problema: degrada para o bucket local
+            logger.error(f"Rate limit estrito indisponível: {e}")
+            return self._check_local(client_id, scope, route_limit)
+
+    # ============== SYNC COM REDIS ==============
+
+    async def sync(self) -> None:
+        """
+        Reconcilia buckets locais com o contador global no Redis.
+
+        Envia o consumo local acumulado (INCRBY) e, se o total global da
+        janela passou do limite, zera os tokens locais daquele cliente.
+        """
+        if not self.redis_available:
+            return
+
+        # Snapshot do consumo enviado: o que for consumido durante o round
+        # trip continua em `pending` para o próximo ciclo
+        dirty = [(key, bucket, bucket.pending) for key, bucket in self._buckets.items() if bucket.pending]
+        if not dirty:
+            return
+
+        try:
+            pipe = self.cache.client.pipeline(transaction=False)
+            for (client_id, scope), bucket, sent in dirty:
+                window_id = int(time.time() // bucket.window)
+                key = self.cache._make_key(f"ratelimit:tb:{scope}:{client_id}:{window_id}")
+                pipe.incrby(key, sent)
+                pipe.expire(key, bucket.window * 2)
+            replies = await pipe.execute()
+        except Exception as e:
+            self.stats["sync_errors"] += 1
+            logger.error(f"Erro no sync do rate limit: {e}")
+            return
+
+        for i, (_, bucket, sent) in enumerate(dirty):
+            bucket.pending -= sent
+            global_count = replies[2 * i]
+            bucket.tokens = min(bucket.tokens, max(0.0, bucket.limit - global_count))
+        self.stats["syncs"] += 1
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+    def start(self) -> None:
+        """Inicia a reconciliação periódica (requer event loop rodando)"""
+        if self._sync_task is None and not self.strict:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        await self.sync()
+
+    # ============== MÉTRICAS ==============
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "strict" if self.strict else "local",
+            "redis_sync": self.redis_available,
+            "sync_interval_seconds": self.sync_interval,
+            "active_buckets": len(self._buckets),
+            "default_limit": {"limit": self.default.limit, "window": self.default.window},
+            "routes": {p: {"limit": r.limit, "window": r.window} for p, r in self.routes.items()},
+            **self.stats
+        }
@@ -0,0 +1,237 @@
+"""
+🔁 Ring Buffer
+==============
+Armazenamento de estado em memória para o Transaction Guardian.
+
+Buffer circular preallocado com colunas NumPy:
+- count (int64)
+- status (int8, código de STATUS_CODES)
+- timestamp (float64, epoch em segundos)
+
+Características:
+- append O(1), sem cópias nem realocação
+- janelas zero-copy (views contíguas, somente leitura)
+- somas móveis mantidas incrementalmente por janela
+- memória limitada pela capacidade, independente da carga
+
+CloudWalk Task 3.2
+"""
+
+import time
+import numpy as np
+from typing import Dict, Iterable, Optional, Sequence
+
+# ============== STATUS ==============
+
+STATUS_CODES: Dict[str, int] = {
+    "approved": 0,
+    "denied": 1,
+    "failed": 2,
+    "reversed": 3,
+    "refunded": 4,
+}
+UNKNOWN_STATUS = len(STATUS_CODES)
+STATUS_NAMES = list(STATUS_CODES) + ["unknown"]
+
+
+def encode_status(status: str) -> int:
+    """Converte status textual em código numérico"""
+    return STATUS_CODES.get(status, UNKNOWN_STATUS)
+
+
+def encode_statuses(statuses: Iterable[str]) -> np.ndarray:
+    """Converte uma sequência de status em array de códigos"""
+    return np.fromiter((encode_status(s) for s in statuses), dtype=np.int8)
+
+
+# ============== RING BUFFER ==============
+
+class TransactionRing:
+    """
+    Buffer circular de transações.
+
+    Cada valor é gravado em duas posições (i e i + capacity) de um array
+    com o dobro da capacidade, de modo que as últimas N entradas sempre
+    formam uma fatia contígua — janelas são views, nunca cópias.
+
+    Exemplo:
+        ring = TransactionRing(capacity=1000, windows=(100,))
+        ring.append(120, "approved")
+        ring.window_mean(100)   # média móvel O(1)
+        ring.counts(50)         # view das últimas 50 contagens
+    """
+
+    def __init__(self, capacity: int = 1000, windows: Sequence[int] = ()):
+        if capacity <= 0:
+            raise ValueError("capacity deve ser positiva")
+
+        self.capacity = capacity
+        self._counts = np.zeros(2 * capacity, dtype=np.int64)
+        self._status = np.zeros(2 * capacity, dtype=np.int8)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self._head = 0  # Próxima posição de escrita
+        self._size = 0
+        self.total_appended = 0
+
+        # Somas móveis por janela (sempre inclui a capacidade total)
+        self._windows = sorted({min(w, capacity) for w in windows} | {capacity})
+        self._count_sums: Dict[int, int] = {w: 0 for w in self._windows}
+        self._status_sums: Dict[int, np.ndarray] = {
+            w: np.zeros(len(STATUS_NAMES), dtype=np.int64) for w in self._windows
+        }
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self) -> None:
+        """Esvazia o buffer sem realocar memória"""
+        self._head = 0
+        self._size = 0
+        self.total_appended = 0
+        for w in self._windows:
+            self._count_sums[w] = 0
+            self._status_sums[w][:] = 0
+
+    # ============== ESCRITA ==============
+
+    def append(self, count: int, status: str = "approved", timestamp: Optional[float] = None) -> None:
+        """Adiciona uma entrada em O(1)"""
+        code = encode_status(status)
+        head = self._head
+
+        # Retirar das somas o valor que sai de cada janela
+        for w in self._windows:
+            if self._size >= w:
+                old = (head - w) % self.capacity
+                self._count_sums[w] -= int(self._counts[old])
+                self._status_sums[w][self._status[old]] -= 1
+            self._count_sums[w] += count
+            self._status_sums[w][code] += 1
+
+        ts = time.time() if timestamp is None else timestamp
+        for pos in (head, head + self.capacity):
+            self._counts[pos] = count
+            self._status[pos] = code
+            self._timestamps[pos] = ts
+
+        self._head = (head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total_appended += 1
+
+    def extend(
+        self,
+        counts: Sequence[int],
+        statuses: Sequence[str],
+        timestamps: Optional[Sequence[float]] = None
+    ) -> None:
+        """Adiciona várias entradas com escrita vetorizada"""
+        counts = np.asarray(counts, dtype=np.int64)
+        n = len(counts)
+        if n == 0:
+            return
+        codes = encode_statuses(statuses)
+        if timestamps is None:
+            stamps = np.full(n, time.time(), dtype=np.float64)
+        else:
+            stamps = np.asarray(timestamps, dtype=np.float64)
+
+        self.total_appended += n
+
+        # Só as últimas `capacity` entradas sobrevivem
+        if n > self.capacity:
+            counts, codes, stamps = counts[-self.capacity:], codes[-self.capacity:], stamps[-self.capacity:]
+            self._head = (self._head + n - self.capacity) % self.capacity
+            n = self.capacity
+
+        positions = (self._head + np.arange(n)) % self.capacity
+        for offset in (0, self.capacity):
+            self._counts[positions + offset] = counts
+            self._status[positions + offset] = codes
+            self._timestamps[positions + offset] = stamps
+
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+        # Recalcular somas a partir das views (O(janela), uma vez por lote)
+        for w in self._windows:
+            span = min(w, self._size)
+            self._count_sums[w] = int(self.counts(span).sum())
+            self._status_sums[w] = np.bincount(self.statuses(span), minlength=len(STATUS_NAMES)).astype(np.int64)
+
+    # ============== SNAPSHOT ==============
+
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        """Entradas presentes (mais antiga primeiro), como cópias"""
+        return {
+            "counts": self.counts().copy(),
+            "statuses": self.statuses().copy(),
+            "timestamps": self.timestamps().copy(),
+            "total_appended": np.array(self.total_appended),
+        }
+
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        """Recarrega um snapshot (capacidade diferente mantém as mais recentes)"""
+        self.clear()
+        names = [STATUS_NAMES[code] for code in state["statuses"]]
+        self.extend(state["counts"], names, state["timestamps"])
+        self.total_appended = int(state["total_appended"])
+
+    # ============== JANELAS (ZERO-COPY) ==============
+
+    def _view(self, column: np.ndarray, n: Optional[int]) -> np.ndarray:
+        n = self._size if n is None else max(0, min(n, self._size))
+        end = self._head + self.capacity
+        view = column[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def counts(self, n: Optional[int] = None) -> np.ndarray:
+        """View das últimas N contagens (mais antiga primeiro)"""
+        return self._view(self._counts, n)
+
+    def statuses(self, n: Optional[int] = None) -> np.ndarray:
+        """View dos últimos N códigos de status"""
+        return self._view(self._status, n)
+
+    def timestamps(self, n: Optional[int] = None) -> np.ndarray:
+        """View dos últimos N timestamps"""
+        return self._view(self._timestamps, n)
+
+    def last(self) -> Optional[int]:
+        """Última contagem adicionada"""
+        if self._size == 0:
+            return None
+        return int(self._counts[self._head + self.capacity - 1])
+
+    # ============== SOMAS MÓVEIS ==============
+
+    def _tracked(self, window: Optional[int]) -> int:
+        w = self.capacity if window is None else min(window, self.capacity)
+        if w not in self._count_sums:
+            raise KeyError(f"Janela {window} não rastreada (use windows=...)")
+        return w
+
+    def window_size(self, window: Optional[int] = None) -> int:
+        """Quantidade de entradas efetivamente presentes na janela"""
+        w = self.capacity if window is None else window
+        return min(w, self._size)
+
+    def window_sum(self, window: Optional[int] = None) -> int:
+        """Soma das contagens na janela, em O(1)"""
+        return self._count_sums[self._tracked(window)]
+
+    def window_mean(self, window: Optional[int] = None) -> float:
+        """Média das contagens na janela, em O(1)"""
+        size = self.window_size(window)
+        if size == 0:
+            return 0.0
+        return self.window_sum(window) / size
+
+    def status_count(self, status: str, window: Optional[int] = None) -> int:
+        """Quantidade de entradas com determinado status na janela, em O(1)"""
+        return int(self._status_sums[self._tracked(window)][encode_status(status)])
+
+    def status_distribution(self, window: Optional[int] = None) -> Dict[str, int]:
+        """Distribuição de status na janela"""
+        sums = self._status_sums[self._tracked(window)]
+        return {name: int(sums[i]) for i, name in enumerate(STATUS_NAMES) if sums[i]}
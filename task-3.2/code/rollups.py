@@ -0,0 +1,383 @@
+"""
+🧮 Rollups
+==========
+Agregação multi-resolução em memória para o Transaction Guardian.
+
+Cada transação (count + status) entra em quatro tiers de buckets:
+
+    tier   bucket   slots   retenção
+    1s     1 s      3600    1 hora
+    1m     1 min    1440    1 dia
+    1h     1 hora   2160    90 dias
+    1d     1 dia    730     2 anos
+
+Por bucket e status são mantidos: eventos, soma, soma dos quadrados,
+mínimo e máximo de `count`. Os arrays são preallocados e circulares (o
+slot de um bucket é `bucket % slots`); um bucket é zerado quando seu slot
+é reaproveitado. Memória fixa (~1.9 MB), independente da carga.
+
+Consultas escolhem a resolução mais fina que cobre a janela sem passar de
+`max_points` pontos: 30 dias viram 720 pontos do tier 1h em vez de milhões
+de linhas.
+
+CloudWalk Task 3.2
+"""
+
+import time
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Any
+
+from .ring_buffer import STATUS_NAMES, encode_status, encode_statuses
+
+# ============== TIERS ==============
+
+# (nome, largura do bucket em segundos, slots)
+DEFAULT_TIERS = (
+    ("1s", 1, 3600),
+    ("1m", 60, 1440),
+    ("1h", 3600, 2160),
+    ("1d", 86400, 730),
+)
+
+N_STATUS = len(STATUS_NAMES)
+_EMPTY_MIN = np.iinfo(np.int64).max
+
+
+class RollupTier:
+    """Buckets circulares de uma resolução: arrays (slots, status)"""
+
+    def __init__(self, name: str, resolution: int, slots: int):
+        self.name = name
+        self.resolution = resolution
+        self.slots = slots
+        self.buckets = np.full(slots, -1, dtype=np.int64)  # Bucket gravado em cada slot
+        self.events = np.zeros((slots, N_STATUS), dtype=np.int64)
+        self.sums = np.zeros((slots, N_STATUS), dtype=np.int64)
+        self.sumsq = np.zeros((slots, N_STATUS), dtype=np.float64)
+        self.mins = np.full((slots, N_STATUS), _EMPTY_MIN, dtype=np.int64)
+        self.maxs = np.full((slots, N_STATUS), -1, dtype=np.int64)
+        self._events_flat = self.events.reshape(-1)
+        self._sums_flat = self.sums.reshape(-1)
+        self._sumsq_flat = self.sumsq.reshape(-1)
+        self._mins_flat = self.mins.reshape(-1)
+        self._maxs_flat = self.maxs.reshape(-1)
+        self._last_bucket, self._last_slot = -1, -1  # Atalho para o bucket corrente
+
+    @property
+    def retention(self) -> int:
+        """Segundos cobertos pelo tier"""
+        return self.resolution * self.slots
+
+    def clear(self) -> None:
+        self.buckets[:] = -1
+        self._reset(slice(None))
+        self._last_bucket, self._last_slot = -1, -1
+
+    def _reset(self, slots) -> None:
+        self.events[slots] = 0
+        self.sums[slots] = 0
+        self.sumsq[slots] = 0.0
+        self.mins[slots] = _EMPTY_MIN
+        self.maxs[slots] = -1
+
+    def _claim(self, bucket: int) -> int:
+        """Slot do bucket (zera o slot se guardava um bucket mais antigo); -1 se expirado"""
+        slot = bucket % self.slots
+        current = self.buckets[slot]
+        if current != bucket:
+            if current > bucket:
+                return -1
+            self._reset(slot)
+            self.buckets[slot] = bucket
+        return slot
+
+    def add(self, timestamp: float, code: int, count: int) -> None:
+        bucket = int(timestamp // self.resolution)
+        if bucket == self._last_bucket:
+            slot = self._last_slot
+        else:
+            slot = self._claim(bucket)
+            if slot < 0:
+                return
+            self._last_bucket, self._last_slot = bucket, slot
+        # Views 1-D: indexação escalar bem mais barata que (slot, code)
+        i = slot * N_STATUS + code
+        self._events_flat[i] += 1
+        self._sums_flat[i] += count
+        self._sumsq_flat[i] += count * count
+        if count < self._mins_flat[i]:
+            self._mins_flat[i] = count
+        if count > self._maxs_flat[i]:
+            self._maxs_flat[i] = count
+
+    def add_many(self, timestamps: np.ndarray, codes: np.ndarray, counts: np.ndarray) -> None:
+        buckets = (timestamps // self.resolution).astype(np.int64)
+        self._last_bucket, self._last_slot = -1, -1
+        for bucket in np.unique(buckets):
+            self._claim(int(bucket))
+        # Descarta buckets expirados e os que perderam o slot para um mais
+        # novo do mesmo lote (lote maior que a retenção do tier)
+        slots = buckets % self.slots
+        keep = self.buckets[slots] == buckets
+        if not keep.all():
+            slots, codes, counts = slots[keep], codes[keep], counts[keep]
+        np.add.at(self.events, (slots, codes), 1)
+        np.add.at(self.sums, (slots, codes), counts)
+        np.add.at(self.sumsq, (slots, codes), counts.astype(np.float64) ** 2)
+        np.minimum.at(self.mins, (slots, codes), counts)
+        np.maximum.at(self.maxs, (slots, codes), counts)
+
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        return {
+            "buckets": self.buckets.copy(),
+            "events": self.events.copy(),
+            "sums": self.sums.copy(),
+            "sumsq": self.sumsq.copy(),
+            "mins": self.mins.copy(),
+            "maxs": self.maxs.copy(),
+        }
+
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        if state["events"].shape != self.events.shape:
+            raise ValueError(f"Tier {self.name}: snapshot com {state['events'].shape}, esperado {self.events.shape}")
+        # Cópia in-place: as views 1-D continuam apontando para os mesmos arrays
+        for name in ("buckets", "events", "sums", "sumsq", "mins", "maxs"):
+            getattr(self, name)[:] = state[name]
+        self._last_bucket, self._last_slot = -1, -1
+
+    def window(self, first: int, last: int):
+        """
+        Buckets [first, last] em ordem, como arrays (n, status).
+
+        Buckets vazios ou já sobrescritos voltam zerados.
+        """
+        buckets = np.arange(first, last + 1, dtype=np.int64)
+        slots = buckets % self.slots
+        valid = (self.buckets[slots] == buckets)[:, None]
+        return (
+            buckets,
+            np.where(valid, self.events[slots], 0),
+            np.where(valid, self.sums[slots], 0),
+            np.where(valid, self.sumsq[slots], 0.0),
+            np.where(valid, self.mins[slots], _EMPTY_MIN),
+            np.where(valid, self.maxs[slots], -1),
+        )
+
+
+# ============== ENGINE ==============
+
+class RollupEngine:
+    """
+    Rollups 1s / 1m / 1h / 1d alimentados pelo caminho de transações.
+
+    Exemplo:
+        rollups = RollupEngine()
+        rollups.add(120, "approved")
+        rollups.series(window=30 * 86400)      # escolhe o tier 1h
+        rollups.summary(window=3600)           # totais da última hora
+    """
+
+    def __init__(self, tiers: Sequence = DEFAULT_TIERS):
+        self.tiers: Dict[str, RollupTier] = {
+            name: RollupTier(name, resolution, slots) for name, resolution, slots in tiers
+        }
+        self._ordered = sorted(self.tiers.values(), key=lambda tier: tier.resolution)
+        self.total_events = 0
+
+    def clear(self) -> None:
+        for tier in self._ordered:
+            tier.clear()
+        self.total_events = 0
+
+    # ============== ESCRITA ==============
+
+    def add(self, count: int, status: str = "approved", timestamp: Optional[float] = None) -> None:
+        """Registra uma transação em todos os tiers"""
+        ts = time.time() if timestamp is None else timestamp
+        code = encode_status(status)
+        for tier in self._ordered:
+            tier.add(ts, code, count)
+        self.total_events += 1
+
+    def add_many(
+        self,
+        counts: Sequence[int],
+        statuses: Sequence[str],
+        timestamps: Optional[Sequence[float]] = None
+    ) -> None:
+        """Registra um lote com escrita vetorizada"""
+        counts = np.asarray(counts, dtype=np.int64)
+        if len(counts) == 0:
+            return
+        codes = encode_statuses(statuses)
+        if timestamps is None:
+            stamps = np.full(len(counts), time.time(), dtype=np.float64)
+        else:
+            stamps = np.asarray(timestamps, dtype=np.float64)
+        for tier in self._ordered:
+            tier.add_many(stamps, codes, counts)
+        self.total_events += len(counts)
+
+    # ============== CONSULTA ==============
+
+    def choose_tier(self, window: float, max_points: int = 1000) -> RollupTier:
+        """Tier mais fino que cobre a janela com no máximo `max_points` buckets"""
+        for tier in self._ordered:
+            if window <= tier.retention and window / tier.resolution <= max_points:
+                return tier
+        return self._ordered[-1]
+
+    def _select(self, window: float, resolution: Optional[str], max_points: int, now: Optional[float]):
+        if resolution is not None:
+            if resolution not in self.tiers:
+                raise ValueError(f"Resolução desconhecida: {resolution} (use {', '.join(self.tiers)})")
+            tier = self.tiers[resolution]
+        else:
+            tier = self.choose_tier(window, max_points)
+        now = time.time() if now is None else now
+        last = int(now // tier.resolution)
+        span = min(int(np.ceil(window / tier.resolution)), tier.slots)
+        return tier, tier.window(last - span + 1, last)
+
+    def series(
+        self,
+        window: float,
+        resolution: Optional[str] = None,
+        max_points: int = 1000,
+        status: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Série temporal da janela (segundos até agora), em colunas.
+
+        Buckets vazios têm events=0 e min/max None.
+        """
+        tier, (buckets, events, sums, sumsq, mins, maxs) = self._select(window, resolution, max_points, now)
+        if status is not None:
+            code = encode_status(status)
+            events, sums, mins, maxs = events[:, code], sums[:, code], mins[:, code], maxs[:, code]
+        else:
+            events, sums, mins, maxs = events.sum(axis=1), sums.sum(axis=1), mins.min(axis=1), maxs.max(axis=1)
+
+        empty = events == 0
+        return {
+            "resolution": tier.name,
+            "bucket_seconds": tier.resolution,
+            "points": len(buckets),
+            "timestamps": (buckets * tier.resolution).tolist(),
+            "events": events.tolist(),
+            "sum": sums.tolist(),
+            "min": [None if e else int(v) for e, v in zip(empty, mins)],
+            "max": [None if e else int(v) for e, v in zip(empty, maxs)],
+        }
+
+    def summary(
+        self,
+        window: float,
+        resolution: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Totais da janela: eventos por status e estatísticas de `count`"""
+        tier, (buckets, events, sums, sumsq, mins, maxs) = self._select(window, resolution, 10_000, now)
+        per_status = events.sum(axis=0)
+        n = int(per_status.sum())
+        total = int(sums.sum())
+        mean = total / n if n else 0.0
+        variance = max(0.0, float(sumsq.sum()) / n - mean * mean) if n else 0.0
+        return {
+            "resolution": tier.name,
+            "bucket_seconds": tier.resolution,
+            "window_seconds": int(window),
+            "events": n,
+            "volume": total,
+            "status_distribution": {
+                name: int(per_status[i]) for i, name in enumerate(STATUS_NAMES) if per_status[i]
+            },
+            "transaction_stats": {
+                "min": int(mins.min()) if n else 0,
+                "max": int(maxs.max()) if n else 0,
+                "avg": round(mean, 2),
+                "std": round(variance ** 0.5, 2),
+            },
+        }
+
+    def last_complete(self, resolution: str, now: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """Último bucket fechado da resolução, por status (para o exporter)"""
+        tier = self.tiers[resolution]
+        now = time.time() if now is None else now
+        bucket = int(now // tier.resolution) - 1
+        _, events, sums, _, mins, maxs = tier.window(bucket, bucket)
+        return {
+            name: {
+                "events": int(events[0, i]),
+                "sum": int(sums[0, i]),
+                "min": int(mins[0, i]) if events[0, i] else 0,
+                "max": int(maxs[0, i]) if events[0, i] else 0,
+            }
+            for i, name in enumerate(STATUS_NAMES)
+        }
+
+    def seasonal_baseline(self, period: str = "hour", utc_offset: Optional[float] = None) -> List[Dict[str, float]]:
+        """
+        Média e desvio de `count` por hora do dia (period="hour", 24 itens)
+        ou dia da semana (period="weekday", 7 itens, segunda=0), sobre toda
+        a retenção do tier 1h, no fuso local.
+        """
+        tier = self.tiers["1h"]
+        if utc_offset is None:
+            utc_offset = time.localtime().tm_gmtoff
+        valid = tier.buckets >= 0
+        local = (tier.buckets[valid] * tier.resolution + int(utc_offset)) // 3600
+        if period == "hour":
+            keys, size = local % 24, 24
+        elif period == "weekday":
+            keys, size = (local // 24 + 3) % 7, 7  # 1970-01-01 foi quinta-feira
+        else:
+            raise ValueError(f"Período desconhecido: {period}")
+
+        events = np.bincount(keys, weights=tier.events[valid].sum(axis=1), minlength=size)
+        sums = np.bincount(keys, weights=tier.sums[valid].sum(axis=1), minlength=size)
+        sumsq = np.bincount(keys, weights=tier.sumsq[valid].sum(axis=1), minlength=size)
+
+        baselines = []
+        for i in range(size):
+            n = events[i]
+            mean = sums[i] / n if n else 0.0
+            std = max(0.0, sumsq[i] / n - mean * mean) ** 0.5 if n else 0.0
+            baselines.append({"events": int(n), "mean": float(mean), "std": float(std)})
+        return baselines
+
+    # ============== SNAPSHOT ==============
+
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        state = {"total_events": np.array(self.total_events)}
+        for name, tier in self.tiers.items():
+            state.update({f"{name}.{key}": value for key, value in tier.snapshot_state().items()})
+        return state
+
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        """Restaura os tiers presentes no snapshot com o mesmo formato"""
+        for name, tier in self.tiers.items():
+            prefix = f"{name}."
+            tier_state = {key[len(prefix):]: value for key, value in state.items() if key.startswith(prefix)}
+            if tier_state:
+                tier.restore_state(tier_state)
+        self.total_events = int(state["total_events"])
+
+    def warm_start(self, counts: np.ndarray, statuses: Sequence[str], timestamps: np.ndarray) -> None:
+        """Reconstrução a partir do histórico do banco"""
+        self.add_many(counts, statuses, timestamps)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "total_events": self.total_events,
+            "tiers": {
+                name: {
+                    "bucket_seconds": tier.resolution,
+                    "slots": tier.slots,
+                    "retention_seconds": tier.retention,
+                    "active_buckets": int((tier.buckets >= 0).sum()),
+                }
+                for name, tier in self.tiers.items()
+            },
+        }
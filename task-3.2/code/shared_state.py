@@ -0,0 +1,469 @@
+"""
+🔗 Shared State
+===============
+Estado compartilhado entre workers (uvicorn/gunicorn --workers N) via Redis.
+
+Cada worker continua atendendo requests só com estado em memória (nenhum
+round trip ao Redis no request path). Um loop em background reconcilia a
+cada SHARED_STATE_SYNC_INTERVAL segundos, no mesmo modelo do rate limiter:
+
+- Contadores (transações, anomalias, status): o worker envia o delta local
+  (HINCRBY) e adota o total global, somando o que chegou durante o round trip
+- Histórico recente: entradas novas vão para uma lista global (RPUSH +
+  LTRIM); o ring da API e o histórico do detector são remontados a partir
+  dela, e média/desvio móveis recalculados, então todos os workers pontuam
+  com as mesmas estatísticas
+- Anomalias recentes: lista global com as últimas 100
+- Quantis por status/hora: deltas dos bins (HINCRBY esparso) a cada
+  SHARED_STATE_QUANTILE_EVERY ciclos
+- Modelo: um único escritor, eleito por lease no Redis, treina e publica o
+  modelo; os demais instalam a versão publicada sem treinar
+- Auth: API keys criadas/revogadas em qualquer worker e o segredo JWT
+  (quando JWT_SECRET não está no ambiente) valem para todos
+
+Sem Redis (ou SHARED_STATE_ENABLED=false) nada muda: cada worker é
+independente e sempre se considera escritor. Rollups e o Shugo continuam
+por worker (as consultas de janela longa já vêm do TimescaleDB).
+
+O modelo publicado é serializado com pickle: o Redis deve ser acessível
+apenas pelo serviço.
+
+Configuração (env):
+    SHARED_STATE_ENABLED=false
+    SHARED_STATE_SYNC_INTERVAL=1.0
+    SHARED_STATE_LEASE_SECONDS=10
+    SHARED_STATE_QUANTILE_EVERY=10
+
+CloudWalk Task 3.2
+"""
+
+import os
+import json
+import time
+import base64
+import pickle
+import socket
+import asyncio
+import secrets
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import auth
+from .ring_buffer import STATUS_NAMES
+
+logger = logging.getLogger(__name__)
+
+HISTORY_CAPACITY = 1000
+ANOMALIES_CAPACITY = 100
+
+# Renova o lease se já é o dono; senão tenta adquirir
+LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+
+def _pack_entries(counts, codes, stamps) -> List[str]:
+    return [f"{int(c)}:{int(s)}:{float(t):.3f}" for c, s, t in zip(counts, codes, stamps)]
+
+
+def _unpack_entries(raw: List[str]) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """Entradas da lista global, ordenadas por timestamp"""
+    if not raw:
+        return np.zeros(0, dtype=np.int64), [], np.zeros(0)
+    parts = np.array([entry.split(":") for entry in raw], dtype=float)
+    order = np.argsort(parts[:, 2], kind="stable")
+    parts = parts[order]
+    names = [STATUS_NAMES[min(int(code), len(STATUS_NAMES) - 1)] for code in parts[:, 1]]
+    return parts[:, 0].astype(np.int64), names, parts[:, 2]
+
+
+def _ring_tail(ring, n: int):
+    """Últimas n entradas de um TransactionRing (cópias)"""
+    n = min(n, len(ring))
+    return ring.counts(n).copy(), ring.statuses(n).copy(), ring.timestamps(n).copy()
+
+
+class SharedState:
+    """
+    Sincroniza o AppState de um worker com os demais pelo Redis.
+
+    Exemplo:
+        shared = SharedState(state)
+        shared.attach(state.cache)      # após conectar o Redis
+        shared.start()
+        ...
+        await shared.stop()             # envia os últimos deltas
+    """
+
+    def __init__(
+        self,
+        app_state,
+        sync_interval: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.state = app_state
+        self.detector = app_state.detector
+        self.cache = None
+        self.enabled = enabled if enabled is not None else os.getenv("SHARED_STATE_ENABLED", "false").lower() == "true"
+        self.sync_interval = sync_interval or float(os.getenv("SHARED_STATE_SYNC_INTERVAL", 1.0))
+        self.lease_ms = int(float(os.getenv("SHARED_STATE_LEASE_SECONDS", 10)) * 1000)
+        self.quantile_every = max(1, int(os.getenv("SHARED_STATE_QUANTILE_EVERY", 10)))
+        self.share_jwt_secret = "JWT_SECRET" not in os.environ
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+        self.is_writer = True  # Sem Redis todo worker treina o próprio modelo
+        self._lease_script = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._cycle = 0
+        self._model_version = 0  # Monotônica no cluster: sobrevive ao reset
+        self._reset_markers()
+
+        self.stats = {
+            "syncs": 0,
+            "sync_errors": 0,
+            "last_sync_ms": 0.0,
+            "last_error": None,
+            "models_published": 0,
+            "models_installed": 0,
+            "writer_changes": 0,
+        }
+
+    def _reset_markers(self) -> None:
+        """Nada enviado ainda: o próximo sync refaz o join com o cluster"""
+        self._joined = False
+        self._base: Dict[str, int] = {}
+        self._sent_ring = 0
+        self._sent_anomalies = 0
+        self._quantile_base: Optional[np.ndarray] = None
+        self._published_fit = self.detector.fit_count
+
+    # ============== CONEXÃO ==============
+
+    def attach(self, cache) -> None:
+        self.cache = cache
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.cache is not None and getattr(self.cache, "connected", False)
+
+    def _key(self, name: str) -> str:
+        return self.cache._make_key(f"state:{name}")
+
+    # ============== CONTADORES ==============
+
+    def _counters(self) -> Dict[str, int]:
+        """Contadores aditivos do worker, achatados para um hash Redis"""
+        metrics = self.state.metrics
+        counters = {
+            "transactions_processed": self.state.transactions_processed,
+            "anomalies_detected": self.state.anomalies_detected,
+            "total_transactions": metrics["total_transactions"],
+            "total_anomalies": metrics["total_anomalies"],
+        }
+        for status, count in metrics["status_counts"].items():
+            counters[f"status:{status}"] = count
+        return counters
+
+    def _apply_counters(self, counters: Dict[str, int]) -> None:
+        metrics = self.state.metrics
+        self.state.transactions_processed = counters.get("transactions_processed", 0)
+        self.state.anomalies_detected = counters.get("anomalies_detected", 0)
+        metrics["total_transactions"] = counters.get("total_transactions", 0)
+        metrics["total_anomalies"] = counters.get("total_anomalies", 0)
+        for key, value in counters.items():
+            if key.startswith("status:"):
+                metrics["status_counts"][key[len("status:"):]] = value
+        approved = metrics["status_counts"].get("approved", 0)
+        metrics["approval_rate"] = round(approved / max(metrics["total_transactions"], 1), 4)
+        if self.state.recent_transactions:
+            metrics["avg_count"] = self.state.recent_transactions.window_mean(100)
+
+    # ============== SYNC ==============
+
+    async def sync(self) -> bool:
+        """
+        Um ciclo de reconciliação (um round trip; dois se há modelo novo).
+
+        Tudo que é lido antes do `await` é enviado; o que os handlers gravam
+        durante o round trip é reaplicado por cima do estado global.
+        """
+        if not self.active:
+            return False
+        async with self._lock:
+            started = time.perf_counter()
+            try:
+                joined = self._joined
+                await self._sync()
+                if not joined:
+                    await self._sync()  # Já entra no cluster com o estado global
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                self.stats["last_error"] = str(e)
+                logger.error(f"Erro no sync de estado compartilhado: {e}")
+                return False
+            self.stats["syncs"] += 1
+            self.stats["last_sync_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            return True
+
+    async def _sync(self) -> None:
+        ring = self.state.recent_transactions
+        quantiles = self.detector.quantiles
+        self._cycle += 1
+        sync_quantiles = not self._joined or self._cycle % self.quantile_every == 0
+
+        # Modelo novo treinado aqui: serializa em thread antes do snapshot local
+        model_blob = None
+        published_fit = self.detector.fit_count
+        if self.is_writer and published_fit != self._published_fit and self.detector.is_trained:
+            model_blob = await asyncio.to_thread(self._dump_model)
+
+        # ---- Snapshot local (sem await até o execute) ----
+        counters = self._counters()
+        ring_mark = ring.total_appended
+        history_mark = self.detector.history.total_appended
+        # Contador local: anomalies_detected vira o total global após o merge
+        anomalies_mark = self.state.recent_anomalies_appended
+        bins = quantiles.bins.copy() if sync_quantiles else None
+        if auth.store.pending_changes is None:
+            # Passa a registrar alterações de API keys, começando pelas já existentes
+            auth.store.pending_changes = [("add", h, data) for h, data in auth.store.api_keys.items()]
+        pending_keys = list(auth.store.pending_changes)
+        auth.store.pending_changes.clear()
+
+        pipe = self.cache.client.pipeline(transaction=False)
+        if self._joined:
+            for key, value in counters.items():
+                delta = value - self._base.get(key, 0)
+                if delta:
+                    pipe.hincrby(self._key("counters"), key, delta)
+            new_entries = min(ring_mark - self._sent_ring, ring.capacity)
+            if new_entries > 0:
+                pipe.rpush(self._key("history"), *_pack_entries(*_ring_tail(ring, new_entries)))
+                pipe.ltrim(self._key("history"), -HISTORY_CAPACITY, -1)
+            new_anomalies = min(anomalies_mark - self._sent_anomalies, len(self.state.recent_anomalies))
+            if new_anomalies > 0:
+                records = self.state.recent_anomalies[-new_anomalies:]
+                pipe.rpush(self._key("anomalies"), *(json.dumps(r, default=str) for r in records))
+                pipe.ltrim(self._key("anomalies"), -ANOMALIES_CAPACITY, -1)
+            if bins is not None:
+                delta_bins = (bins - self._quantile_base).ravel()
+                for index in np.flatnonzero(delta_bins):
+                    pipe.hincrby(self._key("quantiles"), str(int(index)), int(delta_bins[index]))
+        for action, key_hash, data in pending_keys:
+            if action == "add":
+                pipe.hset(self._key("api_keys"), key_hash, json.dumps(data, default=str))
+            else:
+                pipe.hdel(self._key("api_keys"), key_hash)
+        if model_blob is not None:
+            pipe.set(self._key("model"), model_blob)
+            pipe.incr(self._key("model_version"))
+        mark = len(pipe)
+        pipe.set(self._key("seeded"), self.worker_id, nx=True)
+        pipe.hgetall(self._key("counters"))
+        pipe.lrange(self._key("history"), 0, -1)
+        pipe.lrange(self._key("anomalies"), 0, -1)
+        pipe.hgetall(self._key("quantiles"))
+        pipe.hgetall(self._key("api_keys"))
+        pipe.get(self._key("model_version"))
+        if self.share_jwt_secret:
+            pipe.set(self._key("jwt_secret"), auth.JWT_SECRET, nx=True)
+            pipe.get(self._key("jwt_secret"))
+        if self._lease_script is None:
+            self._lease_script = self.cache.client.register_script(LEASE_LUA)
+        await self._lease_script(keys=[self._key("writer")], args=[self.worker_id, self.lease_ms], client=pipe)
+
+        try:
+            replies = await pipe.execute()
+        except Exception:
+            auth.store.pending_changes[:0] = pending_keys  # Reenvia no próximo ciclo
+            raise
+
+        (seeded, g_counters, g_history, g_anomalies, g_quantiles,
+         g_keys, g_model_version, *secret_replies, lease) = replies[mark:]
+
+        # ---- Merge: global + o que chegou localmente durante o round trip ----
+        if not self._joined:
+            # Só o primeiro worker do cluster semeia com o estado local; os
+            # demais adotam o global (um snapshot restaurado não conta duas vezes)
+            self._join(bool(seeded), counters, ring_mark, anomalies_mark, bins)
+        else:
+            g_counters = {k: int(v) for k, v in g_counters.items()}
+            now = self._counters()
+            self._apply_counters({
+                k: g_counters.get(k, 0) + now.get(k, 0) - counters.get(k, 0)
+                for k in set(now) | set(g_counters)
+            })
+            self._base = {k: g_counters.get(k, 0) for k in counters}
+            self._merge_history(g_history, ring_mark, history_mark)
+            self._merge_anomalies(g_anomalies, anomalies_mark)
+            if bins is not None:
+                self._merge_quantiles(g_quantiles, bins)
+
+        self._merge_api_keys(g_keys)
+        if secret_replies and secret_replies[-1] and secret_replies[-1] != auth.JWT_SECRET:
+            auth.set_jwt_secret(secret_replies[-1])
+
+        self._set_writer(bool(lease))
+        if model_blob is not None:
+            self._published_fit = published_fit
+            self._model_version = int(replies[mark - 1])
+            self.stats["models_published"] += 1
+        elif g_model_version is not None and int(g_model_version) != self._model_version:
+            await self._install_model(int(g_model_version))
+
+    def _join(self, seed: bool, counters, ring_mark: int, anomalies_mark: int, bins) -> None:
+        """Base do primeiro sync: o que ainda falta enviar ao cluster"""
+        if seed:
+            self._base = {}
+            self._sent_ring = max(0, ring_mark - self.state.recent_transactions.capacity)
+            self._sent_anomalies = anomalies_mark - len(self.state.recent_anomalies)
+            self._quantile_base = np.zeros_like(bins)
+        else:
+            self._base = dict(counters)
+            self._sent_ring = ring_mark
+            self._sent_anomalies = anomalies_mark
+            self._quantile_base = bins
+        self._joined = True
+
+    def _merge_history(self, raw: List[str], ring_mark: int, history_mark: int) -> None:
+        ring = self.state.recent_transactions
+        history = self.detector.history
+        counts, names, stamps = _unpack_entries(raw)
+
+        arrived = ring.total_appended - ring_mark
+        pending = _ring_tail(ring, arrived)
+        ring.clear()
+        ring.extend(counts, names, stamps)
+        self._sent_ring = ring.total_appended
+        if arrived:
+            ring.extend(pending[0], [STATUS_NAMES[c] for c in pending[1]], pending[2])
+
+        arrived = history.total_appended - history_mark
+        pending = _ring_tail(history, arrived)
+        tail = slice(-history.capacity, None)
+        history.clear()
+        history.extend(counts[tail], names[tail], stamps[tail])
+        if arrived:
+            history.extend(pending[0], [STATUS_NAMES[c] for c in pending[1]], pending[2])
+        self.detector.recompute_statistics()
+
+    def _merge_anomalies(self, raw: List[str], anomalies_mark: int) -> None:
+        arrived = self.state.recent_anomalies_appended - anomalies_mark
+        local = self.state.recent_anomalies[-arrived:] if arrived > 0 else []
+        self.state.recent_anomalies = [json.loads(r) for r in raw] + local
+        self._sent_anomalies = anomalies_mark
+
+    def _merge_quantiles(self, raw: Dict[str, str], sent_bins: np.ndarray) -> None:
+        quantiles = self.detector.quantiles
+        merged = np.zeros(quantiles.bins.size, dtype=np.int64)
+        if raw:
+            merged[np.fromiter(raw.keys(), dtype=np.int64)] = np.fromiter(raw.values(), dtype=np.int64)
+        merged = merged.reshape(quantiles.bins.shape)
+        quantiles.bins[:] = merged + (quantiles.bins - sent_bins)
+        quantiles.counts[:] = quantiles.bins.sum(axis=2)
+        self.detector._thresholds = None
+        self._quantile_base = merged
+
+    def _merge_api_keys(self, raw: Dict[str, str]) -> None:
+        store = auth.store
+        merged = {key_hash: json.loads(data) for key_hash, data in raw.items()}
+        for key_hash, data in merged.items():
+            if key_hash in store.api_keys:
+                # Mantém o dict local (last_used é atualizado in-place)
+                merged[key_hash] = store.api_keys[key_hash]
+        for action, key_hash, data in store.pending_changes:
+            if action == "add":
+                merged[key_hash] = data
+            else:
+                merged.pop(key_hash, None)
+        store.api_keys = merged
+
+    # ============== MODELO ==============
+
+    def _set_writer(self, is_writer: bool) -> None:
+        if is_writer != self.is_writer:
+            self.stats["writer_changes"] += 1
+            logger.info(f"🎓 Worker {self.worker_id} {'assumiu' if is_writer else 'deixou'} o treino do modelo")
+        self.is_writer = is_writer
+
+    def _dump_model(self) -> str:
+        detector = self.detector
+        with detector._model_lock:
+            payload = {
+                "model": detector.model,
+                "score_table": detector.score_table,
+                "training_samples": detector.training_samples,
+                "fit_duration": detector.fit_duration,
+            }
+            return base64.b64encode(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)).decode()
+
+    async def _install_model(self, version: int) -> None:
+        blob = await self.cache.client.get(self._key("model"))
+        if blob is None:
+            return
+        saved = await asyncio.to_thread(lambda: pickle.loads(base64.b64decode(blob)))
+        self.detector.install_model(
+            saved["model"], saved["training_samples"], saved["fit_duration"], saved["score_table"]
+        )
+        self._model_version = version
+        self._published_fit = self.detector.fit_count  # Não republica o modelo recebido
+        self.stats["models_installed"] += 1
+
+    # ============== LOOP ==============
+
+    async def reset(self) -> None:
+        """Apaga o estado global (POST /reset); os outros workers adotam o vazio"""
+        async with self._lock:
+            if self.active:
+                names = ("seeded", "counters", "history", "anomalies", "quantiles")
+                try:
+                    await self.cache.client.delete(*(self._key(name) for name in names))
+                except Exception as e:
+                    logger.error(f"Erro ao resetar estado compartilhado: {e}")
+            self._reset_markers()
+
+    def start(self) -> None:
+        """Inicia a reconciliação periódica (requer event loop rodando)"""
+        if not self.active or self._task is not None:
+            return
+        self.is_writer = False  # Até adquirir o lease no primeiro sync
+        self._task = asyncio.create_task(self._run())
+        print(f"🔗 Estado compartilhado via Redis (worker {self.worker_id})")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.sync()
+
+    async def _run(self) -> None:
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.sync_interval)
+
+    # ============== MÉTRICAS ==============
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "active": self.active,
+            "worker_id": self.worker_id,
+            "is_writer": self.is_writer,
+            "sync_interval_seconds": self.sync_interval,
+            "model_version": self._model_version,
+            **self.stats
+        }
@@ -6,19 +6,25 @@ Phase 7: Predictive Anomaly Detection
 "Vê o futuro, protege o presente"
 
 Features:
-- Time series forecasting
+- Time series forecasting (sazonal vetorizado, com intervalos)
 - Pattern recognition
 - Seasonal detection
 - Early warning alerts
 """
 
 import os
+import time
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from collections import deque
 from dataclasses import dataclass, field
 
+from .quantile_sketch import QuantileBaselines
+from .forecasting import MinuteSeries, SeasonalForecaster, load_minute_csv
+from .ring_buffer import STATUS_NAMES, encode_statuses
+from .snapshot import prefixed, section
+
 SHUGO_LOGO = """
 ╔═══════════════════════════════════════════════════════╗
 ║                                                       ║
@@ -44,6 +50,9 @@ class Prediction:
     trend: str  # "up", "down", "stable"
     alert_probability: float
     warning_message: Optional[str] = None
+    # Intervalo de 95% (só quando vem do modelo sazonal)
+    lower: Optional[float] = None
+    upper: Optional[float] = None
     
 
 @dataclass
@@ -56,6 +65,122 @@ class Pattern:
     impact: str  # "positive", "negative", "neutral"
 
 
+class BucketWindows:
+    """
+    Últimas `capacity` observações por bucket (hora do dia, dia da semana)
+    em um array circular, com soma e soma dos quadrados mantidas a cada
+    inserção: média e desvio saem em O(1).
+    
+    A média geral (média das médias dos buckets com >= `min_points`) também
+    é mantida por delta: cada inserção troca só a contribuição do próprio
+    bucket.
+    """
+    
+    def __init__(self, n_buckets: int, capacity: int = 100, min_points: int = 5):
+        self.capacity = capacity
+        self.min_points = min_points
+        self.values = np.zeros((n_buckets, capacity), dtype=np.int64)
+        self.heads = [0] * n_buckets
+        self.sizes = [0] * n_buckets
+        self.sums = [0] * n_buckets
+        self.sumsq = [0] * n_buckets
+        # Contribuição de cada bucket para a média geral (None se < min_points)
+        self._contrib: List[Optional[float]] = [None] * n_buckets
+        self._contrib_sum = 0.0
+        self._qualified = 0
+        self._updates = 0
+    
+    def __len__(self) -> int:
+        return len(self.sizes)
+    
+    def add(self, bucket: int, value: int) -> None:
+        value = int(value)
+        head = self.heads[bucket]
+        if self.sizes[bucket] == self.capacity:
+            old = int(self.values[bucket, head])
+            self.sums[bucket] -= old
+            self.sumsq[bucket] -= old * old
+        else:
+            self.sizes[bucket] += 1
+        self.values[bucket, head] = value
+        self.heads[bucket] = (head + 1) % self.capacity
+        self.sums[bucket] += value
+        self.sumsq[bucket] += value * value
+        self._update_contrib(bucket)
+    
+    def _update_contrib(self, bucket: int) -> None:
+        old = self._contrib[bucket]
+        new = self.mean(bucket) if self.sizes[bucket] >= self.min_points else None
+        if old is not None:
+            self._contrib_sum -= old
+            self._qualified -= 1
+        if new is not None:
+            self._contrib_sum += new
+            self._qualified += 1
+        self._contrib[bucket] = new
+        # Ressincroniza periodicamente para não acumular erro de ponto flutuante
+        self._updates += 1
+        if self._updates % 10_000 == 0:
+            self._contrib_sum = sum(c for c in self._contrib if c is not None)
+    
+    def size(self, bucket: int) -> int:
+        return self.sizes[bucket]
+    
+    def mean(self, bucket: int) -> float:
+        n = self.sizes[bucket]
+        return self.sums[bucket] / n if n else 0.0
+    
+    def std(self, bucket: int) -> float:
+        """Desvio padrão populacional (mesmo critério de np.std)"""
+        n = self.sizes[bucket]
+        if not n:
+            return 0.0
+        mean = self.sums[bucket] / n
+        return max(0.0, self.sumsq[bucket] / n - mean * mean) ** 0.5
+    
+    def overall_mean(self, default: float = 100.0) -> float:
+        """Média das médias dos buckets com dados suficientes"""
+        if not self._qualified:
+            return default
+        return self._contrib_sum / self._qualified
+    
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        return {
+            "values": self.values.copy(),
+            "heads": np.array(self.heads, dtype=np.int64),
+            "sizes": np.array(self.sizes, dtype=np.int64),
+        }
+    
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        """Recarrega as janelas e recalcula somas e médias a partir delas"""
+        if state["values"].shape != self.values.shape:
+            raise ValueError(f"Janelas com formato {state['values'].shape}, esperado {self.values.shape}")
+        self.values[:] = state["values"]
+        self.heads = [int(h) for h in state["heads"]]
+        self.sizes = [int(n) for n in state["sizes"]]
+        self._contrib = [None] * len(self.sizes)
+        self._contrib_sum = 0.0
+        self._qualified = 0
+        for bucket in range(len(self.sizes)):
+            window = self.values[bucket, :self.sizes[bucket]]
+            self.sums[bucket] = int(window.sum())
+            self.sumsq[bucket] = int((window * window).sum())
+            self._update_contrib(bucket)
+    
+    def window(self, bucket: int) -> np.ndarray:
+        """Observações do bucket, mais antiga primeiro (cópia)"""
+        n, head = self.sizes[bucket], self.heads[bucket]
+        if n < self.capacity:
+            return self.values[bucket, :n].copy()
+        return np.roll(self.values[bucket], -head)
+
+
+# Regressão linear das últimas TREND_POINTS observações: x fixo, só y muda
+TREND_POINTS = 10
+_TREND_X = np.arange(TREND_POINTS) - (TREND_POINTS - 1) / 2
+_TREND_DENOM = float((_TREND_X ** 2).sum())
+
+
 class ShugoEngine:
     """
     守護 SHUGO - Prediction Engine
@@ -67,10 +192,33 @@ class ShugoEngine:
     def __init__(self, window_size: int = 100):
         self.window_size = window_size
         self.history: deque = deque(maxlen=1000)
-        self.hourly_patterns: Dict[int, List[float]] = {h: [] for h in range(24)}
-        self.daily_patterns: Dict[int, List[float]] = {d: [] for d in range(7)}
-        self.predictions: List[Prediction] = []
+        # Últimas 100 observações por hora do dia / dia da semana
+        self.hourly = BucketWindows(24, capacity=100)
+        self.daily = BucketWindows(7, capacity=100)
+        self._recent_volumes: deque = deque(maxlen=TREND_POINTS)
+        self.predictions: deque = deque(maxlen=100)
         self.detected_patterns: List[Pattern] = []
+        # Rollups do caminho de transações (RollupEngine), quando anexados
+        self.rollups = None
+        self._rollup_cache: Dict[str, Tuple[int, List[Dict]]] = {}
+        
+        # Forecast memoizado por (geração, horizonte, slot de 30 min)
+        self.generation = 0
+        self._forecast_generation: Optional[Tuple[int, int]] = None
+        self._forecast_cache: Dict[Tuple[int, datetime], List[Dict]] = {}
+        self.forecast_stats = {"hits": 0, "misses": 0}
+        # Quantis de volume por status e hora (memória fixa, todo o histórico)
+        self.quantiles = QuantileBaselines()
+        
+        # Modelo sazonal sobre a série por minuto (30 dias) de um status
+        forecast_status = os.getenv("SHUGO_FORECAST_STATUS", "approved")
+        self.forecast_status = None if forecast_status == "all" else forecast_status
+        self.series = MinuteSeries(days=30)
+        self.model = SeasonalForecaster()
+        self.refit_interval = float(os.getenv("SHUGO_REFIT_SECONDS", 60))
+        self.model_version = 0
+        self._model_series_generation = -1
+        self._next_refit = 0.0
         
         print(SHUGO_LOGO)
         print("🛡️ Shugo Engine inicializado!")
@@ -85,30 +233,165 @@ class ShugoEngine:
             "weekday": timestamp.weekday()
         }
         self.history.append(observation)
+        self.generation += 1
         
-        # Atualizar padrões
-        self.hourly_patterns[timestamp.hour].append(volume)
-        self.daily_patterns[timestamp.weekday()].append(volume)
-        
-        # Manter últimos 100 por padrão
-        if len(self.hourly_patterns[timestamp.hour]) > 100:
-            self.hourly_patterns[timestamp.hour] = self.hourly_patterns[timestamp.hour][-100:]
-        if len(self.daily_patterns[timestamp.weekday()]) > 100:
-            self.daily_patterns[timestamp.weekday()] = self.daily_patterns[timestamp.weekday()][-100:]
+        # Atualizar padrões (O(1): janelas circulares com somas móveis)
+        self.quantiles.add(volume, status, timestamp.hour)
+        self.hourly.add(timestamp.hour, volume)
+        self.daily.add(timestamp.weekday(), volume)
+        self._recent_volumes.append(volume)
+        if self.forecast_status is None or status == self.forecast_status:
+            self.series.add(timestamp, volume)
+    
+    def load_history_csv(self, path: str) -> Dict:
+        """
+        Carrega um CSV timestamp,status,count (ex.: data/transactions.csv)
+        na série do modelo e reajusta na hora.
+        """
+        minutes, values = load_minute_csv(path, self.forecast_status)
+        rows = self.add_history(minutes, values)
+        self.refresh_model(force=True)
+        return {"rows_loaded": rows, **self.model.get_info()}
+    
+    def add_history(self, minutes: np.ndarray, values: np.ndarray) -> int:
+        """Adiciona um histórico por minuto já lido à série do modelo"""
+        self.series.add_many(minutes, values)
+        self.generation += 1
+        return int(len(minutes))
+    
+    # ============== SNAPSHOT ==============
+    
+    def snapshot_state(self) -> Dict[str, np.ndarray]:
+        """Histórico recente, janelas por hora/dia, quantis e série do modelo"""
+        history = list(self.history)
+        state = {
+            "history_timestamps": np.array([o["timestamp"].timestamp() for o in history], dtype=np.float64),
+            "history_volumes": np.array([o["volume"] for o in history], dtype=np.int64),
+            "history_statuses": encode_statuses(o["status"] for o in history),
+            "recent_volumes": np.array(self._recent_volumes, dtype=np.int64),
+        }
+        state.update(prefixed(self.hourly.snapshot_state(), "hourly"))
+        state.update(prefixed(self.daily.snapshot_state(), "daily"))
+        state.update(prefixed(self.quantiles.snapshot_state(), "quantiles"))
+        state.update(prefixed(self.series.snapshot_state(), "series"))
+        state.update(prefixed(self.model.snapshot_state(), "model"))
+        return state
+    
+    def restore_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.history.clear()
+        for ts, volume, code in zip(
+            state["history_timestamps"], state["history_volumes"], state["history_statuses"]
+        ):
+            timestamp = datetime.fromtimestamp(float(ts))
+            self.history.append({
+                "timestamp": timestamp,
+                "volume": int(volume),
+                "status": STATUS_NAMES[code],
+                "hour": timestamp.hour,
+                "weekday": timestamp.weekday()
+            })
+        self._recent_volumes.clear()
+        self._recent_volumes.extend(int(v) for v in state["recent_volumes"])
+        self.hourly.restore_state(section(state, "hourly"))
+        self.daily.restore_state(section(state, "daily"))
+        self.quantiles.restore_state(section(state, "quantiles"))
+        self.series.restore_state(section(state, "series"))
+        # Modelo salvo vale até o primeiro refit bem-sucedido sobre a série
+        self.model.restore_state(section(state, "model"))
+        if self.model.fitted:
+            self.model_version += 1
+        self.generation += 1
+        self.refresh_model(force=True)
+    
+    def warm_start(self, counts: np.ndarray, statuses: List[str], timestamps: np.ndarray) -> None:
+        """Reconstrução a partir do histórico do banco (observações em ordem)"""
+        for count, status, ts in zip(counts.tolist(), statuses, timestamps.tolist()):
+            self.add_observation(datetime.fromtimestamp(ts), count, status)
+        self.refresh_model(force=True)
+    
+    def refresh_model(self, force: bool = False) -> bool:
+        """
+        Reajusta o modelo se a série mudou, no máximo uma vez a cada
+        `refit_interval` segundos (o fit é vetorizado sobre os 30 dias).
+        """
+        if self.series.generation == self._model_series_generation:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_refit:
+            return False
+        self._next_refit = now + self.refit_interval
+        self._model_series_generation = self.series.generation
+        start, values = self.series.values()
+        if not self.model.fit(start, values):
+            return False
+        self.model_version += 1
+        return True
+    
+    def refit_job_args(self) -> Tuple[int, np.ndarray, Dict]:
+        """
+        Argumentos de `fit_forecaster` para reajustar fora do event loop
+        (JobExecutor); o resultado volta por install_model_state().
+        """
+        self._next_refit = time.monotonic() + self.refit_interval
+        self._model_series_generation = self.series.generation
+        start, values = self.series.values()
+        return start, values, self.model.get_config()
+    
+    def install_model_state(self, state: Dict[str, np.ndarray]) -> Dict:
+        """Instala um modelo ajustado em outro processo"""
+        if state:
+            self.model.restore_state(state)
+            self.model_version += 1
+        return {
+            "status": "fitted" if self.model.fitted else "insufficient_data",
+            "model_version": self.model_version,
+            "model": self.model.get_info()
+        }
+    
+    def attach_rollups(self, rollups) -> None:
+        """Usa os rollups (90 dias no tier 1h) como fonte dos baselines"""
+        self.rollups = rollups
+    
+    def _rollup_baseline(self, period: str, key: int) -> Optional[Dict]:
+        if self.rollups is None:
+            return None
+        # Recalcula só quando os rollups receberam novas transações
+        cached = self._rollup_cache.get(period)
+        if cached is None or cached[0] != self.rollups.total_events:
+            cached = (self.rollups.total_events, self.rollups.seasonal_baseline(period))
+            self._rollup_cache[period] = cached
+        baseline = cached[1][key]
+        return baseline if baseline["events"] >= 5 else None
+    
+    def baseline_points(self, period: str, key: int) -> int:
+        """Observações por trás do baseline ("hour" ou "weekday")"""
+        baseline = self._rollup_baseline(period, key)
+        if baseline is not None:
+            return baseline["events"]
+        windows = self.hourly if period == "hour" else self.daily
+        return windows.size(key)
     
     def get_hourly_baseline(self, hour: int) -> Tuple[float, float]:
         """Retorna média e desvio padrão para uma hora específica"""
-        data = self.hourly_patterns.get(hour, [])
-        if len(data) < 5:
+        baseline = self._rollup_baseline("hour", hour)
+        if baseline is not None:
+            return baseline["mean"], baseline["std"]
+        if self.hourly.size(hour) < 5:
             return 100.0, 30.0  # Default
-        return np.mean(data), np.std(data)
+        return self.hourly.mean(hour), self.hourly.std(hour)
+    
+    def get_hourly_quantiles(self, hour: int, status: Optional[str] = None) -> Dict:
+        """p50/p95/p99 do volume na hora (todos os status, ou um só)"""
+        return self.quantiles.baseline(status=status, hour=hour)
     
     def get_daily_baseline(self, weekday: int) -> Tuple[float, float]:
         """Retorna média e desvio padrão para um dia da semana"""
-        data = self.daily_patterns.get(weekday, [])
-        if len(data) < 5:
+        baseline = self._rollup_baseline("weekday", weekday)
+        if baseline is not None:
+            return baseline["mean"], baseline["std"]
+        if self.daily.size(weekday) < 5:
             return 100.0, 30.0  # Default
-        return np.mean(data), np.std(data)
+        return self.daily.mean(weekday), self.daily.std(weekday)
     
     def predict_next(self, minutes_ahead: int = 30) -> Prediction:
         """
@@ -117,7 +400,20 @@ class ShugoEngine:
         Returns:
             Prediction com volume esperado e probabilidade de alerta
         """
+        self.refresh_model()
         now = datetime.now()
+        trend = self._calculate_trend()
+        if self.model.fitted:
+            future_time = now + timedelta(minutes=minutes_ahead)
+            prediction = self._model_predictions(future_time, 1, trend)[0]
+            prediction.timestamp = future_time
+        else:
+            prediction = self._predict(now, minutes_ahead, trend)
+        self.predictions.append(prediction)
+        return prediction
+    
+    def _predict(self, now: datetime, minutes_ahead: int, trend: str) -> Prediction:
+        """Predição pura (não altera estado): usada por predict_next e get_forecast"""
         future_time = now + timedelta(minutes=minutes_ahead)
         future_hour = future_time.hour
         future_weekday = future_time.weekday()
@@ -130,9 +426,6 @@ class ShugoEngine:
         predicted_volume = (hourly_mean * 0.6) + (daily_mean * 0.4)
         combined_std = (hourly_std * 0.6) + (daily_std * 0.4)
         
-        # Calcular tendência baseado nas últimas observações
-        trend = self._calculate_trend()
-        
         # Ajustar predição pela tendência
         if trend == "up":
             predicted_volume *= 1.1
@@ -145,7 +438,7 @@ class ShugoEngine:
         )
         
         # Calcular confiança
-        data_points = len(self.hourly_patterns.get(future_hour, []))
+        data_points = self.hourly.size(future_hour)
         confidence = min(0.95, 0.5 + (data_points / 200))
         
         # Gerar warning se necessário
@@ -155,7 +448,7 @@ class ShugoEngine:
         elif alert_probability > 0.5:
             warning = f"🔶 ATENÇÃO: Possível anomalia em {minutes_ahead}min"
         
-        prediction = Prediction(
+        return Prediction(
             timestamp=future_time,
             predicted_volume=predicted_volume,
             confidence=confidence,
@@ -163,24 +456,49 @@ class ShugoEngine:
             alert_probability=alert_probability,
             warning_message=warning
         )
+    
+    def _model_predictions(self, start: datetime, n_slots: int, trend: str) -> List[Prediction]:
+        """
+        Predições do modelo sazonal para `n_slots` slots de 30 minutos.
         
-        self.predictions.append(prediction)
-        if len(self.predictions) > 100:
-            self.predictions = self.predictions[-100:]
-        
-        return prediction
+        Média e intervalos de todos os slots saem de uma única chamada
+        vetorizada; a probabilidade de alerta compara a previsão com o
+        nível do dia (o quanto a sazonalidade empurra o slot) na escala do
+        desvio previsto.
+        """
+        forecast = self.model.forecast(start, hours=max(1, (n_slots + 1) // 2))
+        predictions = []
+        for i in range(n_slots):
+            mean = float(forecast["mean"][i])
+            std = float(forecast["std"][i])
+            alert_probability = self._calculate_alert_probability(mean, float(forecast["level"][i]), std)
+            minutes_ahead = max(0, int((forecast["slot_start"][i] - datetime.now()).total_seconds() // 60))
+            
+            warning = None
+            if alert_probability > 0.7:
+                warning = f"⚠️ ALERTA PREVISTO em {minutes_ahead}min: Alta probabilidade de anomalia"
+            elif alert_probability > 0.5:
+                warning = f"🔶 ATENÇÃO: Possível anomalia em {minutes_ahead}min"
+            
+            predictions.append(Prediction(
+                timestamp=forecast["slot_start"][i],
+                predicted_volume=mean,
+                confidence=min(0.95, 0.5 + int(forecast["points"][i]) / 200),
+                trend=trend,
+                alert_probability=alert_probability,
+                warning_message=warning,
+                lower=float(forecast["lower_95"][i]),
+                upper=float(forecast["upper_95"][i])
+            ))
+        return predictions
     
     def _calculate_trend(self) -> str:
         """Calcula tendência baseado nas últimas observações"""
-        if len(self.history) < 10:
+        if len(self._recent_volumes) < TREND_POINTS:
             return "stable"
         
-        recent = list(self.history)[-10:]
-        volumes = [o["volume"] for o in recent]
-        
-        # Regressão linear simples
-        x = np.arange(len(volumes))
-        slope = np.polyfit(x, volumes, 1)[0]
+        # Regressão linear simples (x centrado: slope = Σx·y / Σx²)
+        slope = float(np.dot(_TREND_X, self._recent_volumes)) / _TREND_DENOM
         
         if slope > 2:
             return "up"
@@ -212,17 +530,14 @@ class ShugoEngine:
         """Detecta padrões nos dados históricos"""
         patterns = []
         
+        # Média geral mantida incrementalmente pelas janelas (O(1))
+        overall_mean = self.hourly.overall_mean()
+        
         # Detectar padrão de horário de pico
         peak_hours = []
-        for hour, volumes in self.hourly_patterns.items():
-            if len(volumes) >= 10:
-                mean = np.mean(volumes)
-                overall_mean = np.mean([
-                    np.mean(v) for v in self.hourly_patterns.values() 
-                    if len(v) >= 5
-                ] or [100])
-                if mean > overall_mean * 1.3:
-                    peak_hours.append(hour)
+        for hour in range(len(self.hourly)):
+            if self.hourly.size(hour) >= 10 and self.hourly.mean(hour) > overall_mean * 1.3:
+                peak_hours.append(hour)
         
         if peak_hours:
             patterns.append(Pattern(
@@ -235,15 +550,9 @@ class ShugoEngine:
         
         # Detectar padrão de baixo volume
         low_hours = []
-        for hour, volumes in self.hourly_patterns.items():
-            if len(volumes) >= 10:
-                mean = np.mean(volumes)
-                overall_mean = np.mean([
-                    np.mean(v) for v in self.hourly_patterns.values() 
-                    if len(v) >= 5
-                ] or [100])
-                if mean < overall_mean * 0.5:
-                    low_hours.append(hour)
+        for hour in range(len(self.hourly)):
+            if self.hourly.size(hour) >= 10 and self.hourly.mean(hour) < overall_mean * 0.5:
+                low_hours.append(hour)
         
         if low_hours:
             patterns.append(Pattern(
@@ -256,9 +565,9 @@ class ShugoEngine:
         
         # Detectar padrão semanal
         weekday_means = {}
-        for day, volumes in self.daily_patterns.items():
-            if len(volumes) >= 5:
-                weekday_means[day] = np.mean(volumes)
+        for day in range(len(self.daily)):
+            if self.daily.size(day) >= 5:
+                weekday_means[day] = self.daily.mean(day)
         
         if weekday_means:
             best_day = max(weekday_means, key=weekday_means.get)
@@ -276,22 +585,61 @@ class ShugoEngine:
         self.detected_patterns = patterns
         return patterns
     
+    def _data_generation(self) -> Tuple[int, int]:
+        """Muda sempre que chegam observações (no Shugo ou nos rollups anexados)"""
+        rollup_events = self.rollups.total_events if self.rollups is not None else 0
+        return self.generation, rollup_events, self.model_version
+    
     def get_forecast(self, hours_ahead: int = 6) -> List[Dict]:
-        """Gera forecast para as próximas N horas"""
-        forecasts = []
+        """
+        Gera forecast para as próximas N horas (pontos a cada 30 minutos).
         
-        for minutes in range(0, hours_ahead * 60, 30):
-            prediction = self.predict_next(minutes_ahead=minutes)
+        Os pontos são ancorados no início do slot de 30 minutos corrente e o
+        resultado fica em cache por (geração das observações, horizonte,
+        slot): polls repetidos não recalculam nada até chegar observação
+        nova ou virar o slot. Leitura pura: não registra em `predictions`.
+        """
+        self.refresh_model()
+        now = datetime.now()
+        slot_start = now.replace(minute=now.minute - now.minute % 30, second=0, microsecond=0)
+        generation = self._data_generation()
+        key = (hours_ahead, slot_start)
+        
+        if self._forecast_generation != generation:
+            self._forecast_cache.clear()
+            self._forecast_generation = generation
+        cached = self._forecast_cache.get(key)
+        if cached is not None:
+            self.forecast_stats["hits"] += 1
+            return [dict(point) for point in cached]
+        
+        self.forecast_stats["misses"] += 1
+        trend = self._calculate_trend()  # Uma vez por forecast
+        if self.model.fitted:
+            predictions = self._model_predictions(slot_start, hours_ahead * 2, trend)
+        else:
+            predictions = [
+                self._predict(slot_start, minutes, trend)
+                for minutes in range(0, hours_ahead * 60, 30)
+            ]
+        forecasts = []
+        for prediction in predictions:
             forecasts.append({
                 "time": prediction.timestamp.strftime("%H:%M"),
                 "predicted_volume": round(prediction.predicted_volume, 1),
+                "lower": round(prediction.lower, 1) if prediction.lower is not None else None,
+                "upper": round(prediction.upper, 1) if prediction.upper is not None else None,
                 "confidence": round(prediction.confidence * 100, 1),
                 "trend": prediction.trend,
                 "alert_probability": round(prediction.alert_probability * 100, 1),
                 "warning": prediction.warning_message
             })
         
-        return forecasts
+        # Slots antigos nunca voltam: mantém só o slot corrente
+        for stale in [k for k in self._forecast_cache if k[1] != slot_start]:
+            del self._forecast_cache[stale]
+        self._forecast_cache[key] = forecasts
+        return [dict(point) for point in forecasts]
     
     def get_status(self) -> Dict:
         """Retorna status do Shugo Engine"""
@@ -301,8 +649,15 @@ class ShugoEngine:
             "observations": len(self.history),
             "patterns_detected": len(self.detected_patterns),
             "predictions_made": len(self.predictions),
-            "hourly_coverage": sum(1 for h in self.hourly_patterns.values() if len(h) >= 5),
-            "daily_coverage": sum(1 for d in self.daily_patterns.values() if len(d) >= 5),
+            "forecast_cache": dict(self.forecast_stats),
+            "model": {
+                "type": "seasonal" if self.model.fitted else "baseline",
+                "status": self.forecast_status or "all",
+                "history_minutes": self.series.observed_minutes,
+                **self.model.get_info()
+            },
+            "hourly_coverage": sum(1 for h in range(len(self.hourly)) if self.hourly.size(h) >= 5),
+            "daily_coverage": sum(1 for d in range(len(self.daily)) if self.daily.size(d) >= 5),
             "status": "ready" if len(self.history) >= 50 else "warming_up"
         }
 
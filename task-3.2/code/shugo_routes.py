@@ -4,12 +4,15 @@
 Phase 7: Prediction Engine Endpoints
 """
 
-from fastapi import APIRouter, BackgroundTasks
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timedelta
 
 from .shugo import get_shugo, ShugoEngine
+from .forecasting import fit_forecaster, load_minute_csv
+from .job_executor import get_executor
+from .job_routes import submit_job, job_response
 
 router = APIRouter(prefix="/shugo", tags=["🛡️ Shugo Prediction"])
 
@@ -35,6 +38,8 @@ async def predict(minutes: int = 30):
         "prediction": {
             "timestamp": prediction.timestamp.isoformat(),
             "predicted_volume": round(prediction.predicted_volume, 1),
+            "lower": round(prediction.lower, 1) if prediction.lower is not None else None,
+            "upper": round(prediction.upper, 1) if prediction.upper is not None else None,
             "confidence": round(prediction.confidence * 100, 1),
             "trend": prediction.trend,
             "alert_probability": round(prediction.alert_probability * 100, 1),
@@ -82,20 +87,24 @@ async def detect_patterns():
 
 
 @router.get("/hourly-baseline")
-async def hourly_baseline():
-    """📊 Baseline por hora do dia"""
+async def hourly_baseline(status: Optional[str] = None):
+    """📊 Baseline por hora do dia (média/desvio + p50/p95/p99 do sketch)"""
     shugo = get_shugo()
     
     baselines = {}
     for hour in range(24):
         mean, std = shugo.get_hourly_baseline(hour)
+        quantiles = shugo.get_hourly_quantiles(hour, status)
         baselines[f"{hour:02d}:00"] = {
             "mean": round(mean, 1),
             "std": round(std, 1),
-            "data_points": len(shugo.hourly_patterns.get(hour, []))
+            "p50": round(quantiles["p50"], 1) if quantiles["count"] else None,
+            "p95": round(quantiles["p95"], 1) if quantiles["count"] else None,
+            "p99": round(quantiles["p99"], 1) if quantiles["count"] else None,
+            "data_points": shugo.baseline_points("hour", hour)
         }
     
-    return {"hourly_baselines": baselines}
+    return {"hourly_baselines": baselines, "status": status or "all"}
 
 
 @router.get("/daily-baseline")
@@ -110,18 +119,21 @@ async def daily_baseline():
         baselines[days[day]] = {
             "mean": round(mean, 1),
             "std": round(std, 1),
-            "data_points": len(shugo.daily_patterns.get(day, []))
+            "data_points": shugo.baseline_points("weekday", day)
         }
     
     return {"daily_baselines": baselines}
 
 
 @router.post("/train")
-async def train_from_history():
+async def train_from_history(wait: float = Query(0.0, ge=0, le=60)):
     """
     🎯 Treina Shugo com dados históricos
     
-    Popula os padrões com dados simulados para teste.
+    Popula os padrões com dados simulados para teste (só nas janelas do
+    próprio Shugo: os rollups compartilhados com /stats, /rollups e o
+    Prometheus não recebem esses dados) e reajusta o modelo sazonal no pool de processos (job "shugo_fit"): responde 202 com o
+    id do job, ou o resultado se ficar pronto em `wait` segundos.
     """
     shugo = get_shugo()
     
@@ -147,11 +159,39 @@ async def train_from_history():
         
         shugo.add_observation(ts, max(1, volume), status)
     
-    return {
-        "status": "trained",
-        "observations_added": 500,
-        "shugo_status": shugo.get_status()
-    }
+    def installed(state):
+        return {"observations_added": 500, **shugo.install_model_state(state)}
+    
+    job = submit_job("shugo_fit", fit_forecaster, *shugo.refit_job_args(), on_result=installed)
+    return await job_response(job, wait)
+
+
+@router.post("/train/history")
+async def train_from_csv(wait: float = Query(0.0, ge=0, le=60)):
+    """
+    📈 Ajusta o modelo sazonal com o histórico por minuto
+    
+    Lê SHUGO_HISTORY_CSV (default: data/transactions.csv, colunas
+    timestamp,status,count) no pool de processos (job "shugo_history");
+    ao terminar, adiciona o histórico à série e submete o reajuste
+    (job "shugo_fit", id em `fit_job`).
+    """
+    import os
+    shugo = get_shugo()
+    default_path = os.path.join(os.path.dirname(__file__), "..", "data", "transactions.csv")
+    path = os.getenv("SHUGO_HISTORY_CSV", default_path)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Histórico não encontrado: {path}")
+    
+    def loaded(history):
+        rows = shugo.add_history(*history)
+        fit = get_executor().submit(
+            "shugo_fit", fit_forecaster, *shugo.refit_job_args(), on_result=shugo.install_model_state
+        )
+        return {"rows_loaded": rows, "fit_job": fit.id}
+    
+    job = submit_job("shugo_history", load_minute_csv, path, shugo.forecast_status, on_result=loaded)
+    return await job_response(job, wait)
 
 
 @router.get("/dashboard", include_in_schema=False)
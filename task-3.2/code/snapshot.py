@@ -0,0 +1,299 @@
+"""
+💾 State Snapshots
+==================
+Snapshot e warm-start do estado em memória entre restarts.
+
+Cada componente (detector, rollups, Shugo, contadores da API) expõe
+`snapshot_state()` → dict de arrays NumPy e `restore_state(state)`. O
+manager junta tudo com prefixo por componente em um único `.npz`
+comprimido, gravado de forma atômica (arquivo temporário + rename):
+
+- periodicamente (SNAPSHOT_INTERVAL) e no shutdown
+- a cópia dos arrays acontece no event loop (memcpy); compressão e
+  escrita em disco rodam em thread
+
+No startup o snapshot é restaurado em milissegundos. Sem snapshot
+utilizável (ausente, corrompido, versão ou idade fora do limite) o estado
+é reconstruído a partir do rollup por minuto do TimescaleDB.
+
+O modelo treinado vai serializado com pickle dentro do arquivo: o
+SNAPSHOT_PATH deve ser um diretório local escrito apenas pelo serviço.
+
+Configuração (env):
+    SNAPSHOT_ENABLED=true
+    SNAPSHOT_PATH=/tmp/guardian_snapshot/state.npz
+    SNAPSHOT_INTERVAL=60
+    SNAPSHOT_MAX_AGE=604800
+    SNAPSHOT_REBUILD_FROM_DB=true
+    SNAPSHOT_REBUILD_WINDOW=3d
+
+CloudWalk Task 3.2
+"""
+
+import os
+import json
+import time
+import pickle
+import asyncio
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Status presentes no rollup por minuto (colunas do continuous aggregate)
+REBUILD_STATUSES = ("approved", "denied", "failed")
+
+
+# ============== SERIALIZAÇÃO ==============
+
+def prefixed(state: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    """Aninha o estado de um subcomponente sob `prefix.`"""
+    return {f"{prefix}.{key}": value for key, value in state.items()}
+
+
+def section(state: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    """Extrai o estado de um subcomponente aninhado com `prefixed`"""
+    start = prefix + "."
+    return {key[len(start):]: value for key, value in state.items() if key.startswith(start)}
+
+
+def pack_json(obj: Any) -> np.ndarray:
+    return np.frombuffer(json.dumps(obj, default=str).encode(), dtype=np.uint8)
+
+
+def unpack_json(array: np.ndarray) -> Any:
+    return json.loads(np.asarray(array, dtype=np.uint8).tobytes().decode())
+
+
+def pack_object(obj: Any) -> np.ndarray:
+    return np.frombuffer(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+
+
+def unpack_object(array: np.ndarray) -> Any:
+    return pickle.loads(np.asarray(array, dtype=np.uint8).tobytes())
+
+
+# ============== MANAGER ==============
+
+class SnapshotManager:
+    """
+    Snapshots periódicos e restore no startup.
+
+    Exemplo:
+        snapshots = SnapshotManager({"detector": detector, "rollups": rollups})
+        source = await snapshots.restore()   # "snapshot", "timescaledb" ou "empty"
+        await snapshots.start()
+        ...
+        await snapshots.stop()               # grava o snapshot final
+    """
+
+    def __init__(
+        self,
+        components: Dict[str, Any],
+        path: Optional[str] = None,
+        interval: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.components = components
+        self.path = Path(path or os.getenv("SNAPSHOT_PATH", "/tmp/guardian_snapshot/state.npz"))
+        self.interval = interval if interval is not None else float(os.getenv("SNAPSHOT_INTERVAL", 60))
+        self.enabled = enabled if enabled is not None else os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+        self.max_age = float(os.getenv("SNAPSHOT_MAX_AGE", 7 * 86400))
+        self.rebuild_from_db = os.getenv("SNAPSHOT_REBUILD_FROM_DB", "true").lower() == "true"
+        self.rebuild_window = os.getenv("SNAPSHOT_REBUILD_WINDOW", "3d")
+        self.connect_timeout = 5.0
+
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+        self.stats = {
+            "saves": 0,
+            "save_errors": 0,
+            "last_save_seconds": 0.0,
+            "last_save_bytes": 0,
+            "last_saved_at": None,
+            "restored_from": None,
+            "restore_seconds": 0.0,
+            "restore_errors": [],
+        }
+
+    # ============== SNAPSHOT ==============
+
+    def collect(self) -> Dict[str, np.ndarray]:
+        """Copia o estado de todos os componentes (chamar no event loop)"""
+        arrays: Dict[str, np.ndarray] = {}
+        for name, component in self.components.items():
+            arrays.update(prefixed(component.snapshot_state(), name))
+        arrays["__meta__"] = pack_json({
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "components": list(self.components),
+        })
+        return arrays
+
+    def write(self, arrays: Dict[str, np.ndarray]) -> int:
+        """Grava o snapshot de forma atômica; retorna o tamanho em bytes"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        return self.path.stat().st_size
+
+    async def save(self) -> bool:
+        """Snapshot agora (cópia no loop, compressão e I/O em thread)"""
+        if not self.enabled:
+            return False
+        async with self._write_lock:
+            started = time.perf_counter()
+            try:
+                arrays = self.collect()
+                size = await asyncio.to_thread(self.write, arrays)
+            except Exception as e:
+                self.stats["save_errors"] += 1
+                logger.error(f"Erro ao gravar snapshot: {e}")
+                return False
+            self.stats["saves"] += 1
+            self.stats["last_save_seconds"] = round(time.perf_counter() - started, 4)
+            self.stats["last_save_bytes"] = size
+            self.stats["last_saved_at"] = datetime.now().isoformat()
+            return True
+
+    # ============== RESTORE ==============
+
+    def load(self) -> Optional[Dict[str, np.ndarray]]:
+        """Lê o snapshot do disco (None se ausente, inválido ou velho demais)"""
+        if not self.path.exists():
+            return None
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                arrays = {key: data[key] for key in data.files}
+            meta = unpack_json(arrays.pop("__meta__"))
+        except Exception as e:
+            logger.error(f"Snapshot ilegível ({self.path}): {e}")
+            return None
+        if meta.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"Snapshot com versão {meta.get('version')} ignorado")
+            return None
+        age = time.time() - meta.get("created_at", 0)
+        if age > self.max_age:
+            logger.warning(f"Snapshot com {age / 3600:.1f}h ignorado (SNAPSHOT_MAX_AGE)")
+            return None
+        return arrays
+
+    def apply(self, arrays: Dict[str, np.ndarray]) -> int:
+        """Restaura cada componente; falhas ficam isoladas no componente"""
+        restored = 0
+        for name, component in self.components.items():
+            state = section(arrays, name)
+            if not state:
+                continue
+            try:
+                component.restore_state(state)
+                restored += 1
+            except Exception as e:
+                self.stats["restore_errors"].append(f"{name}: {e}")
+                logger.error(f"Erro ao restaurar {name} do snapshot: {e}")
+        return restored
+
+    async def restore(self) -> str:
+        """
+        Warm-start: snapshot local, senão rollup do TimescaleDB.
+
+        Returns:
+            "snapshot", "timescaledb" ou "empty"
+        """
+        started = time.perf_counter()
+        source = "empty"
+        arrays = await asyncio.to_thread(self.load) if self.enabled else None
+        if arrays is not None and self.apply(arrays):
+            source = "snapshot"
+        elif self.rebuild_from_db and await self.rebuild():
+            source = "timescaledb"
+        self.stats["restored_from"] = source
+        self.stats["restore_seconds"] = round(time.perf_counter() - started, 4)
+        return source
+
+    async def rebuild(self) -> bool:
+        """
+        Reconstrói o estado a partir do volume por minuto do TimescaleDB.
+
+        Cada bucket vira uma observação por status (approved/denied/failed),
+        o mesmo formato que a API recebe do simulador. O volume soma o
+        `transaction_count` gravado (o `count` de cada registro), não o
+        número de linhas, para ficar na escala do tráfego ao vivo.
+        """
+        # Import tardio: detector e Shugo usam os helpers deste módulo sem asyncpg
+        from .database import Database
+        from .stats_service import parse_window
+
+        start = datetime.now(timezone.utc) - parse_window(self.rebuild_window)
+        db = Database()
+        try:
+            await asyncio.wait_for(db.connect(), timeout=self.connect_timeout)
+            rows = await db.get_minute_counts(start)
+        except Exception as e:
+            logger.warning(f"Rebuild pelo TimescaleDB indisponível: {e}")
+            return False
+        finally:
+            if db.pool is not None:
+                await db.close()
+        if not rows:
+            return False
+
+        stamps = np.array([row["bucket"].timestamp() for row in rows], dtype=np.float64)
+        counts = np.array(
+            [[row[status] or 0 for status in REBUILD_STATUSES] for row in rows], dtype=np.int64
+        ).reshape(-1)
+        timestamps = np.repeat(stamps, len(REBUILD_STATUSES))
+        statuses = list(REBUILD_STATUSES) * len(rows)
+
+        for name, component in self.components.items():
+            warm_start = getattr(component, "warm_start", None)
+            if warm_start is None:
+                continue
+            try:
+                await asyncio.to_thread(warm_start, counts, statuses, timestamps)
+            except Exception as e:
+                self.stats["restore_errors"].append(f"{name}: {e}")
+                logger.error(f"Erro no warm-start de {name}: {e}")
+        return True
+
+    # ============== LOOP ==============
+
+    async def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Para o loop e grava o snapshot final"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": str(self.path),
+            "interval_seconds": self.interval,
+            **self.stats
+        }
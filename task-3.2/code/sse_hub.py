@@ -0,0 +1,246 @@
+"""
+📡 SSE Hub
+==========
+Fan-out de eventos Server-Sent Events sem bloquear quem publica.
+
+- Cada evento é serializado uma única vez (bytes prontos para o socket)
+- `publish` é síncrono e O(clientes): só empurra referências nas filas
+- Fila limitada por cliente (deque circular): cliente lento perde os
+  eventos mais antigos em vez de crescer sem limite (drop-oldest)
+- Tipos de estado (ex.: "metrics") são coalescidos: o cliente recebe só
+  o valor mais recente, nunca uma fila deles
+- Heartbeat (comentário SSE) quando o cliente fica ocioso, detecção de
+  desconexão e limpeza garantida no `finally`
+- Métricas por cliente: eventos entregues, descartados e atraso (lag)
+
+Configuração (env):
+    SSE_QUEUE_SIZE=256
+    SSE_HEARTBEAT_INTERVAL=15
+    SSE_COALESCE_TYPES=metrics
+    SSE_METRICS_INTERVAL=1.0
+
+CloudWalk Task 3.2
+"""
+
+import os
+import json
+import time
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = b": heartbeat\n\n"
+
+
+def encode_event(event_type: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """Frame SSE pronto para o socket"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+# ============== CLIENTE ==============
+
+class SSEClient:
+    """Fila limitada de um cliente conectado"""
+
+    def __init__(self, client_id: int, queue_size: int):
+        self.id = client_id
+        self.queue: deque = deque(maxlen=queue_size)    # (seq, frame) em ordem
+        self.latest: Dict[str, Tuple[int, bytes]] = {}  # Tipos coalescidos
+        self.wake = asyncio.Event()
+        self.connected_at = time.time()
+        self.last_seq = 0  # Último evento entregue ao socket
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def push(self, seq: int, frame: bytes) -> None:
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1  # deque com maxlen descarta o mais antigo
+        self.queue.append((seq, frame))
+        self.wake.set()
+
+    def push_latest(self, event_type: str, seq: int, frame: bytes) -> None:
+        if event_type in self.latest:
+            self.coalesced += 1
+        self.latest[event_type] = (seq, frame)
+        self.wake.set()
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue) + len(self.latest)
+
+    def drain(self) -> Tuple[int, bytes]:
+        """Tudo que está pendente, em ordem de publicação, como um único write"""
+        items = list(self.queue)
+        self.queue.clear()
+        if self.latest:
+            items.extend(self.latest.values())
+            self.latest.clear()
+            items.sort(key=lambda item: item[0])
+        self.wake.clear()
+        if not items:
+            return self.last_seq, b""
+        self.sent += len(items)
+        return items[-1][0], b"".join(frame for _, frame in items)
+
+
+# ============== HUB ==============
+
+class SSEHub:
+    """
+    Hub de fan-out para /stream.
+
+    Exemplo:
+        hub = SSEHub()
+        hub.publish("anomaly", record)           # nunca bloqueia
+        return StreamingResponse(hub.subscribe(request), media_type="text/event-stream")
+    """
+
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        heartbeat_interval: Optional[float] = None,
+        coalesce_types: Optional[List[str]] = None
+    ):
+        self.queue_size = queue_size or int(os.getenv("SSE_QUEUE_SIZE", 256))
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv("SSE_HEARTBEAT_INTERVAL", 15))
+        if coalesce_types is None:
+            coalesce_types = [t for t in os.getenv("SSE_COALESCE_TYPES", "metrics").split(",") if t]
+        self.coalesce_types = set(coalesce_types)
+        self.metrics_interval = float(os.getenv("SSE_METRICS_INTERVAL", 1.0))
+
+        self.clients: Dict[int, SSEClient] = {}
+        self._ids = itertools.count(1)
+        self.seq = 0
+        self._ticker: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "published": 0,
+            "connects": 0,
+            "disconnects": 0,
+            "heartbeats": 0,
+            # Totais de clientes já desconectados (os ativos somam em get_stats)
+            "dropped_closed": 0,
+            "coalesced_closed": 0,
+        }
+
+    # ============== PUBLICAÇÃO ==============
+
+    def publish(self, event_type: str, data: Any) -> int:
+        """Serializa uma vez e enfileira para todos os clientes; retorna o seq"""
+        self.seq += 1
+        self.stats["published"] += 1
+        if not self.clients:
+            return self.seq
+        frame = encode_event(event_type, data, self.seq)
+        if event_type in self.coalesce_types:
+            for client in self.clients.values():
+                client.push_latest(event_type, self.seq, frame)
+        else:
+            for client in self.clients.values():
+                client.push(self.seq, frame)
+        return self.seq
+
+    # ============== ASSINATURA ==============
+
+    def _connect(self) -> SSEClient:
+        client = SSEClient(next(self._ids), self.queue_size)
+        client.last_seq = self.seq
+        self.clients[client.id] = client
+        self.stats["connects"] += 1
+        return client
+
+    def _disconnect(self, client: SSEClient) -> None:
+        if self.clients.pop(client.id, None) is not None:
+            self.stats["disconnects"] += 1
+            self.stats["dropped_closed"] += client.dropped
+            self.stats["coalesced_closed"] += client.coalesced
+
+    async def subscribe(self, request=None, hello: Optional[Dict] = None) -> AsyncIterator[bytes]:
+        """
+        Gerador de frames de um cliente.
+
+        Encerra (e remove o cliente) quando o socket fecha: por cancelamento
+        do Starlette ou pela checagem de `request.is_disconnected()` a cada
+        heartbeat.
+        """
+        client = self._connect()
+        try:
+            yield encode_event("connected", hello or {"client_id": client.id})
+            while True:
+                try:
+                    await asyncio.wait_for(client.wake.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        break
+                    self.stats["heartbeats"] += 1
+                    yield HEARTBEAT
+                    continue
+                last_seq, chunk = client.drain()
+                if chunk:
+                    client.last_seq = last_seq
+                    yield chunk
+        finally:
+            self._disconnect(client)
+
+    # ============== TICKER ==============
+
+    async def start(self, snapshot: Callable[[], Dict]) -> None:
+        """Publica `snapshot()` como evento "metrics" enquanto houver clientes"""
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._run(snapshot))
+
+    async def stop(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+
+    async def _run(self, snapshot: Callable[[], Dict]) -> None:
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            if self.clients:
+                try:
+                    self.publish("metrics", snapshot())
+                except Exception as e:
+                    logger.error(f"Erro ao publicar métricas SSE: {e}")
+
+    # ============== MÉTRICAS ==============
+
+    def client_stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        return [
+            {
+                "client_id": client.id,
+                "connected_seconds": round(now - client.connected_at, 1),
+                "queue_depth": client.depth,
+                "lag_events": self.seq - client.last_seq,
+                "sent": client.sent,
+                "dropped": client.dropped,
+                "coalesced": client.coalesced,
+            }
+            for client in self.clients.values()
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        clients = list(self.clients.values())
+        return {
+            "clients": len(clients),
+            "queue_size": self.queue_size,
+            "heartbeat_interval": self.heartbeat_interval,
+            "last_seq": self.seq,
+            "published": self.stats["published"],
+            "connects": self.stats["connects"],
+            "disconnects": self.stats["disconnects"],
+            "heartbeats": self.stats["heartbeats"],
+            "dropped": self.stats["dropped_closed"] + sum(c.dropped for c in clients),
+            "coalesced": self.stats["coalesced_closed"] + sum(c.coalesced for c in clients),
+        }
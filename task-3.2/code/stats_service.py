@@ -0,0 +1,241 @@
+"""
+📊 Stats Service
+================
+Estatísticas por janela arbitrária a partir dos continuous aggregates.
+
+`/stats?window=7d` não lê a tabela crua: a janela é respondida pelo
+rollup mais grosso que ainda deixa pelo menos `min_buckets` buckets
+(7d → transactions_per_hour, 168 linhas; 6h → transactions_per_minute,
+360 linhas). Só a cauda ainda não materializada vem de `transactions`.
+
+O resultado fica em cache por alguns segundos e requests simultâneos para
+a mesma janela compartilham uma única query.
+
+Janelas: "<n><unidade>" com unidade s, m, h, d ou w (ex.: 90m, 24h, 7d).
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from .database import Database, ROLLUP_VIEWS
+from .ring_buffer import STATUS_CODES, STATUS_NAMES
+
+logger = logging.getLogger(__name__)
+
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+WINDOW_PATTERN = re.compile(r"^\s*(\d+)\s*([smhdw])\s*$")
+
+# Nome da resolução de cada rollup, como em RollupEngine ("1m", "1h")
+TIER_RESOLUTIONS = {"minute": "1m", "hour": "1h"}
+
+# Retenção de transactions no TimescaleDB
+MAX_WINDOW = timedelta(days=90)
+MIN_WINDOW = timedelta(minutes=1)
+
+
+def parse_window(text: str) -> timedelta:
+    """Converte "7d", "24h", "90m"... em timedelta"""
+    match = WINDOW_PATTERN.match(text or "")
+    if not match:
+        raise ValueError(f"Janela inválida: {text!r} (use ex.: 30m, 24h, 7d)")
+    window = timedelta(seconds=int(match.group(1)) * WINDOW_UNITS[match.group(2)])
+    if not MIN_WINDOW <= window <= MAX_WINDOW:
+        raise ValueError(f"Janela deve estar entre {MIN_WINDOW} e {MAX_WINDOW.days}d")
+    return window
+
+
+class StatsService:
+    """
+    Estatísticas de uma janela sobre os rollups do TimescaleDB.
+
+    Exemplo:
+        service = get_stats_service()
+        stats = await service.get_window_stats("7d")
+    """
+
+    def __init__(
+        self,
+        db: Optional[Database] = None,
+        cache_ttl: float = None,
+        min_buckets: int = 24
+    ):
+        self.db = db or Database()
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv("STATS_CACHE_TTL", 10))
+        self.min_buckets = min_buckets
+        self.reconnect_interval = 5.0
+        self.connect_timeout = 5.0
+
+        self._db_up = False
+        self._next_connect = 0.0
+        self._cache: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "queries": 0,
+            "errors": 0,
+            "query_seconds_sum": 0.0,
+        }
+
+    @property
+    def db_connected(self) -> bool:
+        return self._db_up
+
+    async def _ensure_connected(self) -> bool:
+        if self._db_up and self.db.pool is not None:
+            return True
+        now = time.monotonic()
+        if now < self._next_connect:
+            return False
+        self._next_connect = now + self.reconnect_interval
+        try:
+            await asyncio.wait_for(self.db.connect(), timeout=self.connect_timeout)
+            self._db_up = True
+        except Exception as e:
+            logger.error(f"TimescaleDB indisponível para stats: {e}")
+            self._db_up = False
+        return self._db_up
+
+    async def close(self) -> None:
+        if self.db.pool is not None:
+            await self.db.close()
+        self._db_up = False
+
+    # ============== TIERS ==============
+
+    def choose_tier(self, window: timedelta) -> str:
+        """Rollup mais grosso que ainda gera `min_buckets` buckets na janela"""
+        seconds = window.total_seconds()
+        for tier, (_, width) in sorted(ROLLUP_VIEWS.items(), key=lambda item: -item[1][1]):
+            if seconds >= width * self.min_buckets:
+                return tier
+        return min(ROLLUP_VIEWS, key=lambda tier: ROLLUP_VIEWS[tier][1])
+
+    # ============== QUERY ==============
+
+    async def get_window_stats(self, window: str) -> Optional[Dict[str, Any]]:
+        """
+        Estatísticas da janela (ex.: "7d").
+
+        Retorna None se o banco estiver indisponível; ValueError para
+        janela inválida.
+        """
+        delta = parse_window(window)
+        key = int(delta.total_seconds())
+        self.stats["requests"] += 1
+
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.stats["cache_hits"] += 1
+            return cached[1]
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Outro request pode ter preenchido o cache enquanto esperávamos
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.stats["cache_hits"] += 1
+                return cached[1]
+
+            if not await self._ensure_connected():
+                return None
+
+            result = await self._query(window, delta)
+            if result is not None:
+                self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+            return result
+
+    async def _query(self, window: str, delta: timedelta) -> Optional[Dict[str, Any]]:
+        tier = self.choose_tier(delta)
+        width = ROLLUP_VIEWS[tier][1]
+        now = datetime.now(timezone.utc)
+        # Alinha o início ao bucket para não contar um bucket parcial
+        start_epoch = (now - delta).timestamp() // width * width
+        start = datetime.fromtimestamp(start_epoch, tz=timezone.utc)
+
+        started = time.perf_counter()
+        try:
+            rows = await self.db.get_rollup_buckets(tier, start)
+        except Exception as e:
+            logger.error(f"Erro ao consultar rollup {tier}: {e}")
+            self.stats["errors"] += 1
+            if self.db.pool is None or self.db.pool.is_closing():
+                self._db_up = False
+            return None
+        finally:
+            self.stats["queries"] += 1
+            self.stats["query_seconds_sum"] += time.perf_counter() - started
+
+        return summarize(rows, {
+            "window": window,
+            "source": ROLLUP_VIEWS[tier][0],
+            "resolution": TIER_RESOLUTIONS[tier],
+            "bucket_seconds": width,
+            "window_seconds": int(delta.total_seconds()),
+            "from": start.isoformat(),
+            "to": now.isoformat(),
+        })
+
+    # ============== MÉTRICAS ==============
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "db_connected": self.db_connected,
+            "cache_ttl_seconds": self.cache_ttl,
+            "cached_windows": len(self._cache),
+            **self.stats
+        }
+
+
+def summarize(rows, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduz os buckets do rollup às estatísticas da janela, no mesmo formato
+    de RollupEngine.summary: eventos (linhas) por status e estatísticas do
+    `count` de cada transação (transaction_count), não do total por bucket.
+    """
+    events = sum(row["total"] for row in rows)
+    volume = int(sum(row["volume"] or 0 for row in rows))
+    volume_sq = int(sum(row["volume_sq"] or 0 for row in rows))
+    per_status = {name: sum(row[name] for row in rows) for name in STATUS_CODES}
+    per_status["unknown"] = events - sum(per_status.values())
+    anomalies = sum(row["anomalies"] for row in rows)
+    total_amount = float(sum(row["total_amount"] or 0 for row in rows))
+    mean = volume / events if events else 0.0
+    variance = max(0.0, volume_sq / events - mean * mean) if events else 0.0
+
+    return {
+        **meta,
+        "events": events,
+        "volume": volume,
+        "status_distribution": {name: per_status[name] for name in STATUS_NAMES if per_status[name]},
+        "transaction_stats": {
+            "min": min(row["min_count"] for row in rows) if events else 0,
+            "max": max(row["max_count"] for row in rows) if events else 0,
+            "avg": round(mean, 2),
+            "std": round(variance ** 0.5, 2),
+        },
+        "approval_rate": round(per_status["approved"] / events * 100, 2) if events else 0,
+        "anomaly_count": anomalies,
+        "anomaly_rate": round(anomalies / events, 4) if events else 0,
+        "total_amount": round(total_amount, 2),
+        "avg_amount": round(total_amount / events, 2) if events else 0,
+    }
+
+
+# ============== SINGLETON ==============
+
+_stats_service: Optional[StatsService] = None
+
+
+def get_stats_service() -> StatsService:
+    """Retorna instância singleton do StatsService"""
+    global _stats_service
+    if _stats_service is None:
+        _stats_service = StatsService()
+    return _stats_service
@@ -0,0 +1,179 @@
+"""
+🌊 Stream Ingest
+================
+Decodificadores incrementais para POST /transactions/stream.
+
+Formatos:
+- NDJSON (application/x-ndjson): um objeto JSON por linha
+- msgpack com prefixo de tamanho (application/x-msgpack): cada frame é
+  um uint32 big-endian com o tamanho seguido do mapa msgpack
+
+Os decodificadores recebem o corpo em chunks arbitrários e devolvem os
+registros completos assim que chegam; apenas o registro parcial fica em
+memória, limitado por `max_record_bytes`.
+"""
+
+import json
+import struct
+from typing import Any, Dict, List, Tuple
+
+from starlette.responses import StreamingResponse
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+MSGPACK_CONTENT_TYPES = {"application/x-msgpack", "application/msgpack"}
+
+# Registro decodificado: (número do registro, objeto) ou (número, erro)
+Record = Tuple[int, Any]
+
+
+class StreamDecodeError(ValueError):
+    """Registro inválido dentro do stream (não interrompe o stream)"""
+
+
+class NDJSONDecoder:
+    """Decodifica NDJSON incrementalmente"""
+
+    def __init__(self, max_record_bytes: int = 64 * 1024):
+        self.max_record_bytes = max_record_bytes
+        self._buffer = bytearray()
+        self._seq = 0
+        self._skipping = False  # Descartando uma linha grande demais
+
+    def _decode_line(self, line: bytes) -> Record:
+        self._seq += 1
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            return self._seq, StreamDecodeError(f"JSON inválido: {e}")
+        if not isinstance(obj, dict):
+            return self._seq, StreamDecodeError("Registro deve ser um objeto JSON")
+        return self._seq, obj
+
+    def feed(self, chunk: bytes) -> List[Record]:
+        """Consome um chunk e retorna os registros completos"""
+        records: List[Record] = []
+        if self._skipping:
+            # Resto da linha grande demais: descarta até o próximo \n sem
+            # gerar novos registros (o erro já foi emitido uma vez)
+            end = chunk.find(b"\n")
+            if end < 0:
+                return records
+            chunk = chunk[end + 1:]
+            self._skipping = False
+        self._buffer += chunk
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(self._buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                records.append(self._decode_line(line))
+        del self._buffer[:start]
+
+        if len(self._buffer) > self.max_record_bytes:
+            self._seq += 1
+            records.append((self._seq, StreamDecodeError(f"Registro excede {self.max_record_bytes} bytes")))
+            self._buffer.clear()
+            self._skipping = True
+        return records
+
+    def close(self) -> List[Record]:
+        """Processa a última linha (sem \\n final)"""
+        line = bytes(self._buffer).strip()
+        self._buffer.clear()
+        if line and not self._skipping:
+            return [self._decode_line(line)]
+        return []
+
+
+class MsgpackFrameDecoder:
+    """Decodifica frames msgpack com prefixo de tamanho (uint32 big-endian)"""
+
+    HEADER = struct.Struct(">I")
+
+    def __init__(self, max_record_bytes: int = 64 * 1024):
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack não instalado")
+        self.max_record_bytes = max_record_bytes
+        self._buffer = bytearray()
+        self._seq = 0
+
+    def feed(self, chunk: bytes) -> List[Record]:
+        records: List[Record] = []
+        self._buffer += chunk
+        offset = 0
+        while len(self._buffer) - offset >= self.HEADER.size:
+            (size,) = self.HEADER.unpack_from(self._buffer, offset)
+            if size > self.max_record_bytes:
+                # Sem como ressincronizar o stream binário: aborta
+                raise StreamDecodeError(f"Frame de {size} bytes excede {self.max_record_bytes}")
+            if len(self._buffer) - offset - self.HEADER.size < size:
+                break
+            start = offset + self.HEADER.size
+            payload = bytes(self._buffer[start:start + size])
+            offset = start + size
+            self._seq += 1
+            try:
+                obj = msgpack.unpackb(payload, raw=False)
+            except Exception as e:
+                records.append((self._seq, StreamDecodeError(f"msgpack inválido: {e}")))
+                continue
+            if not isinstance(obj, dict):
+                records.append((self._seq, StreamDecodeError("Registro deve ser um mapa")))
+                continue
+            records.append((self._seq, obj))
+        del self._buffer[:offset]
+        return records
+
+    def close(self) -> List[Record]:
+        if self._buffer:
+            self._seq += 1
+            self._buffer.clear()
+            return [(self._seq, StreamDecodeError("Frame incompleto no fim do stream"))]
+        return []
+
+
+def get_decoder(content_type: str, max_record_bytes: int = 64 * 1024):
+    """Escolhe o decodificador pelo Content-Type (padrão: NDJSON)"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in MSGPACK_CONTENT_TYPES:
+        return MsgpackFrameDecoder(max_record_bytes)
+    return NDJSONDecoder(max_record_bytes)
+
+
+def encode_line(obj: Dict) -> bytes:
+    """Serializa uma linha NDJSON de saída"""
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que permite ler o corpo do request enquanto responde.
+    
+    O StreamingResponse padrão escuta `http.disconnect` em paralelo, o que
+    consome as mensagens `http.request` ainda não lidas. Aqui só o gerador
+    lê o corpo; desconexões chegam como ClientDisconnect em request.stream().
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        async for chunk in self.body_iterator:
+            if not isinstance(chunk, (bytes, memoryview)):
+                chunk = chunk.encode(self.charset)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,312 @@
+"""
+🔌 WebSocket Stream
+===================
+/ws/stream: eventos filtrados no servidor, em lotes, JSON ou msgpack.
+
+Protocolo:
+    cliente → {"action": "subscribe",
+               "levels": ["CRITICAL"],        # alert_level (opcional)
+               "statuses": ["failed"],        # status da transação (opcional)
+               "min_score": 0.8,              # score mínimo (opcional)
+               "format": "msgpack",           # "json" (padrão) ou "msgpack"
+               "batch_ms": 250}               # janela de agrupamento
+    servidor → {"type": "subscribed", "filters": {...}}            (texto JSON)
+    servidor → {"type": "batch", "dropped": 0, "events": [...]}    (a cada batch_ms)
+
+Nada é enviado antes do primeiro subscribe; um novo subscribe troca na
+hora os filtros que informar (campos omitidos mantêm o valor atual,
+`null` remove o filtro de levels/statuses).
+
+- O filtro roda em `publish`, antes de qualquer serialização: o cliente
+  de CRITICAL não paga encode nem rede pelos demais eventos
+- Cada evento é serializado no máximo uma vez por formato; o lote é a
+  concatenação dos eventos já codificados (JSON ou array msgpack)
+- Fila limitada por cliente (drop-oldest), contagem de descartes no frame
+
+Configuração (env):
+    WS_QUEUE_SIZE=1024
+    WS_BATCH_MS=100
+
+CloudWalk Task 3.2
+"""
+
+import os
+import json
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "msgpack")
+MIN_BATCH_MS, MAX_BATCH_MS = 10, 5000
+
+
+class SubscriptionError(ValueError):
+    """Mensagem de subscribe inválida (devolvida ao cliente, conexão segue)"""
+
+
+# ============== EVENTO ==============
+
+class StreamEvent:
+    """Evento publicado, com campos de filtro extraídos e encode preguiçoso"""
+
+    __slots__ = ("type", "level", "status", "score", "data", "_encoded")
+
+    def __init__(self, event_type: str, data: Dict[str, Any]):
+        self.type = event_type
+        self.data = data
+        self.level = data.get("alert_level")
+        self.status = (data.get("transaction") or {}).get("status", data.get("status"))
+        self.score = float(data.get("score", data.get("anomaly_score", 0.0)) or 0.0)
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, fmt: str) -> bytes:
+        """{"type", "data"} serializado uma vez por formato"""
+        cached = self._encoded.get(fmt)
+        if cached is None:
+            payload = {"type": self.type, "data": self.data}
+            if fmt == "msgpack":
+                cached = msgpack.packb(payload, default=str)
+            else:
+                cached = json.dumps(payload, default=str).encode()
+            self._encoded[fmt] = cached
+        return cached
+
+
+def encode_batch(events: List[StreamEvent], fmt: str, dropped: int):
+    """Frame do lote concatenando os eventos já codificados"""
+    if fmt == "msgpack":
+        packer = msgpack.Packer()
+        return b"".join([
+            packer.pack_map_header(3),
+            packer.pack("type"), packer.pack("batch"),
+            packer.pack("dropped"), packer.pack(dropped),
+            packer.pack("events"), packer.pack_array_header(len(events)),
+            *(event.encoded(fmt) for event in events),
+        ])
+    body = b",".join(event.encoded(fmt) for event in events)
+    return b'{"type":"batch","dropped":%d,"events":[%s]}' % (dropped, body)
+
+
+# ============== ASSINATURA ==============
+
+class Subscription:
+    """Filtros e fila de um cliente WebSocket"""
+
+    def __init__(self, client_id: int, queue_size: int):
+        self.id = client_id
+        self.queue: deque = deque(maxlen=queue_size)
+        self.wake = asyncio.Event()
+        self.send_lock = asyncio.Lock()  # Respostas de subscribe e frames não se intercalam
+        self.active = False
+        self.levels: Optional[set] = None
+        self.statuses: Optional[set] = None
+        self.min_score = 0.0
+        self.format = "json"
+        self.batch_ms = 100
+        self.delivered = 0
+        self.filtered = 0
+        self.dropped = 0
+        self.frames = 0
+        self.bytes_sent = 0
+        self._dropped_unsent = 0
+
+    def configure(self, message: Dict[str, Any], default_batch_ms: int) -> Dict[str, Any]:
+        """
+        Aplica uma mensagem de subscribe; SubscriptionError se inválida.
+
+        Campos omitidos mantêm o valor atual (no primeiro subscribe, o
+        padrão); `null` ou `[]` em levels/statuses removem o filtro.
+        """
+        if message.get("action", "subscribe") != "subscribe":
+            raise SubscriptionError(f"Ação desconhecida: {message.get('action')!r}")
+        fmt = message.get("format", self.format)
+        if fmt not in FORMATS:
+            raise SubscriptionError(f"Formato inválido: {fmt!r} (use json ou msgpack)")
+        if fmt == "msgpack" and not MSGPACK_AVAILABLE:
+            raise SubscriptionError("msgpack não instalado no servidor")
+        try:
+            min_score = float(message.get("min_score", self.min_score))
+            batch_ms = int(message.get("batch_ms", self.batch_ms if self.active else default_batch_ms))
+        except (TypeError, ValueError):
+            raise SubscriptionError("min_score e batch_ms devem ser numéricos")
+        levels = self._filter_set(message, "levels", self.levels, str.upper)
+        statuses = self._filter_set(message, "statuses", self.statuses, str)
+
+        self.levels = levels
+        self.statuses = statuses
+        self.min_score = min_score
+        self.format = fmt
+        self.batch_ms = min(max(batch_ms, MIN_BATCH_MS), MAX_BATCH_MS)
+        self.active = True
+        return self.filters()
+
+    @staticmethod
+    def _filter_set(message: Dict[str, Any], field: str, current: Optional[set], normalize) -> Optional[set]:
+        """Filtro de lista da mensagem (omitido: mantém o atual)"""
+        if field not in message:
+            return current
+        values = message[field]
+        if values is None:
+            return None
+        if not isinstance(values, list):
+            raise SubscriptionError(f"{field} deve ser uma lista (ex.: [\"CRITICAL\"])")
+        return {normalize(str(value)) for value in values} or None
+
+    def filters(self) -> Dict[str, Any]:
+        return {
+            "levels": sorted(self.levels) if self.levels else None,
+            "statuses": sorted(self.statuses) if self.statuses else None,
+            "min_score": self.min_score,
+            "format": self.format,
+            "batch_ms": self.batch_ms,
+        }
+
+    def matches(self, event: StreamEvent) -> bool:
+        if not self.active:
+            return False
+        if self.levels is not None and event.level not in self.levels:
+            return False
+        if self.statuses is not None and event.status not in self.statuses:
+            return False
+        return event.score >= self.min_score
+
+    def push(self, event: StreamEvent) -> None:
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+            self._dropped_unsent += 1
+        self.queue.append(event)
+        self.wake.set()
+
+    def take(self):
+        """Eventos pendentes e descartes desde o último frame"""
+        events = list(self.queue)
+        self.queue.clear()
+        self.wake.clear()
+        dropped, self._dropped_unsent = self._dropped_unsent, 0
+        return events, dropped
+
+
+# ============== HUB ==============
+
+class WebSocketHub:
+    """
+    Fan-out filtrado para /ws/stream.
+
+    Exemplo:
+        hub = WebSocketHub()
+        hub.publish("anomaly", record)       # filtra por cliente, sem encode
+        await hub.serve(websocket)           # dentro do endpoint WebSocket
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, batch_ms: Optional[int] = None):
+        self.queue_size = queue_size or int(os.getenv("WS_QUEUE_SIZE", 1024))
+        self.batch_ms = batch_ms or int(os.getenv("WS_BATCH_MS", 100))
+        self.subscriptions: Dict[int, Subscription] = {}
+        self._ids = itertools.count(1)
+        self.stats = {
+            "published": 0,
+            "connects": 0,
+            "disconnects": 0,
+            "frames": 0,
+            "bytes_sent": 0,
+            "delivered": 0,
+            "filtered": 0,
+            "dropped": 0,
+        }
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Filtra por cliente e enfileira; encode só acontece no envio"""
+        self.stats["published"] += 1
+        if not self.subscriptions:
+            return
+        event = StreamEvent(event_type, data)
+        for sub in self.subscriptions.values():
+            if sub.matches(event):
+                sub.push(event)
+            else:
+                sub.filtered += 1
+                self.stats["filtered"] += 1
+
+    async def serve(self, websocket: WebSocket) -> None:
+        """Atende uma conexão até o cliente desconectar"""
+        await websocket.accept()
+        sub = Subscription(next(self._ids), self.queue_size)
+        self.subscriptions[sub.id] = sub
+        self.stats["connects"] += 1
+        sender = asyncio.create_task(self._send_loop(websocket, sub))
+        try:
+            while True:
+                try:
+                    message = await websocket.receive_json()
+                    if not isinstance(message, dict):
+                        raise SubscriptionError("Mensagem deve ser um objeto JSON")
+                    reply = {"type": "subscribed", "client_id": sub.id,
+                             "filters": sub.configure(message, self.batch_ms)}
+                except (SubscriptionError, ValueError, KeyError) as e:
+                    reply = {"type": "error", "detail": str(e)}
+                async with sub.send_lock:
+                    await websocket.send_json(reply)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+            try:
+                await sender
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.subscriptions.pop(sub.id, None)
+            self.stats["disconnects"] += 1
+
+    async def _send_loop(self, websocket: WebSocket, sub: Subscription) -> None:
+        """Acorda no primeiro evento e envia tudo que chegou em batch_ms como um frame"""
+        while True:
+            await sub.wake.wait()
+            await asyncio.sleep(sub.batch_ms / 1000)
+            events, dropped = sub.take()
+            if not events:
+                continue
+            frame = encode_batch(events, sub.format, dropped)
+            async with sub.send_lock:
+                if sub.format == "msgpack":
+                    await websocket.send_bytes(frame)
+                else:
+                    await websocket.send_text(frame.decode())
+            sub.frames += 1
+            sub.delivered += len(events)
+            sub.bytes_sent += len(frame)
+            self.stats["frames"] += 1
+            self.stats["delivered"] += len(events)
+            self.stats["bytes_sent"] += len(frame)
+            self.stats["dropped"] += dropped
+
+    # ============== MÉTRICAS ==============
+
+    def client_stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "client_id": sub.id,
+                "queue_depth": len(sub.queue),
+                "delivered": sub.delivered,
+                "filtered": sub.filtered,
+                "dropped": sub.dropped,
+                "frames": sub.frames,
+                "bytes_sent": sub.bytes_sent,
+                **sub.filters(),
+            }
+            for sub in self.subscriptions.values()
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"clients": len(self.subscriptions), **self.stats}
@@ -31,6 +31,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     ml_score DECIMAL(5, 4),
     zscore DECIMAL(10, 4),
     detection_method VARCHAR(20),  -- ml, zscore, rules, combined
+    transaction_count INTEGER NOT NULL DEFAULT 1,  -- transações agregadas no registro (count)
     
     -- Metadados
     processed_at TIMESTAMPTZ DEFAULT NOW(),
@@ -140,6 +141,19 @@ SELECT create_hypertable('alerts', 'fired_at',
     if_not_exists => TRUE
 );
 
+-- =============================================================================
+-- 4.1 Checkpoints de Migração (CSV -> TimescaleDB retomável)
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS migration_checkpoints (
+    source TEXT NOT NULL,            -- arquivo:tamanho
+    chunk_start BIGINT NOT NULL,     -- offset em bytes
+    chunk_end BIGINT NOT NULL,
+    rows_loaded INTEGER NOT NULL,
+    completed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    
+    PRIMARY KEY (source, chunk_start)
+);
+
 -- =============================================================================
 -- 5. Índices para Performance
 -- =============================================================================
@@ -170,7 +184,13 @@ SELECT
     COUNT(*) FILTER (WHERE status = 'approved') AS approved,
     COUNT(*) FILTER (WHERE status = 'denied') AS denied,
     COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+    COUNT(*) FILTER (WHERE status = 'reversed') AS reversed,
+    COUNT(*) FILTER (WHERE status = 'refunded') AS refunded,
     COUNT(*) FILTER (WHERE is_anomaly = TRUE) AS anomalies,
+    SUM(transaction_count) AS volume,
+    SUM(transaction_count::BIGINT * transaction_count) AS volume_sq,
+    MIN(transaction_count) AS min_count,
+    MAX(transaction_count) AS max_count,
     AVG(amount) AS avg_amount,
     SUM(amount) AS total_amount
 FROM transactions
@@ -194,7 +214,13 @@ SELECT
     COUNT(*) FILTER (WHERE status = 'approved') AS approved,
     COUNT(*) FILTER (WHERE status = 'denied') AS denied,
     COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+    COUNT(*) FILTER (WHERE status = 'reversed') AS reversed,
+    COUNT(*) FILTER (WHERE status = 'refunded') AS refunded,
     COUNT(*) FILTER (WHERE is_anomaly = TRUE) AS anomalies,
+    SUM(transaction_count) AS volume,
+    SUM(transaction_count::BIGINT * transaction_count) AS volume_sq,
+    MIN(transaction_count) AS min_count,
+    MAX(transaction_count) AS max_count,
     ROUND(AVG(amount)::numeric, 2) AS avg_amount,
     SUM(amount) AS total_amount,
     ROUND((COUNT(*) FILTER (WHERE status = 'approved')::numeric / 
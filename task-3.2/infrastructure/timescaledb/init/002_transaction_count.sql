@@ -0,0 +1,10 @@
+-- =============================================================================
+-- Transaction Guardian v2.0 - transactions.transaction_count
+-- =============================================================================
+-- Cada registro da API/CSV agrega `count` transações de um minuto e status.
+-- Bancos criados antes desta coluna: rodar manualmente (idempotente)
+--   psql -U guardian -d transaction_guardian -f 002_transaction_count.sql
+-- =============================================================================
+
+ALTER TABLE transactions
+    ADD COLUMN IF NOT EXISTS transaction_count INTEGER NOT NULL DEFAULT 1;
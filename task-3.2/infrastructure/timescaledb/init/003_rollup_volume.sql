@@ -0,0 +1,83 @@
+-- =============================================================================
+-- Transaction Guardian v2.0 - volume nos continuous aggregates
+-- =============================================================================
+-- /stats usa `volume`, `volume_sq`, `min_count` e `max_count` (sobre
+-- transaction_count) e os contadores reversed/refunded dos rollups.
+-- Continuous aggregates não aceitam ADD COLUMN: bancos criados antes
+-- recriam as views e rematerializam a retenção (idempotente, só roda se
+-- faltar a coluna `volume`)
+--   psql -U guardian -d transaction_guardian -f 003_rollup_volume.sql
+-- =============================================================================
+
+SELECT NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'transactions_per_minute' AND column_name = 'volume'
+) AS needs_rebuild \gset
+
+\if :needs_rebuild
+
+DROP MATERIALIZED VIEW IF EXISTS transactions_per_minute CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS transactions_per_hour CASCADE;
+
+CREATE MATERIALIZED VIEW transactions_per_minute
+WITH (timescaledb.continuous) AS
+SELECT
+    time_bucket('1 minute', timestamp) AS bucket,
+    COUNT(*) AS total,
+    COUNT(*) FILTER (WHERE status = 'approved') AS approved,
+    COUNT(*) FILTER (WHERE status = 'denied') AS denied,
+    COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+    COUNT(*) FILTER (WHERE status = 'reversed') AS reversed,
+    COUNT(*) FILTER (WHERE status = 'refunded') AS refunded,
+    COUNT(*) FILTER (WHERE is_anomaly = TRUE) AS anomalies,
+    SUM(transaction_count) AS volume,
+    SUM(transaction_count::BIGINT * transaction_count) AS volume_sq,
+    MIN(transaction_count) AS min_count,
+    MAX(transaction_count) AS max_count,
+    AVG(amount) AS avg_amount,
+    SUM(amount) AS total_amount
+FROM transactions
+GROUP BY bucket
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('transactions_per_minute',
+    start_offset => INTERVAL '1 hour',
+    end_offset => INTERVAL '1 minute',
+    schedule_interval => INTERVAL '1 minute',
+    if_not_exists => TRUE
+);
+
+CREATE MATERIALIZED VIEW transactions_per_hour
+WITH (timescaledb.continuous) AS
+SELECT
+    time_bucket('1 hour', timestamp) AS bucket,
+    COUNT(*) AS total,
+    COUNT(*) FILTER (WHERE status = 'approved') AS approved,
+    COUNT(*) FILTER (WHERE status = 'denied') AS denied,
+    COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+    COUNT(*) FILTER (WHERE status = 'reversed') AS reversed,
+    COUNT(*) FILTER (WHERE status = 'refunded') AS refunded,
+    COUNT(*) FILTER (WHERE is_anomaly = TRUE) AS anomalies,
+    SUM(transaction_count) AS volume,
+    SUM(transaction_count::BIGINT * transaction_count) AS volume_sq,
+    MIN(transaction_count) AS min_count,
+    MAX(transaction_count) AS max_count,
+    ROUND(AVG(amount)::numeric, 2) AS avg_amount,
+    SUM(amount) AS total_amount,
+    ROUND((COUNT(*) FILTER (WHERE status = 'approved')::numeric /
+           NULLIF(COUNT(*), 0) * 100)::numeric, 2) AS approval_rate
+FROM transactions
+GROUP BY bucket
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('transactions_per_hour',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE
+);
+
+CALL refresh_continuous_aggregate('transactions_per_minute', NOW() - INTERVAL '90 days', NOW());
+CALL refresh_continuous_aggregate('transactions_per_hour', NOW() - INTERVAL '90 days', NOW());
+
+\endif